@@ -1,14 +1,21 @@
-import re
 import sys
 from parser import WhoisEntry
 from whois import NICClient
+from cache import SingleFlight
+from publicsuffix import default_list
 
 
-def whois(url):
+# concurrent whois() calls for the same domain share one lookup;
+# single_flight.stats() tells how many were saved
+single_flight = SingleFlight()
+
+def whois(url, cache=None, transport=None):
     # clean domain to expose netloc
     domain = extract_domain(url)
-    # call whois command with domain
-    nic_client = NICClient()
+    # call whois command with domain, answering from ``cache`` if given
+    # and exchanging with servers over ``transport`` (see transport.py)
+    nic_client = NICClient(cache=cache, single_flight=single_flight,
+                           transport=transport)
     text = nic_client.whois_lookup(None, domain, 0)
     return WhoisEntry.load(domain, text)
 
@@ -18,16 +25,51 @@ def extract_domain(url):
     >>> extract_domain('http://www.google.com.au/tos.html')
     'google.com.au'
     """
-    suffixes = 'ac', 'ad', 'ae', 'aero', 'af', 'ag', 'ai', 'al', 'am', 'an', 'ao', 'aq', 'ar', 'arpa', 'as', 'asia', 'at', 'au', 'aw', 'ax', 'az', 'ba', 'bb', 'bd', 'be', 'bf', 'bg', 'bh', 'bi', 'biz', 'bj', 'bm', 'bn', 'bo', 'br', 'bs', 'bt', 'bv', 'bw', 'by', 'bz', 'ca', 'cat', 'cc', 'cd', 'cf', 'cg', 'ch', 'ci', 'ck', 'cl', 'cm', 'cn', 'co', 'com', 'coop', 'cr', 'cu', 'cv', 'cx', 'cy', 'cz', 'de', 'dj', 'dk', 'dm', 'do', 'dz', 'ec', 'edu', 'ee', 'eg', 'er', 'es', 'et', 'eu', 'fi', 'fj', 'fk', 'fm', 'fo', 'fr', 'ga', 'gb', 'gd', 'ge', 'gf', 'gg', 'gh', 'gi', 'gl', 'gm', 'gn', 'gov', 'gp', 'gq', 'gr', 'gs', 'gt', 'gu', 'gw', 'gy', 'hk', 'hm', 'hn', 'hr', 'ht', 'hu', 'id', 'ie', 'il', 'im', 'in', 'info', 'int', 'io', 'iq', 'ir', 'is', 'it', 'je', 'jm', 'jo', 'jobs', 'jp', 'ke', 'kg', 'kh', 'ki', 'km', 'kn', 'kp', 'kr', 'kw', 'ky', 'kz', 'la', 'lb', 'lc', 'li', 'lk', 'lr', 'ls', 'lt', 'lu', 'lv', 'ly', 'ma', 'mc', 'md', 'me', 'mg', 'mh', 'mil', 'mk', 'ml', 'mm', 'mn', 'mo', 'mobi', 'mp', 'mq', 'mr', 'ms', 'mt', 'mu', 'mv', 'mw', 'mx', 'my', 'mz', 'na', 'name', 'nc', 'ne', 'net', 'nf', 'ng', 'ni', 'nl', 'no', 'np', 'nr', 'nu', 'nz', 'om', 'org', 'pa', 'pe', 'pf', 'pg', 'ph', 'pk', 'pl', 'pm', 'pn', 'pr', 'pro', 'ps', 'pt', 'pw', 'py', 'qa', 're', 'ro', 'rs', 'ru', 'rw', 'sa', 'sb', 'sc', 'sd', 'se', 'sg', 'sh', 'si', 'sj', 'sk', 'sl', 'sm', 'sn', 'so', 'sr', 'st', 'su', 'sv', 'sy', 'sz', 'tc', 'td', 'tel', 'tf', 'tg', 'th', 'tj', 'tk', 'tl', 'tm', 'tn', 'to', 'tp', 'tr', 'tt', 'tv', 'tw', 'tz', 'ua', 'ug', 'uk', 'us', 'uy', 'uz', 'va', 'vc', 've', 'vg', 'vi', 'vn', 'vu', 'wf', 'ws', 'xn', 'ye', 'yt', 'za', 'zm', 'zw'
-    url = re.sub('^.*://', '', url).split('/')[0].lower()
-    domain = []
-    for section in url.split('.'):
-        if section in suffixes:
-            domain.append(section)
-        else:
-            domain = [section]
-    return '.'.join(domain)
+    host = url_host(url)
+    if is_address(host):
+        return host
+    return default_list().registered_domain(host)
+
+def extract_domains(urls):
+    """Yield ``extract_domain`` of each URL in ``urls``, remembering the
+    domain of hosts seen recently.
+    """
+    suffixes = default_list()
+    domains = {}
+    for url in urls:
+        host = url_host(url)
+        domain = domains.get(host)
+        if domain is None:
+            if is_address(host):
+                domain = host
+            else:
+                domain = suffixes.registered_domain(host)
+            if len(domains) >= 100000:
+                domains.clear()
+            domains[host] = domain
+        yield domain
+
+def url_host(url):
+    """Return the lower case hostname in ``url``, without scheme, user,
+    port or path; ``url`` may also be a bare hostname.
+    """
+    start = url.find('://')
+    if start != -1:
+        url = url[start + 3:]
+    for sep in '/?#':
+        end = url.find(sep)
+        if end != -1:
+            url = url[:end]
+    url = url.rpartition('@')[2]
+    if url.startswith('['):
+        return url[1:url.find(']')].lower() # IPv6 literal
+    if url.count(':') == 1:
+        url = url.partition(':')[0]
+    return url.strip().rstrip('.').lower()
 
+def is_address(host):
+    """Return True if ``host`` is an IPv4 or IPv6 address."""
+    return ':' in host or host.replace('.', '').isdigit()
 
 if __name__ == '__main__':
     try:
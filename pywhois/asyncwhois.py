@@ -0,0 +1,343 @@
+# asyncwhois.py - Event-driven whois client for bulk lookups
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Run many whois lookups concurrently on a single asyncore event loop.
+
+``AsyncNICClient`` mirrors ``NICClient``: the first server is picked by
+``NICClient.lookup_server``/``choose_server``, queries are formatted with
+``NICClient.format_query`` and referrals are followed through
+``NICClient.findwhois_server``. A server's addresses are tried in turn,
+alternating address families, until one accepts the connection. Instead
+of blocking, each lookup takes a callback, and ``run()`` drives every
+open connection until all lookups are done. At most ``concurrency``
+connections are open at any time. Given a ``ratelimit.ServerScheduler``,
+queries over a server's budget wait on a timer without holding one of
+those connections. Every exchange fills in a ``metrics.HopTrace``, kept
+in the hops of the response and passed to the ``hooks``, as with
+``NICClient``.
+
+    >>> for url, entry, error in whois_many(urls, concurrency=200):
+    ...     print url, error or entry.expiration_date
+"""
+
+import sys
+import time
+import heapq
+import socket
+import asyncore
+from collections import deque
+
+from parser import WhoisEntry
+from whois import NICClient, ResponseTooLarge, WhoisResponse, Hop
+from metrics import HopTrace
+from resolver import interleave
+
+
+class WhoisExchange(asyncore.dispatcher):
+    """One query/reply exchange with one whois server, at the first of
+    ``addresses`` (a list of ``(family, sockaddr)``) that accepts the
+    connection, noted in ``trace``. ``callback(response, error, trace)``
+    is called once it is over.
+    """
+
+    def __init__(self, client, hostname, addresses, data, callback, trace):
+        asyncore.dispatcher.__init__(self, map=client.map)
+        self.client = client
+        self.hostname = hostname
+        self.trace = trace
+        self.addresses = list(addresses)
+        self.data = data
+        self.callback = callback
+        self.chunks = []
+        self.size = 0
+        self.tail = ''
+        self.marker = client.nic.completion_markers.get(hostname)
+        self.connect_next()
+
+    def __hash__(self):
+        # dispatcher hands unknown attributes, __hash__ included, to its
+        # socket; keep the hash of an exchange fixed across reconnects so
+        # it can be found in AsyncNICClient.active
+        return id(self)
+
+    def connect_next(self):
+        family, sockaddr = self.addresses.pop(0)
+        self.out = self.data
+        self.error = None
+        self.begin = self.last = time.time()
+        self.trace.address = sockaddr[0]
+        self.create_socket(family, socket.SOCK_STREAM)
+        try:
+            self.connect(sockaddr)
+        except socket.error, e:
+            self.error = e
+            self.finish()
+
+    def deadline(self):
+        """Time at which this exchange gives up waiting for data."""
+        client = self.client
+        if not self.connected:
+            wait = self.begin + client.connect_timeout
+        elif self.chunks:
+            wait = self.last + client.idle_timeout
+        else:
+            wait = self.begin + client.first_byte_timeout
+        return min(wait, self.begin + client.total_timeout)
+
+    def handle_connect(self):
+        self.trace.connected = time.time()
+
+    def writable(self):
+        return not self.connected or bool(self.out)
+
+    def handle_write(self):
+        sent = self.send(self.out)
+        self.out = self.out[sent:]
+        self.trace.bytes_sent += sent
+
+    def handle_read(self):
+        d = self.recv(4096)
+        if d:
+            self.chunks.append(d)
+            self.size += len(d)
+            self.last = time.time()
+            trace = self.trace
+            if trace.first_byte is None:
+                trace.first_byte = self.last
+            trace.last_byte = self.last
+            trace.bytes_received += len(d)
+            limit = self.client.nic.max_response_size
+            if limit is not None and self.size > limit:
+                self.chunks = [''.join(self.chunks)[:limit]]
+                if self.client.nic.truncate_response:
+                    trace.truncated = True
+                else:
+                    self.error = ResponseTooLarge(self.hostname, limit, self.chunks[0])
+                    self.chunks = []
+                self.finish()
+            elif self.marker is not None:
+                self.tail = (self.tail + d)[-NICClient.MARKER_WINDOW:]
+                if self.client.nic.is_complete(self.marker, self.tail):
+                    self.finish()
+
+    def handle_close(self):
+        self.finish()
+
+    def handle_error(self):
+        self.error = sys.exc_info()[1]
+        self.finish()
+
+    def finish(self):
+        if self.callback is None:
+            return
+        # refused or timed out before connecting: try the next address
+        retry = not self.connected and self.addresses
+        self.close()
+        if retry:
+            return self.connect_next()
+        callback, self.callback = self.callback, None
+        self.trace.closed = time.time()
+        self.trace.error = self.error
+        for hook in self.client.nic.hooks:
+            hook(self.trace)
+        self.client.exchange_done(self)
+        response = ''.join(self.chunks)
+        if self.error is not None and not response:
+            callback(None, self.error, self.trace)
+        else:
+            callback(response, None, self.trace)
+
+
+class AsyncNICClient(object):
+    """Non-blocking counterpart of ``NICClient``.
+
+    ``whois_lookup`` and ``whois`` take the same arguments as their
+    ``NICClient`` versions plus a ``callback(text, error)``; nothing
+    happens on the network until ``run()`` (or ``poll()``) is called.
+    ``hooks`` get the ``metrics.HopTrace`` of every exchange.
+    """
+
+    def __init__(self, concurrency=100, connect_timeout=10,
+                 first_byte_timeout=30, idle_timeout=2, total_timeout=240,
+                 scheduler=None, max_response_size=None, truncate_response=False,
+                 resolver=None, port=43, hooks=None):
+        self.nic = NICClient(connect_timeout, first_byte_timeout,
+                             idle_timeout, total_timeout, hooks=hooks,
+                             max_response_size=max_response_size,
+                             truncate_response=truncate_response,
+                             resolver=resolver, port=port)
+        self.scheduler = scheduler
+        self.concurrency = concurrency
+        self.connect_timeout = connect_timeout
+        self.first_byte_timeout = first_byte_timeout
+        self.idle_timeout = idle_timeout
+        self.total_timeout = total_timeout
+        self.map = {}
+        self.active = set()
+        self.pending = deque()
+        self.waiting = [] # heap of (start time, seq, query) held back by the scheduler
+        self.seq = 0
+
+    def whois_lookup(self, options, query_arg, flags, callback):
+        """Queue a lookup starting at the server ``NICClient`` would pick."""
+        nichost, flags = self.nic.lookup_server(options, query_arg, flags)
+        if nichost is None:
+            return callback(NICClient.NO_SERVER, None)
+        self.whois(query_arg, nichost, flags, callback)
+
+    def whois(self, query, hostname, flags, callback):
+        """Queue a query to ``hostname``, following the referral when
+        ``flags`` asks for recursion. ``callback`` receives the replies
+        of every server in the chain as a ``WhoisResponse``, as
+        ``NICClient.whois`` returns them.
+        """
+        def done(response, error, trace):
+            if error is not None:
+                return callback(None, error)
+            if self.scheduler is not None:
+                self.scheduler.feedback(hostname, response)
+            nhost = None
+            if flags & NICClient.WHOIS_RECURSE:
+                nhost = self.nic.findwhois_server(response, hostname)
+            if nhost is None:
+                return callback(WhoisResponse([Hop(hostname, response, trace)]), None)
+            def referred(text, error, referred_trace):
+                if error is not None:
+                    return callback(None, error)
+                callback(WhoisResponse([Hop(hostname, response, trace),
+                                        Hop(nhost, text, referred_trace)]), None)
+            # finish lookups already underway before starting new ones
+            self.pending.appendleft((query, nhost, referred, False, 1))
+            self.start_pending()
+        self.pending.append((query, hostname, done, False, 0))
+        self.start_pending()
+
+    def resolve(self, hostname):
+        """Return the ``(family, sockaddr)`` addresses of ``hostname`` in
+        the order to try them. The resolver caches addresses, so the loop
+        only blocks on DNS the first time a server is seen.
+        """
+        addresses = self.nic.resolver.resolve(hostname, self.nic.port)
+        return [(family, sockaddr) for family, socktype, proto, sockaddr
+                in interleave(addresses)]
+
+    def start_pending(self):
+        while self.pending and len(self.active) < self.concurrency:
+            item = self.pending.popleft()
+            query, hostname, callback, reserved, hop = item
+            if self.scheduler is not None and not reserved:
+                delay = self.scheduler.reserve(hostname)
+                if delay > 0:
+                    self.seq += 1
+                    heapq.heappush(self.waiting, (time.time() + delay, self.seq,
+                                                  (query, hostname, callback, True, hop)))
+                    continue
+            trace = HopTrace(query, hostname, hop)
+            trace.start = time.time()
+            try:
+                addresses = self.resolve(hostname)
+            except (socket.error, TypeError), e:
+                trace.error = e
+                for hook in self.nic.hooks:
+                    hook(trace)
+                callback(None, e, trace)
+                continue
+            trace.resolved = time.time()
+            data = self.nic.format_query(query, hostname)
+            exchange = WhoisExchange(self, hostname, addresses, data, callback, trace)
+            if exchange.callback is not None:
+                self.active.add(exchange)
+
+    def exchange_done(self, exchange):
+        self.active.discard(exchange)
+        self.start_pending()
+
+    def poll(self, timeout=1.0):
+        """Run one iteration of the event loop, waiting at most ``timeout``
+        seconds. Returns False once there is nothing left to do.
+        """
+        if not self.active and not self.pending and not self.waiting:
+            return False
+        now = time.time()
+        deadlines = [exchange.deadline() for exchange in self.active]
+        if self.waiting:
+            deadlines.append(self.waiting[0][0])
+        if deadlines:
+            timeout = max(0, min(timeout, min(deadlines) - now))
+        if self.map:
+            asyncore.loop(timeout, True, self.map, 1)
+        else:
+            time.sleep(timeout)
+        now = time.time()
+        for exchange in [e for e in self.active if e.deadline() <= now]:
+            exchange.finish()
+        due = []
+        while self.waiting and self.waiting[0][0] <= now:
+            due.append(heapq.heappop(self.waiting)[2])
+        if due:
+            self.pending.extendleft(reversed(due))
+            self.start_pending()
+        return bool(self.active or self.pending or self.waiting)
+
+    def run(self):
+        """Run the event loop until every queued lookup has completed."""
+        while self.poll():
+            pass
+
+
+def whois_many(urls, concurrency=100, client=None):
+    """Look up every URL in ``urls`` concurrently and yield a
+    ``(url, entry, error)`` tuple for each as soon as it completes.
+
+    ``entry`` is the ``WhoisEntry`` that ``pywhois.whois`` would return,
+    or None if the lookup or parse failed with ``error``. ``urls`` is
+    consumed lazily, so it may be an arbitrarily long iterator.
+    """
+    from pywhois import extract_domain
+    if client is None:
+        client = AsyncNICClient(concurrency)
+    done = deque()
+    def queue(url):
+        domain = extract_domain(url)
+        def callback(text, error):
+            entry = None
+            if error is None:
+                try:
+                    entry = WhoisEntry.load(domain, text)
+                except Exception, e:
+                    error = e
+            done.append((url, entry, error))
+        client.whois_lookup(None, domain, 0, callback)
+
+    urls = iter(urls)
+    exhausted = False
+    while True:
+        while not exhausted and len(client.pending) + len(client.waiting) < client.concurrency:
+            try:
+                queue(urls.next())
+            except StopIteration:
+                exhausted = True
+        busy = client.poll()
+        while done:
+            yield done.popleft()
+        if exhausted and not busy:
+            break
+
+
+def whois_async(url, callback, client):
+    """Queue a ``pywhois.whois`` style lookup on ``client``; ``callback``
+    is called with ``(entry, error)`` once ``client.run()`` gets to it.
+    """
+    from pywhois import extract_domain
+    domain = extract_domain(url)
+    def done(text, error):
+        if error is not None:
+            return callback(None, error)
+        try:
+            entry = WhoisEntry.load(domain, text)
+        except Exception, e:
+            return callback(None, e)
+        callback(entry, None)
+    client.whois_lookup(None, domain, 0, done)
@@ -0,0 +1,225 @@
+# bulk.py - Command line whois lookups for many domains at once
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Look up a list of domains and stream the results as JSON Lines.
+
+    python -m pywhois.bulk [options] [file]
+
+Domains (or URLs) are read one per line from ``file``, or from standard
+input when no file is given, and looked up by a pool of worker threads.
+One JSON object is written to standard output for each domain as soon
+as its lookup finishes, so output order follows completion order:
+
+    {"query": ..., "domain": ..., "servers": [...], "elapsed": ...,
+     "hops": [...], "fields": {...}, "text": ..., "error": null,
+     "message": null}
+
+``hops`` has the timings of each exchange in the referral chain, as
+given by ``metrics.HopTrace.as_dict``.
+
+``error`` holds the exception class name when the lookup or the parse
+failed. Input is read lazily and only a few lines per worker are in
+flight at a time, so memory use does not grow with the input.
+
+With ``--record FILE`` every server exchange is appended to an archive;
+``--replay FILE`` runs the lookups against that archive instead of the
+network, to reproduce or profile a run (see transport.py). With
+``--store FILE`` the raw replies are archived in a response store (see
+store.py).
+"""
+
+import sys
+import time
+import json
+import optparse
+import threading
+import Queue
+
+from parser import WhoisEntry
+from whois import NICClient
+from metrics import HopTrace
+from cache import SqliteCache, SingleFlight
+from transport import RecordingTransport, ReplayTransport
+from store import ResponseStore
+
+
+# results between writes of the store's new replies to its index, each as a run
+STORE_FLUSH_EVERY = 10000
+
+
+def to_unicode(value):
+    """Decode the byte strings in ``value`` for JSON, replacing bad bytes."""
+    if isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+    if isinstance(value, (list, tuple)):
+        return [to_unicode(v) for v in value]
+    if isinstance(value, dict):
+        return dict((k, to_unicode(v)) for k, v in value.items())
+    return value
+
+
+def error_name(e):
+    """Return the qualified class name of exception ``e``."""
+    cls = e.__class__
+    if cls.__module__ == 'exceptions':
+        return cls.__name__
+    return '%s.%s' % (cls.__module__, cls.__name__)
+
+
+def lookup(query, flags=0, cache=None, include_text=True, hooks=(), single_flight=None,
+           transport=None, store=None, resolver=None):
+    """Look up one domain or URL and return its result record, archiving
+    the raw reply in ``store`` (a ``store.ResponseStore``) if given and
+    fetched by this lookup, not taken from the cache or another thread's
+    lookup. Server names are resolved with ``resolver`` when given.
+    """
+    from pywhois import extract_domain
+    record = {'query': query, 'domain': None, 'servers': [], 'elapsed': None,
+              'hops': [], 'fields': None, 'text': None, 'error': None, 'message': None}
+    traces = []
+    client = NICClient(cache=cache, hooks=[traces.append] + list(hooks),
+                       single_flight=single_flight, transport=transport,
+                       resolver=resolver)
+    begin = time.time()
+    try:
+        domain = record['domain'] = extract_domain(query)
+        text = client.whois_lookup(None, domain, flags)
+        # our hooks ran only if this thread talked to the servers
+        fetched = bool(traces)
+        # a lookup shared with another thread ran that thread's hooks,
+        # not ours; the response knows its exchanges either way
+        if getattr(text, 'hops', None):
+            traces = [hop.trace or HopTrace(None, hop.hostname, i)
+                      for i, hop in enumerate(text.hops)]
+        if store is not None and fetched:
+            store.append(domain, text)
+        if include_text:
+            record['text'] = text
+        entry = WhoisEntry.load(domain, text)
+        record['fields'] = dict((attr, getattr(entry, attr)) for attr in entry.attrs())
+    except Exception, e:
+        record['error'] = error_name(e)
+        record['message'] = str(e)
+    record['elapsed'] = round(time.time() - begin, 6)
+    for trace in traces:
+        hop = trace.as_dict()
+        del hop['query']
+        record['hops'].append(hop)
+        record['servers'].append(trace.hostname)
+    return to_unicode(record)
+
+
+def run(queries, out, workers=10, flags=0, cache=None, include_text=True, transport=None,
+        store=None, resolver=None):
+    """Look up every query in ``queries`` on ``workers`` threads, writing
+    one JSON line per result to ``out`` as each one finishes. Replies
+    archived in ``store`` are written to its index every
+    ``STORE_FLUSH_EVERY`` results, so the unindexed ones stay few.
+    """
+    todo = Queue.Queue(workers * 2)
+    done = Queue.Queue(workers * 2)
+    # queries for subdomains of one domain often run at the same time
+    single_flight = SingleFlight()
+
+    def work():
+        while True:
+            query = todo.get()
+            if query is None:
+                done.put(None)
+                break
+            done.put(lookup(query, flags, cache, include_text, single_flight=single_flight,
+                            transport=transport, store=store, resolver=resolver))
+
+    def feed():
+        for query in queries:
+            query = query.strip()
+            if query:
+                todo.put(query)
+        for i in range(workers):
+            todo.put(None)
+
+    threads = [threading.Thread(target=work) for i in range(workers)]
+    threads.append(threading.Thread(target=feed))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    running = workers
+    written = 0
+    while running:
+        # a timeout keeps the main thread responsive to KeyboardInterrupt
+        try:
+            record = done.get(True, 1)
+        except Queue.Empty:
+            continue
+        if record is None:
+            running -= 1
+            continue
+        out.write(json.dumps(record) + '\n')
+        out.flush()
+        written += 1
+        if store is not None and written % STORE_FLUSH_EVERY == 0:
+            store.flush()
+
+
+def parse_command_line(argv):
+    usage = "usage: %prog [options] [file]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option("-w", "--workers", action="store", type="int",
+                      dest="workers", default=10,
+                      help="Number of lookups to run at once (default 10)")
+    parser.add_option("-c", "--cache", action="store", type="string",
+                      dest="cache",
+                      help="Cache responses in this sqlite database")
+    parser.add_option("-Q", "--quick", action="store_true",
+                      dest="b_quicklookup",
+                      help="Perform quick lookups, without following referrals")
+    parser.add_option("-n", "--no-text", action="store_false",
+                      dest="include_text", default=True,
+                      help="Leave the raw whois text out of the output")
+    parser.add_option("--record", action="store", type="string",
+                      dest="record", metavar="FILE",
+                      help="Append every server exchange to this archive")
+    parser.add_option("--replay", action="store", type="string",
+                      dest="replay", metavar="FILE",
+                      help="Answer from this archive instead of the network")
+    parser.add_option("--replay-timing", action="store_true",
+                      dest="replay_timing",
+                      help="Take as long as the recorded exchanges did")
+    parser.add_option("-s", "--store", action="store", type="string",
+                      dest="store", metavar="FILE",
+                      help="Archive the raw replies in this response store")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    (options, args) = parse_command_line(argv)
+    flags = 0
+    if options.b_quicklookup:
+        flags |= NICClient.WHOIS_QUICK
+    cache = None
+    if options.cache:
+        cache = SqliteCache(options.cache)
+    transport = None
+    if options.replay:
+        transport = ReplayTransport(options.replay, options.replay_timing)
+    elif options.record:
+        transport = RecordingTransport(options.record)
+    store = None
+    if options.store:
+        store = ResponseStore(options.store)
+    if args and args[0] != '-':
+        queries = open(args[0])
+    else:
+        queries = sys.stdin
+    try:
+        run(queries, sys.stdout, options.workers, flags, cache, options.include_text,
+            transport, store)
+    finally:
+        if store is not None:
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,513 @@
+# cache.py - Caching of raw whois responses
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Caches for raw whois text, used by ``NICClient.whois_lookup``.
+
+Entries are keyed by ``(query, server, flags)`` and expire after ``ttl``
+seconds. Replies saying the object does not exist are kept for the
+shorter ``negative_ttl``, since those are the ones likely to change.
+Blank replies (from a server that timed out or reset the connection)
+and rate limiting messages say nothing about the object; they are kept
+for ``error_ttl`` seconds, not at all by default.
+Every cache counts its hits and misses.
+
+``NetblockCache`` serves IP address lookups from the address block
+given in an earlier reply, so one lookup answers for a whole allocation.
+``SingleFlight`` makes concurrent lookups of the same query share one
+exchange.
+
+    >>> client = NICClient(cache=MemoryCache(maxsize=50000))
+    >>> client = NICClient(cache=SqliteCache('/var/cache/pywhois.db'))
+    >>> client = NICClient(netblock_cache=NetblockCache(maxsize=100000))
+    >>> client = NICClient(single_flight=SingleFlight())
+"""
+
+import re
+import sys
+import json
+import time
+import socket
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from ratelimit import ServerScheduler
+
+
+# Replies the parsers in parser.py treat as "no such domain".
+NEGATIVE_MARKERS = [
+    'No match for "',
+    'No match.',
+    'NO MATCH',
+    'NOT FOUND',
+    'Not found:',
+    'No entries found',
+    'No Data Found',
+    'Domain not found',
+    'no matching record',
+    'No whois server is known for this kind of object.',
+]
+
+
+def is_negative(text):
+    """Return True if ``text`` says the queried object does not exist."""
+    stripped = text.strip()
+    if stripped in ('No match', 'No found', 'No information available'):
+        return True
+    for marker in NEGATIVE_MARKERS:
+        if marker in text:
+            return True
+    return False
+
+
+THROTTLE_RE = re.compile('|'.join(ServerScheduler.THROTTLE_PATTERNS), re.I)
+
+
+def is_transient(text):
+    """Return True if ``text`` is a blank reply or a rate limiting
+    message rather than an answer about the queried object.
+    """
+    return not text.strip() or THROTTLE_RE.search(text) is not None
+
+
+class WhoisCache(object):
+    """Base class for whois response caches.
+
+    Subclasses implement ``lookup``, ``store`` and ``__len__``; callers
+    use ``get`` and ``set``, which keep the counters and pick the TTL.
+    """
+
+    def __init__(self, ttl=86400, negative_ttl=3600, error_ttl=0):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached text for ``key``, or None."""
+        text = self.lookup(key, time.time())
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def set(self, key, text):
+        """Cache ``text`` under ``key``."""
+        if is_transient(text):
+            ttl = self.error_ttl
+        elif is_negative(text):
+            ttl = self.negative_ttl
+        else:
+            ttl = self.ttl
+        if ttl > 0:
+            self.store(key, text, time.time() + ttl)
+
+    def stats(self):
+        """Return the hit/miss counters and the number of entries."""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
+
+    def lookup(self, key, now):
+        raise NotImplementedError
+
+    def store(self, key, text, expires):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemoryCache(WhoisCache):
+    """In-process LRU cache holding at most ``maxsize`` responses."""
+
+    def __init__(self, maxsize=10000, ttl=86400, negative_ttl=3600, error_ttl=0):
+        WhoisCache.__init__(self, ttl, negative_ttl, error_ttl)
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def lookup(self, key, now):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                return None
+            self.entries[key] = entry # most recently used goes last
+            return entry[0]
+
+    def store(self, key, text, expires):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (text, expires)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SqliteCache(WhoisCache):
+    """Cache kept in an sqlite database at ``path``, surviving restarts
+    and shareable between processes on one host. The replies of each
+    server along a referral chain are kept apart, so a cached
+    ``WhoisResponse`` comes back with its hops.
+    """
+
+    def __init__(self, path, ttl=86400, negative_ttl=3600, error_ttl=0):
+        WhoisCache.__init__(self, ttl, negative_ttl, error_ttl)
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS responses '
+                        '(key TEXT PRIMARY KEY, text BLOB, expires REAL, hops TEXT)')
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(responses)')]
+        if 'hops' not in columns:
+            # a database written before hops were kept
+            self.db.execute('ALTER TABLE responses ADD COLUMN hops TEXT')
+        self.db.commit()
+
+    def db_key(self, key):
+        return '\0'.join(str(part) for part in key)
+
+    def lookup(self, key, now):
+        from whois import WhoisResponse, Hop
+        with self.lock:
+            row = self.db.execute('SELECT text, expires, hops FROM responses WHERE key = ?',
+                                  (self.db_key(key),)).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        if row[2] is None:
+            return str(row[0])
+        # hop texts are bytes, kept as latin-1 so they come back as sent
+        return WhoisResponse([Hop(hostname, text.encode('latin-1'), None)
+                              for hostname, text in json.loads(row[2])])
+
+    def store(self, key, text, expires):
+        hops = None
+        if getattr(text, 'hops', None):
+            hops = json.dumps([(hop.hostname, hop.text.decode('latin-1')) for hop in text.hops])
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                            (self.db_key(key), buffer(text), expires, hops))
+            self.db.commit()
+
+    def purge(self):
+        """Delete expired entries."""
+        with self.lock:
+            self.db.execute('DELETE FROM responses WHERE expires <= ?', (time.time(),))
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+class ReferralCache(object):
+    """Remembers which registrar whois server answered for a domain, so
+    thin registries (.com, .net) need not be asked again on a re-query.
+
+    Domains are mapped to their registrar and registrars to their whois
+    server, so a registrar moving its server is picked up for every one
+    of its domains at once. Domains whose registrar is unknown map
+    straight to a server. At most ``maxsize`` domains are remembered, each
+    for ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl=7 * 86400, maxsize=100000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.domains = OrderedDict() # query -> (registrar, server, expires)
+        self.registrars = {} # registrar -> server
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, query):
+        """Return the whois server to ask about ``query`` directly, or None."""
+        with self.lock:
+            entry = self.domains.get(query)
+            if entry is None or entry[2] <= time.time():
+                self.misses += 1
+                return None
+            registrar, server, expires = entry
+            self.hits += 1
+            return self.registrars.get(registrar, server)
+
+    def server_for_registrar(self, registrar):
+        """Return the whois server last seen for ``registrar``, or None."""
+        return self.registrars.get(registrar)
+
+    def learn(self, query, server, registrar=None):
+        """Record that ``server`` (run by ``registrar``) answers for ``query``."""
+        with self.lock:
+            if registrar:
+                self.registrars[registrar] = server
+            self.domains.pop(query, None)
+            self.domains[query] = (registrar, server, time.time() + self.ttl)
+            while len(self.domains) > self.maxsize:
+                self.domains.popitem(last=False)
+
+    def forget(self, query):
+        """Drop ``query``, e.g. after its cached server failed to answer."""
+        with self.lock:
+            self.domains.pop(query, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'domains': len(self.domains), 'registrars': len(self.registrars)}
+
+    def __len__(self):
+        return len(self.domains)
+
+
+# Lines giving the address block a registry reply describes, in the
+# RIPE/APNIC/AFRINIC (inetnum), LACNIC and ARIN (NetRange, CIDR) formats.
+NETBLOCK_RE = re.compile(r'^\s*(?:inetnum|inet6num|NetRange|CIDR):[ \t]*(.+?)\s*$', re.M | re.I)
+
+
+def parse_address(text, pad=False):
+    """Return ``(bits, value)`` for the IPv4 or IPv6 address ``text``, or
+    None if it is not one. ``bits`` is 32 or 128. With ``pad``, IPv4
+    addresses may leave out trailing zero octets, as LACNIC writes them.
+    """
+    text = text.strip()
+    try:
+        if ':' in text:
+            packed = socket.inet_pton(socket.AF_INET6, text)
+        else:
+            octets = text.split('.')
+            if pad:
+                octets += ['0'] * (4 - len(octets))
+            packed = socket.inet_pton(socket.AF_INET, '.'.join(octets))
+    except (socket.error, ValueError):
+        return None
+    value = 0
+    for byte in packed:
+        value = (value << 8) | ord(byte)
+    return len(packed) * 8, value
+
+
+def range_to_prefixes(bits, first, last):
+    """Split the address range ``first``-``last`` into the fewest CIDR
+    blocks, returned as ``(bits, network, prefixlen)`` tuples.
+    """
+    prefixes = []
+    while first <= last:
+        size = bits
+        # widen the block while it stays aligned and inside the range
+        while size > 0:
+            span = 1 << (bits - size + 1)
+            if first & (span - 1) or first + span - 1 > last:
+                break
+            size -= 1
+        prefixes.append((bits, first, size))
+        first += 1 << (bits - size)
+    return prefixes
+
+
+def parse_netblocks(text):
+    """Return the address blocks in registry reply ``text``, each as a list
+    of ``(bits, network, prefixlen)`` CIDR blocks covering it.
+    """
+    blocks = []
+    for match in NETBLOCK_RE.finditer(text):
+        for part in match.group(1).split(','):
+            if '/' in part:
+                address, prefixlen = part.split('/', 1)
+                address = parse_address(address, pad=True)
+                if address is None or not prefixlen.strip().isdigit():
+                    continue
+                bits, network = address
+                prefixlen = int(prefixlen)
+                if prefixlen > bits:
+                    continue
+                network &= ~((1 << (bits - prefixlen)) - 1)
+                blocks.append([(bits, network, prefixlen)])
+            elif '-' in part:
+                first, last = [parse_address(a, pad=True) for a in part.split('-', 1)]
+                if first is None or last is None or first[0] != last[0]:
+                    continue
+                blocks.append(range_to_prefixes(first[0], first[1], last[1]))
+    return blocks
+
+
+class NetblockCache(object):
+    """Cache of IP address whois replies, keyed by the address block each
+    reply describes rather than by the address queried.
+
+    ``learn`` finds the most specific block in a reply that holds the
+    queried address and files the reply under it in a binary radix trie;
+    ``get`` returns the reply of the most specific live block holding an
+    address. At most ``maxsize`` blocks are kept, each for ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl=86400, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.roots = {32: [None, None, None], 128: [None, None, None]}
+        self.blocks = OrderedDict() # (bits, network, prefixlen) -> (text, expires)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, query):
+        """Return the cached reply covering address ``query``, or None.
+        Queries that are not IP addresses are never found.
+        """
+        address = parse_address(query)
+        if address is None:
+            return None
+        bits, value = address
+        now = time.time()
+        with self.lock:
+            node = self.roots[bits]
+            found = None
+            for depth in range(bits + 1):
+                key = node[2]
+                if key is not None and self.blocks[key][1] > now:
+                    found = key
+                if depth == bits:
+                    break
+                node = node[(value >> (bits - depth - 1)) & 1]
+                if node is None:
+                    break
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry = self.blocks.pop(found)
+            self.blocks[found] = entry # most recently used goes last
+            return entry[0]
+
+    def learn(self, query, text):
+        """File ``text``, the reply for address ``query``, under the most
+        specific block in it that holds ``query``. Returns the CIDR blocks
+        it was filed under, empty if the reply names no such block.
+        """
+        address = parse_address(query)
+        if address is None:
+            return []
+        bits, value = address
+        best = None
+        for prefixes in parse_netblocks(text):
+            for prefix in prefixes:
+                if prefix[0] == bits and value >> (bits - prefix[2]) == prefix[1] >> (bits - prefix[2]):
+                    if best is None or prefix[2] > best[1][2]:
+                        best = prefixes, prefix
+        if best is None:
+            return []
+        # a block given as a range files under each CIDR block of it
+        prefixes = best[0]
+        expires = time.time() + self.ttl
+        with self.lock:
+            for key in prefixes:
+                self.insert(key, (text, expires))
+            while len(self.blocks) > self.maxsize:
+                self.remove(self.blocks.popitem(last=False)[0])
+        return prefixes
+
+    def insert(self, key, entry):
+        bits, network, prefixlen = key
+        node = self.roots[bits]
+        for depth in range(prefixlen):
+            bit = (network >> (bits - depth - 1)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        node[2] = key
+        self.blocks.pop(key, None)
+        self.blocks[key] = entry
+
+    def remove(self, key):
+        """Unlink ``key`` from the trie, pruning the nodes left empty."""
+        bits, network, prefixlen = key
+        path = [self.roots[bits]]
+        for depth in range(prefixlen):
+            node = path[-1][(network >> (bits - depth - 1)) & 1]
+            if node is None:
+                return
+            path.append(node)
+        path[-1][2] = None
+        for depth in range(prefixlen, 0, -1):
+            node = path[depth]
+            if node != [None, None, None]:
+                break
+            path[depth - 1][(network >> (bits - depth)) & 1] = None
+
+    def clear(self):
+        with self.lock:
+            self.roots = {32: [None, None, None], 128: [None, None, None]}
+            self.blocks.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.blocks)}
+
+    def __len__(self):
+        return len(self.blocks)
+
+
+class Flight(object):
+    """A call in progress that other callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls with the same key into one.
+
+    The first caller of ``do`` for a key runs the function; callers
+    arriving while it runs wait and get its result, or its exception.
+    ``shared`` counts the calls saved that way.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.calls = 0
+        self.shared = 0
+        self.lock = threading.Lock()
+
+    def do(self, key, function, *args):
+        """Return ``function(*args)``, run once for all concurrent callers
+        with the same ``key``.
+        """
+        with self.lock:
+            self.calls += 1
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = Flight()
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error[0], flight.error[1], flight.error[2]
+            return flight.result
+        try:
+            flight.result = function(*args)
+        except Exception:
+            flight.error = sys.exc_info()
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self.flights)}
@@ -0,0 +1,139 @@
+# metrics.py - Timing of whois exchanges
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Timing records for whois lookups, and counters built from them.
+
+``NICClient`` fills in a ``HopTrace`` for every server it talks to and
+passes it to each of its hooks once the exchange is over:
+
+    >>> stats = LatencyStats()
+    >>> client = NICClient(hooks=[stats])
+    >>> client.add_hook(lambda trace: log.debug('%r', trace.as_dict()))
+
+``LatencyStats`` is such a hook: it keeps per-server counters and
+latency histograms that ``snapshot()`` returns as plain data, ready to
+be pushed to a metrics system.
+"""
+
+import threading
+
+
+class HopTrace(object):
+    """Timestamps and byte counts for one exchange with one server.
+
+    ``hop`` is 0 for the first server of a lookup and counts up along the
+    referral chain. Timestamps are ``time.time()`` values, or None for the
+    steps that were never reached.
+    """
+
+    PHASES = ('resolve', 'connect', 'wait', 'transfer', 'idle')
+
+    def __init__(self, query, hostname, hop=0):
+        self.query = query
+        self.hostname = hostname
+        self.hop = hop
+        self.address = None
+        self.start = None
+        self.resolved = None
+        self.connected = None
+        self.first_byte = None
+        self.last_byte = None
+        self.closed = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error = None
+        # set when the reply was cut at NICClient.max_response_size
+        self.truncated = False
+
+    def durations(self):
+        """Return the seconds spent in each phase reached: DNS resolution,
+        TCP connect, waiting for the first byte, receiving the rest of the
+        reply, and waiting out the end of the connection after it.
+        """
+        marks = [self.start, self.resolved, self.connected,
+                 self.first_byte, self.last_byte, self.closed]
+        durations = {}
+        for phase, begin, end in zip(HopTrace.PHASES, marks, marks[1:]):
+            if begin is not None and end is not None:
+                durations[phase] = end - begin
+        return durations
+
+    def total(self):
+        """Seconds from the start of the exchange to its end, or None."""
+        end = self.closed or self.last_byte or self.connected or self.resolved
+        if self.start is None or end is None:
+            return None
+        return end - self.start
+
+    def as_dict(self):
+        data = dict(self.__dict__)
+        data['durations'] = self.durations()
+        data['total'] = self.total()
+        if self.error is not None:
+            data['error'] = repr(self.error)
+        return data
+
+    def __repr__(self):
+        return '<HopTrace %s hop=%d total=%r>' % (self.hostname, self.hop, self.total())
+
+
+class LatencyStats(object):
+    """Hook aggregating ``HopTrace`` records per server.
+
+    For each hostname it counts exchanges, errors and bytes, sums the time
+    spent in each phase, and sorts total exchange times into the histogram
+    ``buckets`` (upper bounds in seconds, like Prometheus' ``le``).
+    """
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or LatencyStats.BUCKETS)
+        self.servers = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, trace):
+        self.record(trace)
+
+    def record(self, trace):
+        total = trace.total()
+        with self.lock:
+            stats = self.servers.get(trace.hostname)
+            if stats is None:
+                stats = self.servers[trace.hostname] = {
+                    'count': 0, 'errors': 0, 'bytes_sent': 0, 'bytes_received': 0,
+                    'seconds': dict((phase, 0.0) for phase in HopTrace.PHASES),
+                    'histogram': [0] * len(self.buckets),
+                }
+            stats['count'] += 1
+            if trace.error is not None:
+                stats['errors'] += 1
+            stats['bytes_sent'] += trace.bytes_sent
+            stats['bytes_received'] += trace.bytes_received
+            for phase, seconds in trace.durations().items():
+                stats['seconds'][phase] += seconds
+            if total is not None:
+                for i, bound in enumerate(self.buckets):
+                    if total <= bound:
+                        stats['histogram'][i] += 1
+                        break
+
+    def snapshot(self):
+        """Return a copy of the counters: a dict mapping each hostname to
+        its counts, per-phase seconds and ``histogram`` as a list of
+        ``(upper bound, count)`` pairs.
+        """
+        with self.lock:
+            snapshot = {}
+            for hostname, stats in self.servers.items():
+                copy = dict(stats)
+                copy['seconds'] = dict(stats['seconds'])
+                copy['histogram'] = zip(self.buckets, stats['histogram'])
+                snapshot[hostname] = copy
+            return snapshot
+
+    def reset(self):
+        with self.lock:
+            self.servers.clear()
@@ -6,47 +6,237 @@
 
 import re
 import time
+import datetime
+import sre_parse
+import sre_constants
    
 
 class PywhoisError(Exception):
     pass
 
 
-def cast_date(date_str):
+DATE_FORMATS = [
+    '%d-%b-%Y',                 # 02-jan-2000
+    '%Y-%m-%d',                 # 2000-01-02
+    '%Y.%m.%d %H:%M:%S',        # 2006.06.12 15:53:14 (.pl)
+    '%Y.%m.%d',                 # 2002.12.25 (.ru)
+    '%Y-%b-%d',                 # 2008-Feb-5 (.nu)
+    '%d.%m.%Y %H:%M:%S',        # 18.05.2004 18:15:00 (.cz)
+    '%d.%m.%Y',                 # 21.5.1998 (.fi)
+    '%d-%b-%Y %H:%M:%S %Z',     # 24-Jul-2009 13:20:03 UTC
+    '%Y-%m-%d %H:%M',           # 2000-03-07 00:00 (.cn)
+    '%a %b %d %H:%M:%S %Z %Y',  # Tue Jun 21 23:59:59 GMT 2011
+    '%d %b %Y %H:%M %Z',        # 31 Dec 1999 05:00 PST (.fm)
+    '%Y-%m-%dT%H:%M:%S',        # 2007-01-26T19:10:31
+    '%Y%m%d%H%M%S',             # 20110209194637 (.ua)
+    '%Y%m%d',                   # 20020702 (isoc.org.il)
+    '%m/%d/%Y',                 # 05/14/2002
+    '%d/%m/%Y',                 # 13/09/2004 (.fr)
+    '%Y/%m/%d',                 # 2004/10/14 (.jp)
+    '%Y. %m. %d.',              # 2007. 04. 23. (.kr)
+]
+
+# loose regex for each strptime directive; a string that does not match
+# the translated format cannot be parsed by strptime with it either
+_DIRECTIVE_SHAPES = {
+    'd': r' ?\d{1,2}', 'm': r'\d{1,2}', 'Y': r'\d{4}',
+    'H': r'\d{1,2}', 'M': r'\d{1,2}', 'S': r'\d{1,2}',
+    'b': r'[^\W\d_]+', 'a': r'[^\W\d_]+', 'Z': r'\w+',
+}
+
+def _format_shape(format):
+    """Compile a regex matching the strings ``format`` might parse."""
+    shape = []
+    for i, part in enumerate(format.split('%')):
+        if i:
+            shape.append(_DIRECTIVE_SHAPES[part[0]])
+            part = part[1:]
+        shape.append(re.sub(r'\\\s+', r'\s+', re.escape(part)))
+    return re.compile(''.join(shape) + r'\Z', re.I | re.U)
+
+_date_shapes = [(format, _format_shape(format)) for format in DATE_FORMATS]
+
+# the ISO 8601 shapes in DATE_FORMATS, parsed without strptime
+_iso_date = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})'
+                       r'(?:( )(\d{1,2}):(\d{1,2})|(T)(\d{1,2}):(\d{1,2}):(\d{1,2}))?\Z')
+
+# hint -> format that last parsed a date given with that hint
+_last_format = {}
+
+
+def cast_date(date_str, hint=None):
     """Convert any date string found in WHOIS to a time object.
+
+    ``hint`` (usually the TLD of the domain) groups dates written the
+    same way: the format that last worked for a hint is tried first next
+    time. Dates from different registries must not share a hint, or one
+    registry's dates would change how another's ambiguous ones read.
     """
-    known_formats = [
-        '%d-%b-%Y', 				# 02-jan-2000
-        '%Y-%m-%d', 				# 2000-01-02
-        '%Y.%m.%d %H:%M:%S',        # 2006.06.12 15:53:14 (.pl)
-        '%Y.%m.%d',                 # 2002.12.25 (.ru)
-	'%Y-%b-%d',                 # 2008-Feb-5 (.nu)
-        '%d.%m.%Y %H:%M:%S',        # 18.05.2004 18:15:00 (.cz)
-        '%d.%m.%Y',                 # 21.5.1998 (.fi)
-        '%d-%b-%Y %H:%M:%S %Z',     # 24-Jul-2009 13:20:03 UTC
-        '%Y-%m-%d %H:%M',           # 2000-03-07 00:00 (.cn)
-        '%a %b %d %H:%M:%S %Z %Y',  # Tue Jun 21 23:59:59 GMT 2011
-	'%d %b %Y %H:%M %Z',        # 31 Dec 1999 05:00 PST (.fm)
-        '%Y-%m-%dT%H:%M:%S',        # 2007-01-26T19:10:31
-        '%Y%m%d%H%M%S',             # 20110209194637 (.ua)
-        '%Y%m%d',                   # 20020702 (isoc.org.il)
-        '%m/%d/%Y',                 # 05/14/2002
-        '%d/%m/%Y',                 # 13/09/2004 (.fr)
-        '%Y/%m/%d',                 # 2004/10/14 (.jp)
-        '%Y. %m. %d.'               # 2007. 04. 23. (.kr)
-    ]
-
-    for format in known_formats:
+    date_str = date_str.strip()
+    match = _iso_date.match(date_str)
+    if match:
+        year, month, day, space, hour, minute, t, t_hour, t_minute, second = match.groups()
         try:
-            return time.strptime(date_str.strip(), format)
-        except ValueError, e:
-            pass # Wrong format, keep trying
+            if space:
+                t = datetime.datetime(int(year), int(month), int(day), int(hour), int(minute))
+            elif t:
+                t = datetime.datetime(int(year), int(month), int(day),
+                                      int(t_hour), int(t_minute), int(second))
+            else:
+                t = datetime.datetime(int(year), int(month), int(day))
+            return t.timetuple()
+        except ValueError:
+            pass # leave the odd cases (leap seconds, bad days) to strptime
+
+    shapes = _date_shapes
+    last = _last_format.get(hint)
+    if last is not None:
+        shapes = [last] + shapes
+    for format, shape in shapes:
+        if shape.match(date_str) is None:
+            continue
+        try:
+            result = time.strptime(date_str, format)
+        except ValueError:
+            continue # Wrong format, keep trying
+        if hint is not None:
+            _last_format[hint] = (format, shape)
+        return result
     return None
 
 
+def literal_prefix(pattern):
+    """Return the literal text every match of ``pattern`` starts with,
+    or '' if it does not start with a fixed string.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (sre_constants.error, OverflowError):
+        return ''
+    if parsed.pattern.flags & (sre_constants.SRE_FLAG_IGNORECASE | sre_constants.SRE_FLAG_VERBOSE):
+        return ''
+    prefix = []
+    for op, av in parsed:
+        if op != sre_constants.LITERAL:
+            break
+        prefix.append(unichr(av) if av > 255 else chr(av))
+    return ''.join(prefix)
+
+
+class FieldExtractor(object):
+    """Extracts every field of a parser's regex table in one pass.
+
+    Most patterns start with a fixed key such as ``'Registrar:'``. Those
+    keys are combined into one scanner, and at each key it finds only the
+    patterns starting with that key are tried. Keys that occur inside or
+    overlap another key (``'Registrar:'`` in ``'Sponsoring Registrar:'``)
+    are checked at the offsets where they can start. The values are the
+    same ``re.findall`` gives for each pattern separately. Patterns without
+    a fixed key, like the e-mail address one, still run ``findall``.
+    """
+
+    def __init__(self, regex):
+        self.fields = list(regex)
+        self.others = []
+        by_prefix = {}
+        for attr, pattern in regex.items():
+            compiled = re.compile(pattern)
+            prefix = literal_prefix(pattern)
+            if prefix:
+                by_prefix.setdefault(prefix, []).append((attr, compiled))
+            else:
+                self.others.append((attr, compiled))
+        # longest first, so the scanner reports the longest key at a position
+        prefixes = sorted(by_prefix, key=len, reverse=True)
+        self.candidates = {}
+        self.inner = {}
+        for p in prefixes:
+            # patterns whose key starts where ``p`` starts
+            self.candidates[p] = [f for q in prefixes if p.startswith(q) for f in by_prefix[q]]
+            # keys that may start part way through ``p``
+            self.inner[p] = [(offset, q) for offset in range(1, len(p)) for q in prefixes
+                             if q.startswith(p[offset:offset + len(q)])]
+        self.scanner = None
+        if prefixes:
+            self.scanner = re.compile('|'.join(re.escape(p) for p in prefixes))
+
+    def extract(self, text):
+        """Return a dict mapping each field to the list of its values."""
+        results = {}
+        for attr in self.fields:
+            results[attr] = []
+        for attr, compiled in self.others:
+            results[attr] = compiled.findall(text)
+        if self.scanner is None:
+            return results
+        ends = {} # like findall, a field's matches may not overlap
+        for hit in self.scanner.finditer(text):
+            pos = hit.start()
+            key = hit.group()
+            self.match_at(text, pos, key, results, ends)
+            for offset, inner in self.inner[key]:
+                if text.startswith(inner, pos + offset):
+                    self.match_at(text, pos + offset, inner, results, ends)
+        return results
+
+    def match_at(self, text, pos, key, results, ends):
+        for attr, compiled in self.candidates[key]:
+            if pos < ends.get(attr, 0):
+                continue
+            match = compiled.match(text, pos)
+            if match is None:
+                continue
+            if compiled.groups == 0:
+                results[attr].append(match.group())
+            elif compiled.groups == 1:
+                results[attr].append(match.groups('')[0])
+            else:
+                results[attr].append(match.groups(''))
+            ends[attr] = max(match.end(), pos + 1)
+
+
+_extractors = {}
+
+def get_extractor(regex):
+    """Return the ``FieldExtractor`` for the regex table ``regex``,
+    compiling it the first time that table is seen.
+    """
+    try:
+        return _extractors[id(regex)][1]
+    except KeyError:
+        extractor = FieldExtractor(regex)
+        # keep ``regex`` alive so its id is not reused
+        _extractors[id(regex)] = (regex, extractor)
+        return extractor
+
+
+# public suffix (e.g. 'com' or 'co.uk') -> WhoisEntry subclass parsing it
+parsers = {}
+
+class WhoisEntryType(type):
+    """Compiles the regex table of each parser class as it is defined,
+    and registers the class for the suffixes listed in its ``tlds``.
+    Parsers defined outside this module register the same way.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        type.__init__(cls, name, bases, namespace)
+        regex = namespace.get('regex', namespace.get('_regex'))
+        if regex is not None:
+            get_extractor(regex)
+        for tld in namespace.get('tlds', ()):
+            parsers[tld.lower()] = cls
+
+
 class WhoisEntry(object):
     """Base class for parsing a Whois entries.
     """
+    __metaclass__ = WhoisEntryType
+
+    # suffixes this class parses, without the leading dot; child classes
+    # set this to be picked by load()
+    tlds = ()
+
     # regular expressions to extract domain data from whois profile
     # child classes will override this
     _regex = {
@@ -62,6 +252,9 @@ class WhoisEntry(object):
         'emails':           '[\w.-]+@[\w.-]+\.[\w]{2,4}', # list of email addresses
     }
 
+    # replies of the servers before the authoritative one, see load()
+    fallback = ()
+
     def __init__(self, domain, text, regex=None):
         self.domain = domain
         self.text = text
@@ -70,13 +263,24 @@ class WhoisEntry(object):
 
 
     def __getattr__(self, attr):
-        """The first time an attribute is called it will be calculated here.
-        The attribute is then set to be accessed directly by subsequent calls.
+        """The first time an attribute is called all of them are calculated
+        here. The attributes are then set to be accessed directly by
+        subsequent calls.
         """
         whois_regex = self._regex.get(attr)
         if whois_regex:
-            setattr(self, attr, re.findall(whois_regex, self.text))
-            return getattr(self, attr)
+            extractor = get_extractor(self._regex)
+            values = extractor.extract(self.text)
+            # fields the authoritative reply lacks, from the nearest hop having them
+            for text in reversed(self.fallback):
+                missing = [name for name, value in values.items() if not value]
+                if not missing:
+                    break
+                earlier = extractor.extract(text)
+                for name in missing:
+                    values[name] = earlier[name]
+            self.__dict__.update(values)
+            return self.__dict__[attr]
         else:
             raise KeyError('Unknown attribute: %s' % attr)
 
@@ -92,83 +296,60 @@ class WhoisEntry(object):
         return sorted(self._regex.keys())
 
 
+    def get_datetime(self, attr):
+        """Return the first value of the date attribute ``attr`` that
+        ``cast_date`` understands, as a ``datetime``, or None.
+        """
+        if attr not in self._regex:
+            return None
+        # one registry writes its dates one way; a parser class such as
+        # WhoisEntry itself may serve many registries
+        hint = (self.domain or '').rsplit('.', 1)[-1].lower() or type(self)
+        for value in getattr(self, attr):
+            parsed = cast_date(value, hint)
+            if parsed is not None:
+                return datetime.datetime(*parsed[:6])
+        return None
+
+    creation_datetime = property(lambda self: self.get_datetime('creation_date'))
+    expiration_datetime = property(lambda self: self.get_datetime('expiration_date'))
+    updated_datetime = property(lambda self: self.get_datetime('updated_date'))
+
+
     @staticmethod
     def load(domain, text):
         """Given whois output in ``text``, return an instance of ``WhoisEntry`` that represents its parsed contents.
+
+        The parser is the one registered for the longest suffix of ``domain``.
+        When ``text`` is a ``WhoisResponse`` from a referral chain, only the
+        last server's reply is parsed, and fields it lacks are taken from
+        the servers before it.
         """
         if text.strip() == 'No whois server is known for this kind of object.':
             raise PywhoisError(text)
 
-        if    '.com' == domain[-4:]:
-            return WhoisCom(domain, text)
-        elif  '.net' == domain[-4:]:
-            return WhoisNet(domain, text)
-        elif  '.org' == domain[-4:]:
-            return WhoisOrg(domain, text)
-        elif   '.au' == domain[-3:]:
-            return WhoisAu(domain, text)
-        elif  '.biz' == domain[-4:]:
-            return WhoisBiz(domain, text)
-        elif   '.ca' == domain[-3:]:
-            return WhoisCa(domain, text)
-        elif   '.cn' == domain[-3:]:
-            return WhoisCn(domain, text)
-        elif   '.co' == domain[-3:]:
-            return WhoisCo(domain, text)
-        elif   '.cz' == domain[-3:]:
-            return WhoisCz(domain, text)
-        elif   '.de' == domain[-3:]:
-            return WhoisDe(domain, text)
-        elif   '.dk' == domain[-3:]:
-            return WhoisDk(domain, text)
-        elif   '.fi' == domain[-3:]:
-            return WhoisFi(domain, text)
-        elif   '.fm' == domain[-3:]:
-            return WhoisFm(domain, text)
-        elif   '.fr' == domain[-3:]:
-            return WhoisFr(domain, text)
-        elif   '.il' == domain[-3:]:
-            return WhoisIl(domain, text)
-        elif '.info' == domain[-5:]:
-            return WhoisInfo(domain, text)
-        elif   '.jp' == domain[-3:]:
-            return WhoisJp(domain, text)
-        elif   '.kr' == domain[-3:]:
-            return WhoisKr(domain, text)
-        elif   '.me' == domain[-3:]:
-        	return WhoisMe(domain, text)
-        elif '.name' == domain[-5:]:
-            return WhoisName(domain, text)
-        elif   '.no' == domain[-3:]:
-            return WhoisNo(domain, text)
-        elif   '.nu' == domain[-3:]:
-            return WhoisNu(domain, text)
-        elif   '.pl' == domain[-3:]:
-            return WhoisPl(domain, text)
-        elif   '.tk' == domain[-3:]:
-            return WhoisTk(domain, text)
-        elif   '.tw' == domain[-3:]:
-            return WhoisTw(domain, text)
-        elif   '.ru' == domain[-3:]:
-            return WhoisRu(domain, text)
-        elif   '.sk' == domain[-3:]:
-            return WhoisSk(domain, text)
-        elif   '.su' == domain[-3:]:
-            return WhoisSu(domain, text)
-        elif   '.ua' == domain[-3:]:
-            return WhoisUa(domain, text)
-        elif   '.uk' == domain[-3:]:
-        	return WhoisUk(domain, text)
-        elif   '.us' == domain[-3:]:
-            return WhoisUs(domain, text)
-        else:
-            return WhoisEntry(domain, text)
+        fallback = ()
+        replies = [hop.text for hop in getattr(text, 'hops', ()) if hop.text.strip()]
+        if len(replies) > 1:
+            text, fallback = replies[-1], replies[:-1]
+
+        parser_class = WhoisEntry
+        labels = domain.lower().split('.')
+        for i in range(1, len(labels)):
+            suffix = '.'.join(labels[i:])
+            if suffix in parsers:
+                parser_class = parsers[suffix]
+                break
+        entry = parser_class(domain, text)
+        entry.fallback = fallback
+        return entry
 
 
 
 class WhoisCom(WhoisEntry):
     """Whois parser for .com domains
     """
+    tlds = ('com',)
     def __init__(self, domain, text):
         if 'No match for "' in text:
             raise PywhoisError(text)
@@ -178,6 +359,7 @@ class WhoisCom(WhoisEntry):
 class WhoisNet(WhoisEntry):
     """Whois parser for .net domains
     """
+    tlds = ('net',)
     def __init__(self, domain, text):
         if 'No match for "' in text:
             raise PywhoisError(text)
@@ -187,6 +369,7 @@ class WhoisNet(WhoisEntry):
 class WhoisOrg(WhoisEntry):
     """Whois parser for .org domains
     """
+    tlds = ('org',)
     regex = {
         'domain_name':                    'Domain Name:\s*(.+)',
         'creation_date':                  'Created On:\s*(.+)',
@@ -239,6 +422,7 @@ class WhoisOrg(WhoisEntry):
 
 class WhoisAu(WhoisEntry):
     """Whois parser for .au domains (throw another domain on the barbie, mate)"""
+    tlds = ('au',)
     regex = {
         'domain_name':             'Domain Name:\s*(.+)',
         'registrar':               'Registrar Name:\s*(.+)',
@@ -257,6 +441,7 @@ class WhoisAu(WhoisEntry):
 
 class WhoisBiz(WhoisEntry):
     """Whois parser for .biz domains.  really. .biz?  i hate the internet."""
+    tlds = ('biz',)
     regex = {
         'domain_name':                    'Domain Name:\s*(.+)',
         'creation_date':                  'Domain Registration Date:\s*(.+)',
@@ -315,6 +500,7 @@ class WhoisBiz(WhoisEntry):
 
 class WhoisCa(WhoisEntry):
     """Whois parser for .ca domains (canada)"""
+    tlds = ('ca',)
     regex = {
         'domain_name':             'Domain name:\s*(.+)',
         'creation_date':           'Creation date:\s*(.+)',
@@ -329,6 +515,7 @@ class WhoisCa(WhoisEntry):
 
 class WhoisCn(WhoisEntry):
     """Whois parser for .cn domains (china)"""
+    tlds = ('cn',)
     regex = {
         'domain_name':             'Domain Name:\s*(.+)',
         'registrar':               'Sponsoring Registrar:\s*(.+)',
@@ -348,10 +535,11 @@ class WhoisCn(WhoisEntry):
 
 class WhoisCo(WhoisBiz):
     """whois parser for .co, identical to .biz"""
-    pass
+    tlds = ('co',)
 
 class WhoisCz(WhoisEntry):
     """Whois parser for .cz domains """
+    tlds = ('cz',)
     regex = {
         'domain_name':     'domain:\s*(.+)',
         'creation_date':   'registered:\s*(.+)',
@@ -367,6 +555,7 @@ class WhoisCz(WhoisEntry):
 
 class WhoisDe(WhoisEntry):
     """Whois parser for .de domains (germany)"""
+    tlds = ('de',)
     regex = {
         'domain_name':     'Domain:\s*(.+)',
         #'creation_date':   'created:\s*(.+)',
@@ -383,6 +572,7 @@ class WhoisDe(WhoisEntry):
 
 class WhoisDk(WhoisEntry):
     """Whois parser for .dk domains (denmark)"""
+    tlds = ('dk',)
     regex = {
         'domain_name':     'Domain:\s*(.+)',
         'creation_date':   'Registered:\s*(.+)',
@@ -398,6 +588,7 @@ class WhoisDk(WhoisEntry):
 
 class WhoisFi(WhoisEntry):
     """Whois parser for .fi domains (finland)"""
+    tlds = ('fi',)
     regex = {
         'domain_name':     'domain:\s*(.+)',
         'creation_date':   'created:\s*(.+)',
@@ -413,6 +604,7 @@ class WhoisFi(WhoisEntry):
 
 class WhoisFm(WhoisEntry):
     """Whois parser for .fm domains"""
+    tlds = ('fm',)
     regex = {
         'domain_name':     'Query:\s*(.+)',
         'registrar':       'Registrar Name:\s*(.+)',
@@ -428,6 +620,7 @@ class WhoisFm(WhoisEntry):
 
 class WhoisFr(WhoisEntry):
     """Whois parser for .fr domains (france)"""
+    tlds = ('fr',)
     regex = {
         'domain_name':     'domain:\s*(.+)',
         'registrar_id':    'source:\s*(.+)',
@@ -448,11 +641,12 @@ class WhoisFr(WhoisEntry):
 
 class WhoisInfo(WhoisOrg):
     """identical to WhoisOrg"""
-    pass
+    tlds = ('info',)
 
 class WhoisJp(WhoisEntry):
     """Whois parser for .jp domains
     """
+    tlds = ('jp',)
     regex = {
         'domain_name': '\[Domain Name\]\s+(.+)',
         'registrar':   '\[Registrant\]\s+(.+)',
@@ -472,6 +666,7 @@ class WhoisJp(WhoisEntry):
 
 class WhoisKr(WhoisEntry):
     """Whois parser for .kr domains """
+    tlds = ('kr',)
     regex = {
         'domain_name': 'Domain Name\s*:\s*(.+)',
         'creation_date': 'Registered Date\s*:\s*(.+)',
@@ -493,6 +688,7 @@ class WhoisKr(WhoisEntry):
 class WhoisNo(WhoisEntry):
     """Whois parser for .no domains
     """
+    tlds = ('no',)
     regex = {
         'domain_name': 'Domain Name\.+:\s*(.+)',
         'creation_date': 'Created:\s*(.+)',
@@ -508,6 +704,7 @@ class WhoisNo(WhoisEntry):
 
 class WhoisNu(WhoisEntry):
     """Whois parser for .nu domains """
+    tlds = ('nu',)
     regex = {
         'domain_name':     'Domain Name.*:\s*(.+)',
         'creation_date':   'Record created on (.+)\.',
@@ -527,6 +724,7 @@ class WhoisNu(WhoisEntry):
 class WhoisPl(WhoisEntry):
     """Whois parser for .pl domains
     """
+    tlds = ('pl',)
     regex = {
         'domain_name': 'DOMAIN NAME:\s*(.+)',
         'creation_date': 'created:\s*(.+)',
@@ -544,6 +742,7 @@ class WhoisPl(WhoisEntry):
 class WhoisRu(WhoisEntry):
     """Whois parser for .ru domains
     """
+    tlds = ('ru',)
     regex = {
         'domain_name': 'domain:\s*(.+)',
         'registrar': 'registrar:\s*(.+)',
@@ -562,6 +761,7 @@ class WhoisRu(WhoisEntry):
 
 class WhoisSk(WhoisEntry):
     """Whois parser for .sk domain"""
+    tlds = ('sk',)
     regex = {
         'domain_name': 'Domain-name\s*(.+)',
         'expiration_date': 'Valid-date\s*(.+)',
@@ -579,10 +779,11 @@ class WhoisSk(WhoisEntry):
 
 class WhoisSu(WhoisRu):
     """whois parser for .su, identical to .ru"""
-    pass
+    tlds = ('su',)
 
 class WhoisTk(WhoisEntry):
     """Whois parser for .tk domain"""
+    tlds = ('tk',)
     regex = {
         'domain_name': 'Domain name:\r?\n\s*(.+)',
         'registrant_name': 'Organisation:\r?\n\s*(.+)',
@@ -603,6 +804,7 @@ class WhoisTk(WhoisEntry):
 class WhoisTw(WhoisEntry):
     """Whois parser for .tw domains
     """
+    tlds = ('tw',)
     regex = {
         'domain_name': 'Domain Name:\s*(.+)',
         'registrar': 'Registration Service Provider:\s*(.+)',
@@ -621,6 +823,7 @@ class WhoisTw(WhoisEntry):
 class WhoisName(WhoisEntry):
     """Whois parser for .name domains
     """
+    tlds = ('name',)
     regex = {
     	'domain_name_id':  'Domain Name ID:\s*(.+)',
         'domain_name':     'Domain Name:\s*(.+)',
@@ -645,6 +848,7 @@ class WhoisName(WhoisEntry):
 
 class WhoisUa(WhoisEntry):
     """Whois parser for .ua domains (ukraine)"""
+    tlds = ('ua',)
     regex = {
         'domain_name':     'domain:\s*(.+)',
         'registrar_id':    'source:\s*(.+)',
@@ -666,6 +870,7 @@ class WhoisUa(WhoisEntry):
 class WhoisUs(WhoisEntry):
     """Whois parser for .us domains
     """
+    tlds = ('us',)
     regex = {
         'domain_name':                    'Domain Name:\s*(.+)',
     	'domain__id':                     'Domain ID:\s*(.+)',
@@ -741,6 +946,7 @@ class WhoisUs(WhoisEntry):
 class WhoisMe(WhoisEntry):
     """Whois parser for .me domains
     """
+    tlds = ('me',)
     regex = {
     	'domain_id':                   'Domain ID:(.+)',
         'domain_name':                 'Domain Name:(.+)',
@@ -813,6 +1019,7 @@ class WhoisMe(WhoisEntry):
 class WhoisUk(WhoisEntry):
     """Whois parser for .uk domains
     """
+    tlds = ('uk',)
     regex = {
         'domain_name':          'Domain name:\r?\n\s*(.+)',
         'registrar':            'Registrar:\r?\n\s*(.+)',
@@ -833,6 +1040,7 @@ class WhoisUk(WhoisEntry):
 class WhoisIl(WhoisEntry):
     """Whois parser for .il domains
     """
+    tlds = ('il',)
     regex = {
         'creation_date':    'changed:.*\.il (.+) \(Assigned\)',
         'domain_name':      'domain:\s*(.+)',
@@ -0,0 +1,170 @@
+# proxy.py - Caching whois proxy for the processes on one host
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""A whois server that answers by looking queries up itself.
+
+    python -m pywhois.proxy [options]
+
+The proxy speaks plain whois: a client connects, sends one query line and
+reads the reply until the proxy closes the connection. Behind it one
+``NICClient`` picks the server for each query and follows referrals,
+with a response cache, a referral cache and per-server rate limits shared
+by every process on the host that points at the proxy. Identical queries
+arriving together share one upstream lookup:
+
+    $ python -m pywhois.whois -h localhost -p 4343 google.com
+
+    >>> client = NICClient(port=4343)
+    >>> client.whois_lookup({'whoishost': 'localhost'}, 'google.com', 0)
+
+Failed lookups are answered with a single ``% Error:`` line.
+
+Each upstream server gets ``--rate`` queries per second with bursts of
+``--burst``, and ``--limit HOST=RATE[/BURST]`` (repeatable) overrides
+that for one server. At most ``--max-connections`` connections are
+answered at a time, each on its own thread; further ones wait in the
+listen queue.
+"""
+
+import optparse
+import threading
+import SocketServer
+
+from whois import NICClient
+from cache import MemoryCache, SqliteCache, ReferralCache, NetblockCache, SingleFlight
+from ratelimit import ServerScheduler
+
+
+class WhoisProxyHandler(SocketServer.StreamRequestHandler):
+    """Answers the one query sent on a connection."""
+
+    # seconds a client gets to send its query
+    timeout = 30
+    # longest query line accepted
+    MAX_QUERY = 1024
+
+    def handle(self):
+        query = self.rfile.readline(WhoisProxyHandler.MAX_QUERY).strip()
+        if query.startswith('='):
+            query = query[1:].strip() # Verisign's exact match syntax
+        if not query:
+            return
+        try:
+            text = self.server.client.whois_lookup(None, query, self.server.flags)
+        except Exception, e:
+            text = '%% Error: %s: %s\r\n' % (e.__class__.__name__, e)
+        self.wfile.write(text)
+
+
+class WhoisProxy(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    """Threaded whois server at ``address`` answering through ``client``.
+    Without one, a ``NICClient`` with in-memory caches, the default rate
+    limits and single-flight lookups is used. No more than
+    ``max_connections`` connections are handled at once.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, client=None, flags=0, max_connections=100):
+        SocketServer.TCPServer.__init__(self, address, WhoisProxyHandler)
+        self.slots = threading.BoundedSemaphore(max_connections)
+        if client is None:
+            client = NICClient(cache=MemoryCache(), referral_cache=ReferralCache(),
+                               netblock_cache=NetblockCache(),
+                               scheduler=ServerScheduler(),
+                               single_flight=SingleFlight())
+        self.client = client
+        self.flags = flags
+
+    def process_request(self, request, client_address):
+        # wait for a thread to finish rather than start one per connection
+        self.slots.acquire()
+        try:
+            SocketServer.ThreadingMixIn.process_request(self, request, client_address)
+        except:
+            self.slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            SocketServer.ThreadingMixIn.process_request_thread(self, request, client_address)
+        finally:
+            self.slots.release()
+
+
+def parse_limit(text):
+    """Return ``(hostname, (rate, burst))`` for ``HOST=RATE[/BURST]``;
+    ``burst`` is None when not given.
+    """
+    hostname, limit = text.split('=', 1)
+    if '/' in limit:
+        rate, burst = limit.split('/', 1)
+        return hostname.strip().lower(), (float(rate), int(burst))
+    return hostname.strip().lower(), (float(limit), None)
+
+
+def parse_command_line(argv):
+    usage = "usage: %prog [options]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option("-b", "--bind", action="store", type="string",
+                      dest="bind", default="127.0.0.1",
+                      help="Listen on this address (default 127.0.0.1)")
+    parser.add_option("-p", "--port", action="store", type="int",
+                      dest="port", default=4343,
+                      help="Listen on this tcp port (default 4343)")
+    parser.add_option("-c", "--cache", action="store", type="string",
+                      dest="cache",
+                      help="Cache responses in this sqlite database instead of memory")
+    parser.add_option("-Q", "--quick", action="store_true",
+                      dest="b_quicklookup",
+                      help="Perform quick lookups, without following referrals")
+    parser.add_option("-r", "--rate", action="store", type="float",
+                      dest="rate", default=ServerScheduler.DEFAULT_LIMIT[0],
+                      help="Queries per second sent to each server (default %default)")
+    parser.add_option("--burst", action="store", type="int",
+                      dest="burst", default=ServerScheduler.DEFAULT_LIMIT[1],
+                      help="Queries sent to a server at once after a pause (default %default)")
+    parser.add_option("-l", "--limit", action="append", type="string",
+                      dest="limits", default=[], metavar="HOST=RATE[/BURST]",
+                      help="Rate (and burst) for one server; may be repeated")
+    parser.add_option("-m", "--max-connections", action="store", type="int",
+                      dest="max_connections", default=100,
+                      help="Connections answered at a time (default %default)")
+    (options, args) = parser.parse_args(argv)
+    limits = {}
+    for text in options.limits:
+        try:
+            hostname, (rate, burst) = parse_limit(text)
+        except ValueError:
+            parser.error('bad --limit %r, expected HOST=RATE[/BURST]' % text)
+        limits[hostname] = (rate, burst or options.burst)
+    options.limits = limits
+    return (options, args)
+
+
+def main(argv=None):
+    (options, args) = parse_command_line(argv)
+    flags = 0
+    if options.b_quicklookup:
+        flags |= NICClient.WHOIS_QUICK
+    cache = MemoryCache()
+    if options.cache:
+        cache = SqliteCache(options.cache)
+    scheduler = ServerScheduler(options.limits, (options.rate, options.burst))
+    client = NICClient(cache=cache, referral_cache=ReferralCache(),
+                       netblock_cache=NetblockCache(), scheduler=scheduler,
+                       single_flight=SingleFlight())
+    server = WhoisProxy((options.bind, options.port), client, flags,
+                        options.max_connections)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# publicsuffix.py - Registered domains from the Public Suffix List
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Find the registered domain of a hostname with the Public Suffix List.
+
+The rules are compiled into a trie of labels, read right to left, so a
+lookup costs one dict access per label whatever the size of the list.
+Wildcard (``*.ck``) and exception (``!www.ck``) rules are applied as the
+list specifies. The snapshot bundled with pywhois is
+``public_suffix_list.dat``; replace it with a fresh copy from
+https://publicsuffix.org/list/public_suffix_list.dat to update it.
+
+Only the ICANN section is used by default: whois knows nothing about
+names under private suffixes such as ``blogspot.com``.
+
+    >>> default_list().registered_domain('www.google.co.uk')
+    'google.co.uk'
+"""
+
+import os
+
+
+BUNDLED_LIST = os.path.join(os.path.dirname(__file__), 'public_suffix_list.dat')
+
+# keys of trie nodes that are not labels, so no label of a hostname,
+# even an empty or odd one, can fetch them: RULE marks the end of a
+# rule and EXCEPTIONS holds the labels of exception rules
+RULE = object()
+EXCEPTIONS = object()
+WILDCARD = '*'
+
+
+def label_forms(label):
+    """Return the spellings of rule label ``label`` (UTF-8) to match: as
+    given, as unicode, and in IDNA ASCII form.
+    """
+    try:
+        label.decode('ascii')
+        return [label]
+    except UnicodeDecodeError:
+        pass
+    text = label.decode('utf-8')
+    forms = [label, text]
+    try:
+        forms.append(text.encode('idna'))
+    except UnicodeError:
+        pass
+    return forms
+
+
+class PublicSuffixList(object):
+    """Public Suffix List rules read from ``path``, the bundled snapshot
+    by default. Rules from the private section count when ``private`` is
+    true.
+    """
+
+    def __init__(self, path=None, private=False):
+        self.root = {}
+        f = open(path or BUNDLED_LIST)
+        try:
+            self.load(f, private)
+        finally:
+            f.close()
+
+    def load(self, lines, private=False):
+        for line in lines:
+            line = line.strip()
+            if line.startswith('// ===BEGIN PRIVATE DOMAINS===') and not private:
+                break
+            if not line or line.startswith('//'):
+                continue
+            self.add_rule(line.split()[0].lower())
+
+    def add_rule(self, rule):
+        exception = rule.startswith('!')
+        labels = rule.lstrip('!').split('.')
+        labels.reverse()
+        if exception:
+            # kept in the parent node, among its EXCEPTIONS
+            labels, last = labels[:-1], labels[-1]
+        node = self.root
+        for label in labels:
+            child = node.get(label)
+            if child is None:
+                child = {}
+                for form in label_forms(label):
+                    node[form] = child
+            node = child
+        if exception:
+            node.setdefault(EXCEPTIONS, set()).update(label_forms(last))
+        else:
+            node[RULE] = True
+
+    def suffix_length(self, labels):
+        """Return how many of ``labels`` (right to left) form the public
+        suffix. The implicit ``*`` rule makes it at least one.
+        """
+        node = self.root
+        length = 1
+        depth = 0
+        for label in labels:
+            if label in node.get(EXCEPTIONS, ()):
+                return depth
+            if WILDCARD in node:
+                length = depth + 1
+            node = node.get(label)
+            if node is None:
+                break
+            depth += 1
+            if RULE in node:
+                length = depth
+        return length
+
+    def registered_domain(self, host):
+        """Return the public suffix of ``host`` plus one label: the part of
+        the name a registrant holds. A public suffix is returned as it is.
+        """
+        labels = host.split('.')
+        labels.reverse()
+        length = self.suffix_length(labels) + 1
+        if length >= len(labels):
+            return host
+        labels = labels[:length]
+        labels.reverse()
+        return '.'.join(labels)
+
+
+_default_list = None
+
+def default_list():
+    """Return the ICANN rules of the bundled snapshot, loaded on first use."""
+    global _default_list
+    if _default_list is None:
+        _default_list = PublicSuffixList()
+    return _default_list
@@ -0,0 +1,142 @@
+# ratelimit.py - Per-server query budgets for whois lookups
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Keep lookups within the query limits of each whois server.
+
+Registries throttle or blacklist clients that query too fast, and each
+one has its own idea of too fast. A ``ServerScheduler`` keeps a token
+bucket per whois hostname. Every query reserves the next free slot on its
+server's bucket, so queries over budget queue up in arrival order instead
+of being sent. When a server answers with a throttling message, the
+scheduler stops sending it queries for a while, doubling the pause for as
+long as the server keeps complaining.
+
+    >>> scheduler = ServerScheduler({'whois.verisign-grs.com': (5, 20)})
+    >>> client = NICClient(scheduler=scheduler)
+"""
+
+import re
+import time
+import threading
+
+
+class TokenBucket(object):
+    """Token bucket refilled at ``rate`` tokens a second, holding at most
+    ``burst`` tokens. Tokens may be reserved ahead of time, which drives
+    the balance negative and makes later reservations wait longer.
+    """
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.time() if now is None else now
+
+    def reserve(self, now):
+        """Take one token and return how many seconds from ``now`` it
+        becomes available.
+        """
+        if now > self.last:
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+        self.tokens -= 1
+        # a paused bucket starts refilling at self.last
+        delay = self.last - now
+        if self.tokens >= 0:
+            return delay
+        return delay - self.tokens / self.rate
+
+    def pause(self, until):
+        """Empty the bucket and start refilling it at ``until``."""
+        self.tokens = 0.0
+        self.last = until
+
+
+class ServerScheduler(object):
+    """Rate limits and throttling backoff keyed by whois hostname.
+
+    ``limits`` maps hostnames to ``(rate, burst)`` tuples, ``rate`` being
+    queries per second; servers not listed get ``default``.
+    """
+
+    DEFAULT_LIMIT = (1.0, 5)
+
+    # Phrases servers use to tell us to slow down. Deliberately narrow:
+    # plain words like "limit" appear in every registry's terms of use.
+    THROTTLE_PATTERNS = [
+        r'limit exceeded',
+        r'exceeded (?:the |your )?(?:query|request|maximum|allowed|rate)',
+        r'(?:query|rate|request) limit',
+        r'too many (?:queries|requests|connections)',
+        r'quota exceeded',
+        r'try again later',
+    ]
+
+    def __init__(self, limits=None, default=None, backoff=30, max_backoff=900,
+                 throttle_patterns=None):
+        self.limits = dict(limits or {})
+        self.default = default or ServerScheduler.DEFAULT_LIMIT
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.throttle_re = re.compile('|'.join(throttle_patterns or
+                                               ServerScheduler.THROTTLE_PATTERNS), re.I)
+        self.buckets = {}
+        self.backoff_until = {}
+        self.strikes = {}
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def set_limit(self, hostname, rate, burst):
+        """Change the budget for ``hostname``."""
+        with self.lock:
+            self.limits[hostname] = (rate, burst)
+            self.buckets.pop(hostname, None)
+
+    def reserve(self, hostname):
+        """Reserve the next query slot on ``hostname`` and return the number
+        of seconds to wait before sending it. Does not block.
+        """
+        now = time.time()
+        with self.lock:
+            bucket = self.buckets.get(hostname)
+            if bucket is None:
+                rate, burst = self.limits.get(hostname, self.default)
+                bucket = self.buckets[hostname] = TokenBucket(rate, burst, now)
+            delay = bucket.reserve(now)
+            return max(delay, self.backoff_until.get(hostname, 0) - now)
+
+    def acquire(self, hostname):
+        """Block the calling thread until a query may be sent to ``hostname``."""
+        delay = self.reserve(hostname)
+        while delay > 0:
+            time.sleep(delay)
+            # the server may have throttled us while we slept; queue up
+            # again behind the pause instead of firing when it ends
+            delay = 0
+            if self.backoff_until.get(hostname, 0) > time.time():
+                delay = self.reserve(hostname)
+
+    def is_throttled(self, response):
+        """Return True if ``response`` is a rate limiting message."""
+        return self.throttle_re.search(response) is not None
+
+    def feedback(self, hostname, response):
+        """Record the reply ``hostname`` gave; a throttling message holds
+        back queries to that server. Returns True if it was one.
+        """
+        with self.lock:
+            if not self.is_throttled(response):
+                self.strikes.pop(hostname, None)
+                return False
+            strikes = self.strikes[hostname] = self.strikes.get(hostname, 0) + 1
+            pause = min(self.max_backoff, self.backoff * 2 ** (strikes - 1))
+            until = self.backoff_until[hostname] = time.time() + pause
+            # queries reserved during the pause resume at the configured
+            # rate when it ends, not all at once
+            bucket = self.buckets.get(hostname)
+            if bucket is not None:
+                bucket.pause(until)
+            self.throttled += 1
+            return True
@@ -0,0 +1,172 @@
+# reparse.py - Parse archived whois replies on a pool of processes
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Parse many whois replies at once, spread over a pool of processes.
+
+Parsing is regex work bound to one CPU by the GIL, so re-parsing an
+archive of replies after a parser fix runs ``WhoisEntry.load`` in worker
+processes instead of threads:
+
+    >>> for result in parse_many(archive):
+    ...     print result['domain'], result['fields']['registrar']
+
+``archive`` is any iterable of ``(domain, text)``. It is read lazily and
+handed to the workers ``chunksize`` replies at a time, with at most
+``window`` chunks in flight, so memory use does not grow with the input.
+Workers are replaced after ``maxtasksperchild`` chunks, which bounds the
+memory each one can accumulate. Results come back in input order, or as
+soon as each chunk is parsed with ``ordered=False``; their ``index`` is
+the position of the reply in the input either way.
+
+From the command line, the output of ``pywhois.bulk`` (or any JSON Lines
+with ``domain`` and ``text``) is parsed again and written as JSON Lines:
+
+    python -m pywhois.reparse [options] [file]
+
+With ``--store``, ``file`` is a response store (see store.py) instead
+and every reply archived in it is parsed.
+"""
+
+import sys
+import json
+import optparse
+import itertools
+import collections
+import multiprocessing
+
+from parser import WhoisEntry
+from bulk import error_name, to_unicode
+from store import ResponseStore
+
+
+def parse_record(index, domain, text):
+    """Parse one reply and return its result record."""
+    result = {'index': index, 'domain': domain, 'fields': None,
+              'error': None, 'message': None}
+    try:
+        entry = WhoisEntry.load(domain, text)
+        result['fields'] = dict((attr, getattr(entry, attr)) for attr in entry.attrs())
+    except Exception, e:
+        result['error'] = error_name(e)
+        result['message'] = str(e)
+    return result
+
+
+def parse_chunk(chunk):
+    """Parse a list of ``(index, (domain, text))`` in a worker."""
+    return [parse_record(index, domain, text) for index, (domain, text) in chunk]
+
+
+def chunks(records, size):
+    """Yield lists of ``size`` numbered records from ``records``."""
+    numbered = enumerate(records)
+    while True:
+        chunk = list(itertools.islice(numbered, size))
+        if not chunk:
+            break
+        yield chunk
+
+
+class WorkerDied(Exception):
+    """A worker process exited while chunks were still being parsed."""
+
+
+def parse_many(records, processes=None, chunksize=100, ordered=True,
+               maxtasksperchild=1000, window=None):
+    """Parse each ``(domain, text)`` of ``records`` on ``processes``
+    workers (one per CPU by default) and yield the result records, in
+    input order unless ``ordered`` is false. ``window`` chunks, twice the
+    number of workers by default, are parsed or waiting at a time.
+
+    A chunk that cannot be sent to or returned from a worker raises its
+    error here, and a worker dying raises ``WorkerDied``.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    window = window or processes * 2
+    pool = multiprocessing.Pool(processes, maxtasksperchild=maxtasksperchild)
+    # AsyncResult of each chunk in flight, in input order
+    pending = collections.deque()
+    # every worker seen running; a crashed one loses its chunk for good
+    workers = set()
+    todo = chunks(records, chunksize)
+    try:
+        while True:
+            while todo is not None and len(pending) < window:
+                chunk = next(todo, None)
+                if chunk is None:
+                    todo = None
+                    break
+                pending.append(pool.apply_async(parse_chunk, (chunk,)))
+            if not pending:
+                break
+            # workers recycled after maxtasksperchild exit with status 0
+            workers = set(w for w in workers if w.exitcode != 0)
+            workers.update(pool._pool)
+            if ordered:
+                ready = [r for r in list(pending)[:1] if r.ready()]
+            else:
+                ready = [r for r in pending if r.ready()]
+            if not ready:
+                for worker in workers:
+                    if worker.exitcode:
+                        raise WorkerDied('worker %d exited with status %d'
+                                         % (worker.pid, worker.exitcode))
+                # a timeout keeps the main thread responsive to KeyboardInterrupt
+                pending[0].wait(0.1)
+                continue
+            for chunk in ready:
+                pending.remove(chunk)
+                for result in chunk.get():
+                    yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def read_archive(lines):
+    """Yield ``(domain, text)`` from JSON Lines records."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if record.get('domain') and record.get('text') is not None:
+            yield record['domain'].encode('utf-8'), record['text'].encode('utf-8')
+
+
+def parse_command_line(argv):
+    usage = "usage: %prog [options] [file]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option("-p", "--processes", action="store", type="int",
+                      dest="processes",
+                      help="Number of worker processes (default one per CPU)")
+    parser.add_option("-c", "--chunksize", action="store", type="int",
+                      dest="chunksize", default=100,
+                      help="Replies handed to a worker at a time (default 100)")
+    parser.add_option("-u", "--unordered", action="store_false",
+                      dest="ordered", default=True,
+                      help="Write results as they are parsed, not in input order")
+    parser.add_option("-s", "--store", action="store_true", dest="store",
+                      help="Read the replies from the response store in file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    (options, args) = parse_command_line(argv)
+    if options.store:
+        if not args:
+            sys.exit('A response store file is needed with --store')
+        records = ((reply.domain, reply.text) for reply in ResponseStore(args[0], readonly=True).scan())
+    elif args and args[0] != '-':
+        records = read_archive(open(args[0]))
+    else:
+        records = read_archive(sys.stdin)
+    for result in parse_many(records, options.processes,
+                             options.chunksize, options.ordered):
+        sys.stdout.write(json.dumps(to_unicode(result)) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# resolver.py - Address lookup and connection setup for whois servers
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Resolve whois server names once and connect to them over IPv6 or IPv4.
+
+A handful of hostnames (``com.whois-servers.net``, the registrars'
+servers) serve nearly every lookup, so ``Resolver`` keeps their addresses
+for ``ttl`` seconds instead of asking DNS on each query. getaddrinfo()
+does not report the TTLs of the DNS records, so ``ttl`` is one fixed
+lifetime for every name, five minutes by default; keep it below the TTLs
+of the servers you query most.
+``open_connection`` races the addresses it is given, alternating address
+families and starting a new attempt every ``attempt_delay`` seconds until
+one succeeds ("happy eyeballs", RFC 8305), so a dead IPv6 route costs a
+fraction of a second instead of a full connect timeout.
+
+``StaticResolver`` maps names to fixed addresses, which lets tests point
+a ``NICClient`` at a server on localhost:
+
+    >>> client = NICClient(resolver=StaticResolver(default=('127.0.0.1', 4343)))
+"""
+
+import os
+import time
+import errno
+import select
+import socket
+import threading
+
+
+class Resolver(object):
+    """getaddrinfo() with a cache. Addresses are kept for ``ttl`` seconds,
+    failures for ``negative_ttl`` seconds.
+    """
+
+    def __init__(self, ttl=300, negative_ttl=30):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def resolve(self, hostname, port):
+        """Return a list of ``(family, socktype, proto, sockaddr)`` tuples
+        for a TCP connection to ``hostname`` on ``port``.
+        """
+        key = (hostname, port)
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] > now:
+            if isinstance(entry[0], Exception):
+                raise entry[0]
+            return entry[0]
+        try:
+            addresses = [(family, socktype, proto, sockaddr) for
+                         family, socktype, proto, canonname, sockaddr in
+                         self.getaddrinfo(hostname, port)]
+        except socket.gaierror, e:
+            with self.lock:
+                self.entries[key] = (e, now + self.negative_ttl)
+            raise
+        with self.lock:
+            self.entries[key] = (addresses, now + self.ttl)
+        return addresses
+
+    def getaddrinfo(self, hostname, port):
+        return socket.getaddrinfo(hostname, port, 0, socket.SOCK_STREAM)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class StaticResolver(object):
+    """Resolver answering from ``mapping``, a dict of hostname to an IP
+    address or ``(address, port)`` tuple. Names not in ``mapping`` go to
+    ``default`` when set (an address or tuple as well), and to the
+    ``fallback`` resolver otherwise.
+    """
+
+    def __init__(self, mapping=None, default=None, fallback=None):
+        self.mapping = dict(mapping or {})
+        self.default = default
+        self.fallback = fallback
+
+    def resolve(self, hostname, port):
+        target = self.mapping.get(hostname, self.default)
+        if target is None:
+            if self.fallback is None:
+                raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+            return self.fallback.resolve(hostname, port)
+        if isinstance(target, tuple):
+            target, port = target
+        family = socket.AF_INET6 if ':' in target else socket.AF_INET
+        if family == socket.AF_INET6:
+            sockaddr = (target, port, 0, 0)
+        else:
+            sockaddr = (target, port)
+        return [(family, socket.SOCK_STREAM, socket.IPPROTO_TCP, sockaddr)]
+
+
+default_resolver = Resolver()
+
+
+def interleave(addresses):
+    """Order ``addresses`` alternating between address families, keeping
+    the resolver's preference for which family goes first.
+    """
+    families = []
+    by_family = {}
+    for address in addresses:
+        if address[0] not in by_family:
+            families.append(address[0])
+            by_family[address[0]] = []
+        by_family[address[0]].append(address)
+    ordered = []
+    while any(by_family.values()):
+        for family in families:
+            if by_family[family]:
+                ordered.append(by_family[family].pop(0))
+    return ordered
+
+
+def wait_writable(socks, timeout):
+    """Return the sockets in ``socks`` that become writable (connected or
+    failed) within ``timeout`` seconds.
+    """
+    try:
+        if hasattr(select, 'poll'):
+            poller = select.poll()
+            by_fd = {}
+            for s in socks:
+                poller.register(s, select.POLLOUT)
+                by_fd[s.fileno()] = s
+            return [by_fd[fd] for fd, event in poller.poll(timeout * 1000)]
+        return select.select([], socks, socks, timeout)[1]
+    except (select.error, IOError), e:
+        if e.args[0] == errno.EINTR:
+            return []
+        raise
+
+
+def open_connection(addresses, timeout, attempt_delay=0.25):
+    """Connect to the first of ``addresses`` that answers and return the
+    connected socket and its address.
+
+    Attempts start ``attempt_delay`` seconds apart without waiting for
+    earlier ones to fail; a failed attempt starts the next one at once.
+    Raises ``socket.timeout`` if nothing connects within ``timeout``
+    seconds, or the last connection error if every address fails.
+    """
+    pending = interleave(addresses)
+    attempts = {}
+    error = socket.error('no addresses to connect to')
+    deadline = time.time() + timeout
+    next_attempt = 0
+    try:
+        while pending or attempts:
+            now = time.time()
+            if pending and (not attempts or now >= next_attempt):
+                family, socktype, proto, sockaddr = pending.pop(0)
+                s = socket.socket(family, socktype, proto)
+                s.setblocking(0)
+                err = s.connect_ex(sockaddr)
+                if err == 0:
+                    return s, sockaddr
+                if err in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+                    attempts[s] = sockaddr
+                    next_attempt = now + attempt_delay
+                else:
+                    error = socket.error(err, os.strerror(err))
+                    s.close()
+                continue
+            if now >= deadline:
+                raise socket.timeout('timed out')
+            wait = deadline - now
+            if pending:
+                wait = min(wait, next_attempt - now)
+            for s in wait_writable(list(attempts), wait):
+                err = s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                sockaddr = attempts.pop(s)
+                if err == 0:
+                    return s, sockaddr
+                error = socket.error(err, os.strerror(err))
+                s.close()
+        raise error
+    finally:
+        for s in attempts:
+            s.close()
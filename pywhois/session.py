@@ -0,0 +1,315 @@
+# session.py - Many queries to one whois server
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Send many queries to one whois server over as few connections as the
+server allows.
+
+    >>> session = client.session('whois.ripe.net')
+    >>> for text in session.query_many(addresses):
+    ...     print text
+    >>> session.close()
+
+RIPE-style servers (RIPE, APNIC, AFRINIC) keep the connection open when a
+query carries ``-k`` and answer the queries that follow in order. Each
+answer ends with a ``% This query was served by`` line and an empty line,
+which is where the stream is split back into replies. Team Cymru's IP to
+ASN service takes a whole list of addresses between ``begin`` and ``end``
+and answers one line per address. Every other server gets a connection
+per query, as with ``NICClient.whois``.
+
+Replies in the client's cache are not asked for again, and the replies
+fetched are cached. Sessions sharing a connection talk to the server
+directly, so a client with a transport other than ``SocketTransport``
+(recording or replaying exchanges) gets a connection per query instead.
+"""
+
+import re
+import time
+import socket
+
+from whois import NICClient, ResponseTooLarge, wait_readable
+from metrics import HopTrace
+from transport import SocketTransport
+
+
+class WhoisSession(object):
+    """Queries to ``hostname`` through ``client``, one connection each.
+    Subclasses share connections between queries.
+    """
+
+    def __init__(self, client, hostname):
+        self.client = client
+        self.hostname = hostname
+
+    def query(self, query):
+        """Return the reply of the server to ``query``."""
+        return self.query_many([query])[0]
+
+    def query_many(self, queries):
+        """Return the replies to ``queries``, in the same order, from the
+        client's cache where it has them.
+        """
+        queries = list(queries)
+        cache = self.client.cache
+        if cache is None:
+            return self.fetch_many(queries)
+        replies = [cache.get((query, self.hostname, 0)) for query in queries]
+        todo = [i for i, reply in enumerate(replies) if reply is None]
+        fetched = self.fetch_many([queries[i] for i in todo])
+        limit = self.client.max_response_size
+        for i, reply in zip(todo, fetched):
+            replies[i] = reply
+            # a reply at the size limit may have been truncated
+            if not self.client.cut_short(reply) and (limit is None or len(reply) < limit):
+                cache.set((queries[i], self.hostname, 0), reply)
+        return replies
+
+    def fetch_many(self, queries):
+        """Ask the server for the replies to ``queries``."""
+        return [self.client.whois(query, self.hostname, 0) for query in queries]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class KeepAliveSession(WhoisSession):
+    """Session on a persistent (``-k``) connection, with up to ``window``
+    queries sent ahead of their replies. A connection the server drops is
+    reopened for the queries still unanswered.
+    """
+
+    END_RE = re.compile(NICClient.RIPE_END, re.M)
+
+    def __init__(self, client, hostname, window=10):
+        WhoisSession.__init__(self, client, hostname)
+        check_transport(client)
+        self.window = window
+        self.sock = None
+        self.trace = None
+        self.start_reply()
+        self.rest = ''
+
+    def open(self):
+        self.trace = HopTrace(None, self.hostname)
+        self.sock = self.client.connect(self.hostname, self.trace)
+        self.start_reply()
+        self.rest = ''
+        self.keepalive = False
+
+    def start_reply(self):
+        # the reply read so far, as received
+        self.chunks = []
+        self.size = 0
+        # its end from the last line that may start the end marker, behind
+        # a newline; a reply starts on a new line
+        self.tail = '\n'
+
+    def send(self, query):
+        if self.client.scheduler is not None:
+            self.client.scheduler.acquire(self.hostname)
+        data = query + '\r\n'
+        if not self.keepalive:
+            data = '-k ' + data
+            self.keepalive = True
+        if self.trace.query is None:
+            self.trace.query = query
+        self.sock.sendall(data)
+        self.trace.bytes_sent += len(data)
+
+    def receive(self, timeout):
+        """Return whatever arrives within ``timeout`` seconds, or None once
+        the server closed the connection or went quiet.
+        """
+        if not wait_readable(self.sock, timeout):
+            return None
+        try:
+            d = self.sock.recv(4096)
+        except socket.error:
+            return None
+        if not d:
+            return None
+        now = time.time()
+        if self.trace.first_byte is None:
+            self.trace.first_byte = now
+        self.trace.last_byte = now
+        self.trace.bytes_received += len(d)
+        return d
+
+    def feed(self, d):
+        """Add ``d`` to the reply being read and return the reply once its
+        end marker arrived, keeping what follows for the next one. Only the
+        tail of the reply is searched, so a long reply costs linear time.
+        """
+        if not self.chunks:
+            # blank lines closing the previous reply, trailing behind it
+            d = d.lstrip('\r\n')
+            if not d:
+                return None
+        window = self.tail + d
+        match = KeepAliveSession.END_RE.search(window)
+        if match is not None:
+            cut = match.end() - len(self.tail)
+            reply = ''.join(self.chunks) + d[:cut]
+            self.rest = d[cut:]
+            self.start_reply()
+            return reply
+        self.chunks.append(d)
+        self.size += len(d)
+        # the end marker may be cut in two by the next read
+        pos = window.rfind('\n%')
+        if pos < 0:
+            pos = len(window) - 1 if window.endswith('\n') else len(window)
+        self.tail = window[pos:]
+        if len(self.tail) > NICClient.MARKER_WINDOW:
+            # too long to be the marker line
+            self.tail = ''
+        return None
+
+    def read_reply(self):
+        """Return the next reply from the connection, or None if it ended
+        before one started. A reply cut short by the server is returned as
+        it is, and the connection is closed.
+        """
+        client = self.client
+        while True:
+            d, self.rest = self.rest, ''
+            if d:
+                reply = self.feed(d)
+                if reply is not None:
+                    return reply
+            limit = client.max_response_size
+            if limit is not None and self.size > limit:
+                partial = ''.join(self.chunks)[:limit]
+                self.close()
+                self.start_reply()
+                if client.truncate_response:
+                    self.trace.truncated = True
+                    return partial
+                raise ResponseTooLarge(self.hostname, limit, partial)
+            if self.chunks:
+                timeout = client.idle_timeout
+            else:
+                timeout = client.first_byte_timeout
+            self.rest = self.receive(timeout)
+            if self.rest is None:
+                reply = ''.join(self.chunks)
+                self.rest = ''
+                self.start_reply()
+                self.close()
+                return reply or None
+
+    def fetch_many(self, queries):
+        replies = []
+        while len(replies) < len(queries):
+            if self.sock is None:
+                self.open()
+            answered = len(replies)
+            sent = answered
+            try:
+                while self.sock is not None and len(replies) < len(queries):
+                    while sent < len(queries) and sent - len(replies) < self.window:
+                        self.send(queries[sent])
+                        sent += 1
+                    reply = self.read_reply()
+                    if reply is None:
+                        break
+                    replies.append(reply)
+            except socket.error, e:
+                self.trace.error = e
+                self.close()
+                raise
+            if self.sock is not None and len(replies) < len(queries):
+                self.close()
+            if len(replies) == answered:
+                # a fresh connection gave nothing; don't keep trying it
+                replies.append(self.client.whois(queries[answered], self.hostname, 0))
+        return replies
+
+    def close(self):
+        if self.sock is None:
+            return
+        self.sock.close()
+        self.sock = None
+        self.trace.closed = time.time()
+        for hook in self.client.hooks:
+            hook(self.trace)
+
+
+class BulkSession(WhoisSession):
+    """Session for Team Cymru style bulk services, sending ``batch``
+    queries at a time between ``begin`` and ``end``.
+    """
+
+    def __init__(self, client, hostname, batch=1000):
+        WhoisSession.__init__(self, client, hostname)
+        check_transport(client)
+        self.batch = batch
+
+    def fetch_many(self, queries):
+        replies = []
+        for i in range(0, len(queries), self.batch):
+            replies.extend(self.query_batch(queries[i:i + self.batch]))
+        return replies
+
+    def query_batch(self, queries):
+        client = self.client
+        if client.scheduler is not None:
+            client.scheduler.acquire(self.hostname)
+        trace = HopTrace(queries[0], self.hostname)
+        try:
+            s = client.connect(self.hostname, trace)
+            try:
+                data = 'begin\r\n' + ''.join(q + '\r\n' for q in queries) + 'end\r\n'
+                s.sendall(data)
+                trace.bytes_sent = len(data)
+                # a line per query after the "Bulk mode" line, so a
+                # server keeping the connection open is not waited out
+                response = client.read_response(s, trace, len(queries) + 1)
+            finally:
+                s.close()
+                trace.closed = time.time()
+        except Exception, e:
+            trace.error = e
+            raise
+        finally:
+            for hook in client.hooks:
+                hook(trace)
+        lines = response.splitlines(True)
+        if lines and lines[0].startswith('Bulk mode'):
+            lines = lines[1:]
+        if len(lines) != len(queries):
+            # can't tell which line answers which query
+            return WhoisSession.fetch_many(self, queries)
+        return lines
+
+
+# Servers known to support a session mode.
+SESSION_TYPES = {
+    NICClient.RNICHOST: KeepAliveSession,
+    NICClient.PNICHOST: KeepAliveSession,
+    'whois.afrinic.net': KeepAliveSession,
+    'whois.cymru.com': BulkSession,
+}
+
+
+def check_transport(client):
+    if not isinstance(client.transport, SocketTransport):
+        raise ValueError('sessions sharing a connection bypass the %s of the client'
+                         % client.transport.__class__.__name__)
+
+
+def open_session(client, hostname):
+    """Return the best kind of session ``hostname`` supports, through
+    the client's transport.
+    """
+    if not isinstance(client.transport, SocketTransport):
+        return WhoisSession(client, hostname)
+    return SESSION_TYPES.get(hostname, WhoisSession)(client, hostname)
@@ -0,0 +1,363 @@
+# store.py - Append-only archive of raw whois replies
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""An archive of raw whois replies, kept for history and re-parsing.
+
+A store is two files. The segment (``path``) is a sequence of records
+appended one after the other and never rewritten, each one a
+zlib-compressed domain, server chain, fetch time and reply text behind
+its length. The index (``path + '.idx'``) holds one fixed-size entry per
+record in a few runs, each sorted by domain and then fetch time, and is
+memory-mapped, so finding the replies of a domain is a binary search per
+run that touches a few pages whatever the size of the archive.
+
+    >>> store = ResponseStore('/var/lib/pywhois/replies')
+    >>> store.append('google.com', client.whois_lookup(None, 'google.com', 0))
+    >>> store.latest('google.com').text
+    >>> store.at('google.com', time.mktime((2011, 1, 1, 0, 0, 0, 0, 0, -1)))
+    >>> for reply in store.scan():
+    ...     WhoisEntry.load(reply.domain, reply.text)
+
+Records appended since the index was last written are indexed in memory
+until ``flush`` (or ``close``) writes them to the index file as a new
+run. A run is merged with the runs before it that are no larger, so the
+runs double in size going back and there are only a logarithmic number
+of them; each entry is rewritten a logarithmic number of times however
+often the store is flushed. Opening a store indexes any records the
+index runs do not cover yet, so an archive left by a crashed writer
+loses at most its unfinished last record. ``scan`` reads the segment in
+append order, a record at a time.
+
+Readers of a store another process is appending to open it with
+``readonly``: they leave the segment and index files alone, and index
+whatever the writer has finished so far on their first search rather
+than on opening, as readers that only ``scan`` need no index.
+"""
+
+import os
+import mmap
+import time
+import zlib
+import heapq
+import shutil
+import struct
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+
+StoredResponse = namedtuple('StoredResponse', 'domain servers fetched text')
+
+# length of the compressed record that follows
+RECORD_HEADER = struct.Struct('>I')
+# fetch time, domain length and server chain length, then domain,
+# servers (space separated) and text
+PAYLOAD_HEADER = struct.Struct('>dHH')
+# header of each index run: magic, version, how much of the segment the
+# runs up to this one cover, and the number of entries that follow
+RUN_HEADER = struct.Struct('>4sIQQ')
+# domain (the first DOMAIN_KEY bytes, NUL padded), fetch time, offset.
+# For positive times the packed entries sort as (domain, time, offset).
+INDEX_ENTRY = struct.Struct('>64sdQ')
+DOMAIN_KEY = 64
+INDEX_MAGIC = 'PWIX'
+INDEX_VERSION = 2
+
+
+def pack_record(domain, servers, fetched, text):
+    servers = ' '.join(servers)
+    payload = PAYLOAD_HEADER.pack(fetched, len(domain), len(servers)) + domain + servers + text
+    payload = zlib.compress(payload)
+    return RECORD_HEADER.pack(len(payload)) + payload
+
+
+def unpack_record(payload):
+    payload = zlib.decompress(payload)
+    fetched, domain_len, servers_len = PAYLOAD_HEADER.unpack_from(payload)
+    pos = PAYLOAD_HEADER.size
+    domain = payload[pos:pos + domain_len]
+    pos += domain_len
+    servers = payload[pos:pos + servers_len]
+    pos += servers_len
+    return StoredResponse(domain, tuple(servers.split()), fetched, payload[pos:])
+
+
+def read_record(f):
+    """Read the record at the position of ``f``; None at the end of the
+    segment or at a record cut short.
+    """
+    header = f.read(RECORD_HEADER.size)
+    if len(header) < RECORD_HEADER.size:
+        return None
+    size, = RECORD_HEADER.unpack(header)
+    payload = f.read(size)
+    if len(payload) < size:
+        return None
+    try:
+        return unpack_record(payload)
+    except (zlib.error, struct.error):
+        return None
+
+
+class ResponseStore(object):
+    """Raw replies archived in the segment file ``path`` and its index,
+    created if they do not exist. One store object may be shared by
+    threads; only one process should append to a store at a time, and
+    others open it ``readonly``.
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        self.writer = None
+        if not readonly:
+            self.writer = open(path, 'ab')
+        self.reader = open(path, 'rb')
+        self.index = None
+        self.index_file = None
+        # (position of the first entry, number of entries) of each index
+        # run, oldest first, and where the last one ends
+        self.runs = []
+        self.index_end = 0
+        self.entries = 0
+        self.indexed = 0
+        # packed index entries of the records after self.indexed, sorted
+        # when self.pending_sorted is true
+        self.pending = []
+        self.pending_sorted = True
+        self.recovered = False
+        self.map_index()
+        if not readonly:
+            self.recover()
+
+    def map_index(self):
+        if not os.path.exists(self.index_path):
+            if self.readonly:
+                return
+            open(self.index_path, 'wb').close()
+        if self.index is not None:
+            self.index.close()
+            self.index_file.close()
+            self.index = self.index_file = None
+        self.runs = []
+        self.index_end = self.entries = self.indexed = 0
+        if os.path.getsize(self.index_path) == 0:
+            return
+        self.index_file = open(self.index_path, 'rb')
+        self.index = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        pos = 0
+        while pos + RUN_HEADER.size <= len(self.index):
+            magic, version, covered, count = RUN_HEADER.unpack_from(self.index, pos)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                if pos == 0:
+                    raise ValueError('%s is not a pywhois store index' % self.index_path)
+                break
+            end = pos + RUN_HEADER.size + count * INDEX_ENTRY.size
+            if end > len(self.index):
+                # a run cut short by a crashed flush; recover() indexes
+                # the records it covered again
+                break
+            self.runs.append((pos + RUN_HEADER.size, count))
+            self.entries += count
+            self.indexed = covered
+            self.index_end = pos = end
+
+    def recover(self):
+        """Index the records past the end of the index file, and cut off
+        a record left unfinished at the end of the segment unless the store
+        is read only (the writer may still be busy with it).
+        """
+        self.recovered = True
+        self.reader.seek(self.indexed)
+        offset = self.indexed
+        while True:
+            record = read_record(self.reader)
+            if record is None:
+                break
+            self.pending.append(self.entry(record.domain, record.fetched, offset))
+            offset = self.reader.tell()
+        self.pending.sort()
+        if not self.readonly and offset < os.path.getsize(self.path):
+            self.writer.truncate(offset)
+
+    def entry(self, domain, fetched, offset):
+        return INDEX_ENTRY.pack(domain[:DOMAIN_KEY], fetched, offset)
+
+    def append(self, domain, text, servers=None, fetched=None):
+        """Archive reply ``text`` for ``domain`` and return its offset in
+        the segment. ``servers`` is the chain of servers that gave it,
+        taken from the hops of a ``WhoisResponse`` when not given;
+        ``fetched`` defaults to now.
+        """
+        if self.readonly:
+            raise IOError('%s is open read only' % self.path)
+        domain = domain.lower()
+        if servers is None:
+            servers = [hop.hostname for hop in getattr(text, 'hops', ())]
+        if fetched is None:
+            fetched = time.time()
+        record = pack_record(domain, servers, fetched, str(text))
+        with self.lock:
+            self.writer.seek(0, os.SEEK_END)
+            offset = self.writer.tell()
+            self.writer.write(record)
+            self.writer.flush()
+            # sorted when needed, not on every append
+            self.pending.append(self.entry(domain, fetched, offset))
+            self.pending_sorted = False
+        return offset
+
+    def read(self, offset):
+        """Return the ``StoredResponse`` at ``offset`` in the segment."""
+        with self.lock:
+            self.reader.seek(offset)
+            return read_record(self.reader)
+
+    def run_entry(self, start, i):
+        return self.index[start + i * INDEX_ENTRY.size:start + (i + 1) * INDEX_ENTRY.size]
+
+    def run_entries(self, start, count):
+        for i in xrange(count):
+            yield self.run_entry(start, i)
+
+    def find(self, domain):
+        """Return ``(fetched, offset)`` of the records of ``domain``, oldest
+        first.
+        """
+        key = domain[:DOMAIN_KEY].ljust(DOMAIN_KEY, '\0')
+        found = []
+        with self.lock:
+            if not self.recovered:
+                self.recover()
+            for start, count in self.runs:
+                lo, hi = 0, count
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if self.run_entry(start, mid)[:DOMAIN_KEY] < key:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                while lo < count:
+                    entry = self.run_entry(start, lo)
+                    if entry[:DOMAIN_KEY] != key:
+                        break
+                    found.append(INDEX_ENTRY.unpack(entry)[1:])
+                    lo += 1
+            self.sort_pending()
+            for entry in self.pending[bisect_left(self.pending, key):]:
+                if entry[:DOMAIN_KEY] != key:
+                    break
+                found.append(INDEX_ENTRY.unpack(entry)[1:])
+        found.sort()
+        return found
+
+    def sort_pending(self):
+        if not self.pending_sorted:
+            self.pending.sort()
+            self.pending_sorted = True
+
+    def history(self, domain):
+        """Return every archived reply for ``domain``, oldest first."""
+        domain = domain.lower()
+        replies = [self.read(offset) for fetched, offset in self.find(domain)]
+        # names longer than DOMAIN_KEY share index keys
+        return [reply for reply in replies if reply.domain == domain]
+
+    def at(self, domain, when):
+        """Return the last reply for ``domain`` fetched at or before
+        ``when``, or None.
+        """
+        domain = domain.lower()
+        for fetched, offset in reversed(self.find(domain)):
+            if fetched <= when:
+                reply = self.read(offset)
+                if reply.domain == domain:
+                    return reply
+        return None
+
+    def latest(self, domain):
+        """Return the most recent reply for ``domain``, or None."""
+        return self.at(domain, float('inf'))
+
+    def scan(self):
+        """Yield every reply in the order it was archived, reading the
+        segment as it goes.
+        """
+        with self.lock:
+            end = os.path.getsize(self.path)
+        f = open(self.path, 'rb')
+        try:
+            while f.tell() < end:
+                record = read_record(f)
+                if record is None:
+                    break
+                yield record
+        finally:
+            f.close()
+
+    def __len__(self):
+        with self.lock:
+            if not self.recovered:
+                self.recover()
+        return self.entries + len(self.pending)
+
+    def flush(self):
+        """Write the records appended since the last flush to the index
+        file as a new run, merged with the runs before it no larger than
+        the result.
+        """
+        with self.lock:
+            if self.readonly or not self.pending:
+                return
+            self.sort_pending()
+            os.fsync(self.writer.fileno())
+            covered = os.path.getsize(self.path)
+            first, count = len(self.runs), len(self.pending)
+            while first > 0 and self.runs[first - 1][1] <= count:
+                first -= 1
+                count += self.runs[first][1]
+            runs = [self.run_entries(start, n) for start, n in self.runs[first:]]
+            # the merged runs are overwritten, so the new one is built apart
+            # and copied over them once complete
+            temp = self.index_path + '.tmp'
+            f = open(temp, 'w+b')
+            try:
+                f.write(RUN_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, covered, count))
+                for entry in heapq.merge(*(runs + [self.pending])):
+                    f.write(entry)
+                if first < len(self.runs):
+                    pos = self.runs[first][0] - RUN_HEADER.size
+                else:
+                    pos = self.index_end
+                if self.index is not None:
+                    self.index.close()
+                    self.index_file.close()
+                    self.index = self.index_file = None
+                out = open(self.index_path, 'r+b')
+                try:
+                    out.truncate(pos)
+                    out.seek(pos)
+                    f.seek(0)
+                    shutil.copyfileobj(f, out)
+                    out.flush()
+                    os.fsync(out.fileno())
+                finally:
+                    out.close()
+            finally:
+                f.close()
+                os.remove(temp)
+            self.pending = []
+            self.map_index()
+
+    def close(self):
+        self.flush()
+        if self.index is not None:
+            self.index.close()
+            self.index_file.close()
+        self.reader.close()
+        if self.writer is not None:
+            self.writer.close()
@@ -0,0 +1,175 @@
+# tld_servers.py - Whois server of each top level domain
+#
+# A hand-compiled seed, NOT generated from a full IANA dump: it covers
+# 165 widely used TLDs (the legacy gTLDs, the ccTLDs most seen and
+# one IDN), and every other TLD falls back to <tld>.whois-servers.net.
+# Replace it with the full table from "python -m pywhois.tlds --fetch",
+# which asks whois.iana.org about every TLD in the root zone; see tlds.py.
+
+TLD_SERVERS = {
+    'ac': 'whois.nic.ac',
+    'ae': 'whois.aeda.net.ae',
+    'aero': 'whois.aero',
+    'af': 'whois.nic.af',
+    'ag': 'whois.nic.ag',
+    'ai': 'whois.nic.ai',
+    'am': 'whois.amnic.net',
+    'app': 'whois.nic.google',
+    'arpa': 'whois.iana.org',
+    'as': 'whois.nic.as',
+    'asia': 'whois.nic.asia',
+    'at': 'whois.nic.at',
+    'au': 'whois.auda.org.au',
+    'be': 'whois.dns.be',
+    'bg': 'whois.register.bg',
+    'biz': 'whois.nic.biz',
+    'bj': 'whois.nic.bj',
+    'blog': 'whois.nic.blog',
+    'bn': 'whois.bnnic.bn',
+    'br': 'whois.registro.br',
+    'by': 'whois.cctld.by',
+    'ca': 'whois.cira.ca',
+    'cat': 'whois.nic.cat',
+    'cc': 'ccwhois.verisign-grs.com',
+    'ch': 'whois.nic.ch',
+    'ci': 'whois.nic.ci',
+    'cl': 'whois.nic.cl',
+    'club': 'whois.nic.club',
+    'cn': 'whois.cnnic.cn',
+    'co': 'whois.nic.co',
+    'com': 'whois.verisign-grs.com',
+    'coop': 'whois.nic.coop',
+    'cx': 'whois.nic.cx',
+    'cz': 'whois.nic.cz',
+    'de': 'whois.denic.de',
+    'dev': 'whois.nic.google',
+    'dk': 'whois.punktum.dk',
+    'dm': 'whois.dmdomains.dm',
+    'edu': 'whois.educause.edu',
+    'ee': 'whois.tld.ee',
+    'es': 'whois.nic.es',
+    'eu': 'whois.eu',
+    'fi': 'whois.fi',
+    'fo': 'whois.nic.fo',
+    'fr': 'whois.nic.fr',
+    'gd': 'whois.nic.gd',
+    'gg': 'whois.gg',
+    'gl': 'whois.nic.gl',
+    'gov': 'whois.dotgov.gov',
+    'gs': 'whois.nic.gs',
+    'gy': 'whois.registry.gy',
+    'hk': 'whois.hkirc.hk',
+    'hn': 'whois.nic.hn',
+    'hr': 'whois.dns.hr',
+    'ht': 'whois.nic.ht',
+    'hu': 'whois.nic.hu',
+    'id': 'whois.id',
+    'ie': 'whois.weare.ie',
+    'il': 'whois.isoc.org.il',
+    'im': 'whois.nic.im',
+    'in': 'whois.registry.in',
+    'info': 'whois.nic.info',
+    'int': 'whois.iana.org',
+    'io': 'whois.nic.io',
+    'iq': 'whois.cmc.iq',
+    'ir': 'whois.nic.ir',
+    'is': 'whois.isnic.is',
+    'it': 'whois.nic.it',
+    'je': 'whois.je',
+    'jobs': 'whois.nic.jobs',
+    'jp': 'whois.jprs.jp',
+    'ke': 'whois.kenic.or.ke',
+    'kg': 'whois.kg',
+    'ki': 'whois.nic.ki',
+    'kr': 'whois.kr',
+    'kz': 'whois.nic.kz',
+    'la': 'whois.nic.la',
+    'li': 'whois.nic.li',
+    'lt': 'whois.domreg.lt',
+    'lu': 'whois.dns.lu',
+    'lv': 'whois.nic.lv',
+    'ly': 'whois.nic.ly',
+    'ma': 'whois.registre.ma',
+    'md': 'whois.nic.md',
+    'me': 'whois.nic.me',
+    'mg': 'whois.nic.mg',
+    'mk': 'whois.marnet.mk',
+    'ml': 'whois.dot.ml',
+    'mn': 'whois.nic.mn',
+    'mobi': 'whois.nic.mobi',
+    'ms': 'whois.nic.ms',
+    'mu': 'whois.nic.mu',
+    'mx': 'whois.mx',
+    'my': 'whois.mynic.my',
+    'mz': 'whois.nic.mz',
+    'na': 'whois.na-nic.com.na',
+    'name': 'whois.nic.name',
+    'nc': 'whois.nc',
+    'net': 'whois.verisign-grs.com',
+    'nf': 'whois.nic.nf',
+    'ng': 'whois.nic.net.ng',
+    'nl': 'whois.domain-registry.nl',
+    'no': 'whois.norid.no',
+    'nu': 'whois.iis.nu',
+    'nz': 'whois.irs.net.nz',
+    'om': 'whois.registry.om',
+    'online': 'whois.nic.online',
+    'org': 'whois.publicinterestregistry.org',
+    'pe': 'kero.yachay.pe',
+    'pf': 'whois.registry.pf',
+    'pl': 'whois.dns.pl',
+    'pm': 'whois.nic.pm',
+    'pro': 'whois.nic.pro',
+    'pt': 'whois.dns.pt',
+    'pw': 'whois.nic.pw',
+    'qa': 'whois.registry.qa',
+    're': 'whois.nic.re',
+    'ro': 'whois.rotld.ro',
+    'rs': 'whois.rnids.rs',
+    'ru': 'whois.tcinet.ru',
+    'sa': 'whois.nic.net.sa',
+    'sb': 'whois.nic.net.sb',
+    'se': 'whois.iis.se',
+    'sg': 'whois.sgnic.sg',
+    'sh': 'whois.nic.sh',
+    'si': 'whois.register.si',
+    'site': 'whois.nic.site',
+    'sk': 'whois.sk-nic.sk',
+    'sm': 'whois.nic.sm',
+    'sn': 'whois.nic.sn',
+    'so': 'whois.nic.so',
+    'st': 'whois.nic.st',
+    'store': 'whois.nic.store',
+    'su': 'whois.tcinet.ru',
+    'sx': 'whois.sx',
+    'sy': 'whois.tld.sy',
+    'tc': 'whois.nic.tc',
+    'tel': 'whois.nic.tel',
+    'tf': 'whois.nic.tf',
+    'th': 'whois.thnic.co.th',
+    'tj': 'whois.nic.tj',
+    'tk': 'whois.dot.tk',
+    'tl': 'whois.nic.tl',
+    'tm': 'whois.nic.tm',
+    'tn': 'whois.ati.tn',
+    'to': 'whois.tonic.to',
+    'top': 'whois.nic.top',
+    'tr': 'whois.nic.tr',
+    'travel': 'whois.nic.travel',
+    'tw': 'whois.twnic.net.tw',
+    'tz': 'whois.tznic.or.tz',
+    'ua': 'whois.ua',
+    'ug': 'whois.co.ug',
+    'uk': 'whois.nic.uk',
+    'us': 'whois.nic.us',
+    'uy': 'whois.nic.org.uy',
+    'uz': 'whois.cctld.uz',
+    've': 'whois.nic.ve',
+    'vg': 'whois.nic.vg',
+    'wf': 'whois.nic.wf',
+    'ws': 'whois.website.ws',
+    'xn--p1ai': 'whois.tcinet.ru',
+    'xxx': 'whois.nic.xxx',
+    'xyz': 'whois.nic.xyz',
+    'yt': 'whois.nic.yt',
+}
@@ -0,0 +1,181 @@
+# tlds.py - Offline table of whois servers by top level domain
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Map top level domains straight to their registry's whois server.
+
+``NICClient.choose_server`` asks ``server_for_tld`` first, which answers
+from the table in ``tld_servers.py`` without touching the network, and
+only falls back to ``<tld>.whois-servers.net`` for TLDs the table lacks.
+
+The bundled table is a partial, hand-compiled seed covering the TLDs
+most lookups go to; it says so in its header. The full table is
+generated from the IANA root zone database, taking the ``whois:`` field
+of the ``whois.iana.org`` record of every TLD in the root zone:
+
+    python -m pywhois.tlds --fetch [--save DIR] [-o pywhois/tld_servers.py]
+
+fetches IANA's list of root zone TLDs and queries ``whois.iana.org`` for
+each, a query per second, which takes about half an hour. ``--save``
+keeps the replies (one file per TLD), and a table can be built again
+from saved replies, or any concatenation of them, without the network:
+
+    python -m pywhois.tlds [-o pywhois/tld_servers.py] dump [dump ...]
+"""
+
+import os
+import re
+import sys
+import urllib2
+import optparse
+
+from tld_servers import TLD_SERVERS
+
+
+# every TLD in the root zone, one per line in upper case
+IANA_TLD_LIST = 'https://data.iana.org/TLD/tlds-alpha-by-domain.txt'
+IANA_WHOIS = 'whois.iana.org'
+
+DOMAIN_RE = re.compile(r'^domain:[ \t]*(\S+)', re.M | re.I)
+WHOIS_RE = re.compile(r'^whois:[ \t]*(\S+)', re.M | re.I)
+
+
+def tld_key(tld):
+    """Return the table key for ``tld``: lower case, with internationalized
+    TLDs in their ASCII (``xn--``) form.
+    """
+    if isinstance(tld, str):
+        try:
+            tld = tld.decode('ascii')
+        except UnicodeDecodeError:
+            tld = tld.decode('utf-8', 'replace')
+    try:
+        return tld.lower().encode('ascii')
+    except UnicodeEncodeError:
+        return tld.lower().encode('idna')
+
+
+def server_for_tld(tld):
+    """Return the whois server for ``tld``, or None if it is not in the table."""
+    server = TLD_SERVERS.get(tld)
+    if server is None:
+        try:
+            server = TLD_SERVERS.get(tld_key(tld))
+        except UnicodeError:
+            return None
+    return server
+
+
+def parse_iana(text):
+    """Yield ``(tld, server)`` for every record in ``text``, a sequence of
+    ``whois.iana.org`` replies. TLDs without a whois server are skipped.
+    """
+    starts = [m.start() for m in DOMAIN_RE.finditer(text)] + [len(text)]
+    for begin, end in zip(starts, starts[1:]):
+        record = text[begin:end]
+        tld = DOMAIN_RE.match(record).group(1)
+        server = WHOIS_RE.search(record)
+        if server is not None:
+            yield tld_key(tld), server.group(1).lower()
+
+
+def read_dumps(paths):
+    """Return the table built from the IANA replies in ``paths``; a
+    directory stands for every file in it.
+    """
+    servers = {}
+    for path in paths:
+        if os.path.isdir(path):
+            files = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+        else:
+            files = [path]
+        for name in files:
+            f = open(name)
+            try:
+                servers.update(parse_iana(f.read()))
+            finally:
+                f.close()
+    return servers
+
+
+def fetch_tld_list(url=IANA_TLD_LIST):
+    """Return the TLDs of the root zone, in lower case, from IANA's list."""
+    f = urllib2.urlopen(url)
+    try:
+        lines = f.read().splitlines()
+    finally:
+        f.close()
+    return [line.strip().lower() for line in lines
+            if line.strip() and not line.startswith('#')]
+
+
+def fetch_iana(tlds, client=None, save=None):
+    """Yield the ``whois.iana.org`` reply for each of ``tlds``, asked
+    through ``client`` (a ``NICClient`` held to one query per second by
+    default). Replies are also written to the directory ``save``, one file
+    per TLD, when given.
+    """
+    from whois import NICClient
+    from ratelimit import ServerScheduler
+    if client is None:
+        client = NICClient(scheduler=ServerScheduler({IANA_WHOIS: (1.0, 1)}))
+    for tld in tlds:
+        text = str(client.whois(tld, IANA_WHOIS, 0))
+        if save is not None:
+            f = open(os.path.join(save, tld), 'w')
+            try:
+                f.write(text)
+            finally:
+                f.close()
+        yield text
+
+
+def write_table(servers, out):
+    """Write ``servers`` to ``out`` as the source of ``tld_servers.py``."""
+    out.write('# tld_servers.py - Whois server of each top level domain\n'
+              '#\n'
+              '# Generated by "python -m pywhois.tlds" from the IANA root zone\n'
+              '# database. Do not edit by hand; regenerate instead.\n'
+              '\n'
+              'TLD_SERVERS = {\n')
+    for tld in sorted(servers):
+        out.write('    %r: %r,\n' % (tld, servers[tld]))
+    out.write('}\n')
+
+
+def parse_command_line(argv):
+    usage = "usage: %prog [options] [dump ...]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option("-f", "--fetch", action="store_true", dest="fetch",
+                      help="Query whois.iana.org for every TLD in the root zone")
+    parser.add_option("-s", "--save", action="store", type="string",
+                      dest="save", metavar="DIR",
+                      help="With --fetch, keep the replies in this directory")
+    parser.add_option("-o", "--output", action="store", type="string",
+                      dest="output",
+                      default=os.path.join(os.path.dirname(__file__), 'tld_servers.py'),
+                      help="Write the table here (default: the bundled table)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    (options, args) = parse_command_line(argv)
+    if options.fetch:
+        servers = {}
+        for text in fetch_iana(fetch_tld_list(), save=options.save):
+            servers.update(parse_iana(text))
+    elif args:
+        servers = read_dumps(args)
+    else:
+        sys.exit("no IANA dump given, and no --fetch")
+    out = open(options.output, 'w')
+    try:
+        write_table(servers, out)
+    finally:
+        out.close()
+    print '%d TLDs written to %s' % (len(servers), options.output)
+
+
+if __name__ == '__main__':
+    main()
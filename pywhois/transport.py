@@ -0,0 +1,130 @@
+# transport.py - How NICClient exchanges a query for a reply
+#
+# This module is part of pywhois and is released under
+# the MIT license: http://www.opensource.org/licenses/mit-license.php
+
+"""Transports carry one query to a whois server and bring back its reply.
+
+``NICClient.whois`` hands every exchange to its transport. The default
+``SocketTransport`` talks to the server over TCP. ``RecordingTransport``
+does the same and also appends each exchange (server, query bytes, reply
+bytes, timings) to an archive file. ``ReplayTransport`` answers from such
+an archive without opening a socket, optionally taking as long as the
+recorded exchange did:
+
+    >>> client = NICClient(transport=RecordingTransport('capture.jsonl'))
+    >>> client = NICClient(transport=ReplayTransport('capture.jsonl', timing=True))
+
+Archives are JSON Lines, one exchange per line, with the bytes stored as
+latin-1 strings so they come back exactly as sent.
+"""
+
+import json
+import time
+import socket
+import threading
+
+from metrics import HopTrace
+
+
+class NotRecorded(Exception):
+    """The archive has no exchange for this server and query."""
+
+
+class SocketTransport(object):
+    """Exchange over a TCP connection to the server."""
+
+    def exchange(self, client, hostname, data, trace):
+        """Send ``data`` to ``hostname`` and return its reply, noting
+        timings and byte counts in ``trace``.
+        """
+        s = client.connect(hostname, trace)
+        try:
+            s.sendall(data)
+            trace.bytes_sent = len(data)
+            return client.read_response(s, trace)
+        finally:
+            s.close()
+            trace.closed = time.time()
+
+
+class RecordingTransport(object):
+    """Passes exchanges on to ``transport`` (a ``SocketTransport`` by
+    default) and appends each one to the archive at ``path``.
+    """
+
+    def __init__(self, path, transport=None):
+        self.path = path
+        self.transport = transport or SocketTransport()
+        self.lock = threading.Lock()
+        self.archive = open(path, 'a')
+
+    def exchange(self, client, hostname, data, trace):
+        record = {'server': hostname, 'query': data.decode('latin-1'),
+                  'response': None, 'error': None}
+        try:
+            response = self.transport.exchange(client, hostname, data, trace)
+            record['response'] = response.decode('latin-1')
+            return response
+        except Exception, e:
+            record['error'] = '%s.%s' % (e.__class__.__module__, e.__class__.__name__)
+            record['message'] = str(e)
+            raise
+        finally:
+            record['durations'] = trace.durations()
+            with self.lock:
+                self.archive.write(json.dumps(record) + '\n')
+                self.archive.flush()
+
+    def close(self):
+        self.archive.close()
+
+
+class ReplayTransport(object):
+    """Answers from the archive at ``path``. Exchanges recorded more than
+    once for the same server and query are replayed in order, the last
+    one repeating. With ``timing``, each exchange takes as long as it did
+    when recorded, phase by phase.
+    """
+
+    # trace attribute set at the end of each HopTrace phase
+    MARKS = ('resolved', 'connected', 'first_byte', 'last_byte', 'closed')
+
+    def __init__(self, path, timing=False):
+        self.timing = timing
+        self.exchanges = {}
+        self.lock = threading.Lock()
+        f = open(path)
+        try:
+            for line in f:
+                record = json.loads(line)
+                key = (record['server'], record['query'].encode('latin-1'))
+                self.exchanges.setdefault(key, []).append(record)
+        finally:
+            f.close()
+
+    def exchange(self, client, hostname, data, trace):
+        with self.lock:
+            records = self.exchanges.get((hostname, data))
+            if not records:
+                raise NotRecorded('%s: %r' % (hostname, data))
+            record = records[0]
+            if len(records) > 1:
+                records.pop(0)
+        trace.start = time.time()
+        durations = record.get('durations', {})
+        for phase, mark in zip(HopTrace.PHASES, ReplayTransport.MARKS):
+            if phase not in durations:
+                break
+            if self.timing:
+                time.sleep(durations[phase])
+            setattr(trace, mark, time.time())
+        if record['error'] is not None:
+            if record['error'] == 'socket.timeout':
+                raise socket.timeout(record.get('message'))
+            raise socket.error(record.get('message'))
+        trace.address = 'replay'
+        trace.bytes_sent = len(data)
+        response = record['response'].encode('latin-1')
+        trace.bytes_received = len(response)
+        return response
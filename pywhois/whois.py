@@ -30,11 +30,73 @@ THE SOFTWARE.
               Id:  $Id$
           Author:  Chris Wolf
 """
+import re
 import sys
+import time
+import errno
+import select
 import socket
 import optparse
+from collections import namedtuple
 #import pdb
 
+from cache import is_negative
+from metrics import HopTrace
+from resolver import default_resolver, open_connection
+from tlds import server_for_tld
+from transport import SocketTransport
+
+
+def wait_readable(sock, timeout):
+    """Block until ``sock`` is readable or ``timeout`` seconds pass.
+
+    Uses poll() where available so descriptors above FD_SETSIZE work,
+    select() otherwise. Returns True if the socket is readable.
+    """
+    try:
+        if hasattr(select, 'poll'):
+            poller = select.poll()
+            poller.register(sock, select.POLLIN | select.POLLPRI)
+            return bool(poller.poll(timeout * 1000))
+        return bool(select.select([sock], [], [], timeout)[0])
+    except (select.error, IOError), e:
+        if e.args[0] == errno.EINTR:
+            return False
+        raise
+
+
+class ResponseTooLarge(Exception):
+    """A server sent more than ``NICClient.max_response_size`` bytes.
+    The bytes received up to the limit are kept in ``partial``.
+    """
+
+    def __init__(self, hostname, limit, partial):
+        Exception.__init__(self, '%s sent more than %d bytes' % (hostname, limit))
+        self.hostname = hostname
+        self.limit = limit
+        self.partial = partial
+
+
+# One server's part of a lookup: its hostname, its reply, and the
+# metrics.HopTrace of the exchange (None where no trace was kept).
+Hop = namedtuple('Hop', 'hostname text trace')
+
+
+class WhoisResponse(str):
+    """Replies of every server along a referral chain, joined together as
+    ``NICClient.whois`` has always returned them. The replies are also
+    kept apart in ``hops``, a list of ``Hop``, the authoritative one last.
+    """
+
+    def __new__(cls, hops):
+        self = str.__new__(cls, ''.join(hop.text for hop in hops))
+        self.hops = hops
+        return self
+
+    def __reduce__(self):
+        # str's own pickling would pass the joined text back as ``hops``
+        return (WhoisResponse, (self.hops,))
+
 
 class NICClient(object) :
 
@@ -58,6 +120,34 @@ class NICClient(object) :
     DEFAULT_PORT        = "nicname"
     WHOIS_SERVER_ID     = "Whois Server:"
     WHOIS_ORG_SERVER_ID = "Registrant Street1:Whois Server:"
+    NO_SERVER           = "No whois server is known for this kind of object."
+    REGISTRAR_RE        = re.compile(r'Registrar:\s*(.+)')
+    # servers taking "=name" for an exact match instead of a substring search
+    EXACT_MATCH_HOSTS   = ('com' + QNICHOST_TAIL, 'net' + QNICHOST_TAIL,
+                           'cc' + QNICHOST_TAIL, 'tv' + QNICHOST_TAIL,
+                           'jobs' + QNICHOST_TAIL, 'whois.verisign-grs.com',
+                           'ccwhois.verisign-grs.com')
+    # thin registries, whose replies leave the contacts to the registrar
+    THIN_HOSTS          = (NICHOST,) + EXACT_MATCH_HOSTS
+    REGISTRANT_RE       = re.compile(r'^\s*Registrant\b', re.M | re.I)
+    # how the replies of servers that may leave the connection open end,
+    # so reading stops there instead of waiting out idle_timeout. A marker
+    # only counts when nothing but white space follows it.
+    VERISIGN_END        = r'^Registrars\.'
+    RIPE_END            = r'^% This query was served by .*\r?\n\r?\n'
+    COMPLETION_MARKERS  = {
+        NICHOST: VERISIGN_END,
+        'com' + QNICHOST_TAIL: VERISIGN_END,
+        'net' + QNICHOST_TAIL: VERISIGN_END,
+        'whois.verisign-grs.com': VERISIGN_END,
+        RNICHOST: RIPE_END,
+        PNICHOST: RIPE_END,
+        LNICHOST: r'^% and AS numbers\.',
+        BNICHOST: r'^% provider, CIDR block, IP and ASN\.',
+        IANAHOST: r'^source:\s+IANA\r?\n',
+    }
+    # bytes at the end of a reply searched for its completion marker
+    MARKER_WINDOW       = 2048
 
 
     WHOIS_RECURSE       = 0x01
@@ -65,8 +155,53 @@ class NICClient(object) :
 
     ip_whois = [ LNICHOST, RNICHOST, PNICHOST, BNICHOST ]
 
-    def __init__(self) :
+    def __init__(self, connect_timeout=10, first_byte_timeout=30,
+                 idle_timeout=2, total_timeout=240, scheduler=None, cache=None,
+                 referral_cache=None, hooks=None, max_response_size=None,
+                 truncate_response=False, resolver=None, port=43,
+                 netblock_cache=None, completion_markers=None,
+                 single_flight=None, transport=None) :
         self.use_qnichost = False
+        # optional ratelimit.ServerScheduler shared by clients that should
+        # respect the same per-server query budgets
+        self.scheduler = scheduler
+        # optional cache.WhoisCache consulted by whois_lookup
+        self.cache = cache
+        # optional cache.ReferralCache; with one, re-queries for a domain go
+        # straight to the registrar server found the first time
+        self.referral_cache = referral_cache
+        # optional cache.NetblockCache answering IP lookups from the
+        # address block of an earlier reply
+        self.netblock_cache = netblock_cache
+        # optional cache.SingleFlight, shared by the clients (or threads)
+        # whose identical concurrent lookups should go out only once
+        self.single_flight = single_flight
+        # callables given a metrics.HopTrace after each exchange
+        self.hooks = list(hooks or [])
+        # where server addresses come from; the shared default caches them
+        self.resolver = resolver or default_resolver
+        self.port = port
+        # what carries each query to its server; see transport.py for
+        # recording exchanges and replaying them without the network
+        self.transport = transport or SocketTransport()
+        # seconds to wait for the TCP connection, for the first byte of the
+        # reply, for more data once the reply has started, and for the
+        # whole exchange with one server
+        self.connect_timeout = connect_timeout
+        self.first_byte_timeout = first_byte_timeout
+        self.idle_timeout = idle_timeout
+        self.total_timeout = total_timeout
+        # bytes accepted from one server; past that the reply is cut short
+        # if truncate_response is set, and ResponseTooLarge raised if not
+        self.max_response_size = max_response_size
+        self.truncate_response = truncate_response
+        # hostname -> regex matching the end of its replies; given markers
+        # add to or replace the defaults, None disables one
+        markers = dict(NICClient.COMPLETION_MARKERS)
+        markers.update(completion_markers or {})
+        self.completion_markers = dict((host, re.compile(marker, re.M))
+                                       for host, marker in markers.items()
+                                       if marker is not None)
         
     def findwhois_server(self, buf, hostname):
         """Search the initial TLD lookup results for the regional-specifc
@@ -91,65 +226,198 @@ class NICClient(object) :
                     break
         return nhost
         
-    def whois(self, query, hostname, flags):
-		from time import time, sleep
-		"""Perform initial lookup with TLD whois server
-		then, if the quick flag is false, search that result 
-		for the region-specifc whois server and do a lookup
-		there for contact details
-		"""
-		#pdb.set_trace()
-		begin = time()
-		s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		s.connect((hostname, 43))
-		s.setblocking(0)
-		if (hostname == NICClient.GERMNICHOST):
-			s.send("-T dn,ace -C US-ASCII " + query + "\r\n")
-		elif (hostname == 'com' + NICClient.QNICHOST_TAIL) or (hostname == 'net' + NICClient.QNICHOST_TAIL) \
-			or (hostname == 'cc' + NICClient.QNICHOST_TAIL) or (hostname == 'tv' + NICClient.QNICHOST_TAIL) \
-			or (hostname == 'jobs' + NICClient.QNICHOST_TAIL):
-			s.send('=' + query + "\r\n")
-		elif (hostname == NICClient.JPNICHOST):
-			s.send(query + "/e\r\n")	# english only makes regexes easier for me
-		else:
-			s.send(query + "\r\n")
-		response = ''
-		while True:
-			if response and time()-begin>2:
-				# minimum wait period, once we've gotten some data.
-				break
-			elif time()-begin>240:
-				# maximum time reached, give up.
-				break
-			try:
-				d = s.recv(4096)
-				if d:
-					response += d
-					begin = time()
-				else:
-					sleep(0.1)
-			except:
-				pass
-		s.close()
-		#pdb.set_trace()
-		nhost = None
-		if (flags & NICClient.WHOIS_RECURSE and nhost == None):
-			nhost = self.findwhois_server(response, hostname)
-		if (nhost != None):
-			response += self.whois(query, nhost, 0)
-		return response
+    def format_query(self, query, hostname):
+        """Return the line to send to ``hostname`` for ``query``, in the
+        syntax that particular server expects.
+        """
+        if (hostname == NICClient.GERMNICHOST) or (hostname == 'whois.denic.de'):
+            return "-T dn,ace -C US-ASCII " + query + "\r\n"
+        elif (hostname in NICClient.EXACT_MATCH_HOSTS):
+            return '=' + query + "\r\n"
+        elif (hostname == NICClient.JPNICHOST) or (hostname == 'whois.jprs.jp'):
+            return query + "/e\r\n"	# english only makes regexes easier for me
+        else:
+            return query + "\r\n"
+
+    def add_hook(self, hook):
+        """Call ``hook`` with the ``metrics.HopTrace`` of every exchange
+        this client completes or fails.
+        """
+        self.hooks.append(hook)
+
+    def session(self, hostname):
+        """Return a ``session.WhoisSession`` for sending many queries to
+        ``hostname``, over one connection where the server supports it.
+        """
+        from session import open_session
+        return open_session(self, hostname)
+
+    def whois(self, query, hostname, flags, hop=0):
+        """Perform initial lookup with TLD whois server
+        then, if the quick flag is false, search that result 
+        for the region-specifc whois server and do a lookup
+        there for contact details. Returns a ``WhoisResponse``.
+        """
+        if (flags & NICClient.WHOIS_RECURSE and self.referral_cache is not None):
+            nhost = self.referral_cache.get(query)
+            if (nhost != None):
+                try:
+                    response = self.whois(query, nhost, 0)
+                except socket.error:
+                    response = ''
+                if response.strip() and not is_negative(response):
+                    return response
+                # stale referral, start over from the registry
+                self.referral_cache.forget(query)
+        if self.scheduler is not None:
+            self.scheduler.acquire(hostname)
+        trace = HopTrace(query, hostname, hop)
+        try:
+            data = self.format_query(query, hostname)
+            response = self.transport.exchange(self, hostname, data, trace)
+        except Exception, e:
+            trace.error = e
+            raise
+        finally:
+            for hook in self.hooks:
+                hook(trace)
+        if self.scheduler is not None:
+            self.scheduler.feedback(hostname, response)
+        hops = [Hop(hostname, response, trace)]
+        nhost = None
+        if (flags & NICClient.WHOIS_RECURSE and nhost == None):
+            nhost = self.findwhois_server(response, hostname)
+            if (self.referral_cache is not None):
+                nhost = self.learn_referral(query, response, nhost, hostname)
+        if (nhost != None):
+            hops += self.whois(query, nhost, 0, hop + 1).hops
+        return WhoisResponse(hops)
+
+    def learn_referral(self, query, buf, nhost, hostname=None):
+        """Record the referral found in registry reply ``buf`` from
+        ``hostname`` in the referral cache. When the reply names no server,
+        fall back on the one last seen for the same registrar, but only if
+        the reply comes from a thin registry or holds no registrant data:
+        a thick registry's reply is complete as it is. Returns the host to
+        query next.
+        """
+        match = NICClient.REGISTRAR_RE.search(buf)
+        registrar = match and match.group(1).strip()
+        thin = (hostname in NICClient.THIN_HOSTS or
+                NICClient.REGISTRANT_RE.search(buf) is None)
+        if (nhost == None and registrar and thin):
+            nhost = self.referral_cache.server_for_registrar(registrar)
+        if (nhost != None):
+            self.referral_cache.learn(query, nhost, registrar)
+        return nhost
+
+    def connect(self, hostname, trace):
+        """Open a connection to the whois port of ``hostname``, racing its
+        IPv6 and IPv4 addresses, and note the timings in ``trace``.
+        """
+        trace.start = time.time()
+        addresses = self.resolver.resolve(hostname, self.port)
+        trace.resolved = time.time()
+        s, sockaddr = open_connection(addresses, self.connect_timeout)
+        s.settimeout(self.connect_timeout)
+        trace.address = sockaddr[0]
+        trace.connected = time.time()
+        return s
+
+    def read_response(self, s, trace=None, lines=None):
+        """Read a reply from the connected socket ``s``.
+
+        Sleeps in poll/select until the socket is readable and returns as
+        soon as the server closes the connection. Servers that keep the
+        connection open are cut off once nothing has arrived for
+        ``idle_timeout`` seconds; ``first_byte_timeout`` and
+        ``total_timeout`` bound a server that never answers or never stops.
+        Replies from servers in ``completion_markers`` end as soon as their
+        marker arrives, and with ``lines`` once that many lines have.
+        Arrival times and the byte count go into ``trace`` when given.
+        """
+        s.setblocking(0)
+        begin = last = time.time()
+        chunks = []
+        size = 0
+        limit = self.max_response_size
+        hostname = getattr(trace, 'hostname', None)
+        marker = self.completion_markers.get(hostname)
+        tail = ''
+        newlines = 0
+        while True:
+            now = time.time()
+            if chunks:
+                wait = self.idle_timeout - (now - last)
+            else:
+                wait = self.first_byte_timeout - (now - begin)
+            wait = min(wait, self.total_timeout - (now - begin))
+            if wait <= 0:
+                break
+            if not wait_readable(s, wait):
+                continue
+            try:
+                d = s.recv(4096)
+            except socket.error, e:
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    continue
+                # connection reset, keep whatever we have but note
+                # the reply may be cut short
+                if trace is not None:
+                    trace.error = e
+                break
+            if not d:
+                break # end of stream
+            chunks.append(d)
+            size += len(d)
+            last = time.time()
+            if trace is not None:
+                if trace.first_byte is None:
+                    trace.first_byte = last
+                trace.last_byte = last
+                trace.bytes_received += len(d)
+            if limit is not None and size > limit:
+                response = ''.join(chunks)[:limit]
+                if self.truncate_response:
+                    if trace is not None:
+                        trace.truncated = True
+                    return response
+                raise ResponseTooLarge(hostname, limit, response)
+            if marker is not None:
+                tail = (tail + d)[-NICClient.MARKER_WINDOW:]
+                if self.is_complete(marker, tail):
+                    break
+            if lines is not None:
+                newlines += d.count('\n')
+                if newlines >= lines:
+                    break
+        return ''.join(chunks)
+
+    def is_complete(self, marker, tail):
+        """Return True if ``tail``, the end of a reply so far, ends with a
+        match of the completion ``marker``.
+        """
+        end = None
+        for match in marker.finditer(tail):
+            end = match.end()
+        return end is not None and not tail[end:].strip()
     
     def choose_server(self, domain):
         """Choose initial lookup NIC host"""
         if (domain.endswith("-NORID")):
             return NICClient.NORIDHOST
+        if (':' in domain):
+            return NICClient.ANICHOST # IPv6 address
         pos = domain.rfind('.')
         if (pos == -1):
             return None
         tld = domain[pos+1:]
         if (tld[0].isdigit()):
             return NICClient.ANICHOST
-    
+        # the bundled IANA table saves the whois-servers.net indirection
+        server = server_for_tld(tld)
+        if (server != None):
+            return server
         return tld + NICClient.QNICHOST_TAIL
     
     def whois_lookup(self, options, query_arg, flags):
@@ -157,6 +425,49 @@ class NICClient(object) :
         or other server to get region-specific whois server, then if quick 
         flag is false, perform a second lookup on the region-specific 
         server for contact records"""
+        nichost, flags = self.lookup_server(options, query_arg, flags)
+        if (nichost == None):
+            return NICClient.NO_SERVER
+        if self.single_flight is None:
+            return self.cached_whois(query_arg, nichost, flags)
+        return self.single_flight.do((query_arg, nichost, flags), self.cached_whois,
+                                     query_arg, nichost, flags)
+
+    def cached_whois(self, query_arg, nichost, flags):
+        """``whois``, answered from the caches of this client if they can."""
+        if self.netblock_cache is not None:
+            result = self.netblock_cache.get(query_arg)
+            if result is not None:
+                return result
+        if self.cache is None:
+            result = self.whois(query_arg, nichost, flags)
+        else:
+            key = (query_arg, nichost, flags)
+            result = self.cache.get(key)
+            if result is None:
+                result = self.whois(query_arg, nichost, flags)
+                # a reply cut short by a reset or the size limit is not
+                # worth keeping
+                if not self.cut_short(result):
+                    self.cache.set(key, result)
+        if self.netblock_cache is not None:
+            self.netblock_cache.learn(query_arg, result)
+        return result
+
+    def cut_short(self, response):
+        """Return True if a server reset the connection during any
+        exchange of ``response``, or a reply was truncated at
+        ``max_response_size``.
+        """
+        for hop in getattr(response, 'hops', ()):
+            if hop.trace is not None and (hop.trace.error is not None or hop.trace.truncated):
+                return True
+        return False
+
+    def lookup_server(self, options, query_arg, flags):
+        """Pick the host ``whois_lookup`` starts from, and the flags to
+        query it with. Returns a ``(hostname, flags)`` tuple.
+        """
         nichost = None
         #pdb.set_trace()
         # this would be the case when this function is called by other then main
@@ -170,15 +481,13 @@ class NICClient(object) :
                 flags |= NICClient.WHOIS_RECURSE
             
         if (options.has_key('country') and options['country'] != None):
-            result = self.whois(query_arg, options['country'] + NICClient.QNICHOST_TAIL, flags)
+            nichost = options['country'] + NICClient.QNICHOST_TAIL
         elif (self.use_qnichost):
             nichost = self.choose_server(query_arg)
-            if (nichost != None):
-                result = self.whois(query_arg, nichost, flags)
         else:
-            result = self.whois(query_arg, options['whoishost'], flags)
+            nichost = options['whoishost']
             
-        return result
+        return nichost, flags
 #---- END OF NICClient class def ---------------------
     
 def parse_command_line(argv):
@@ -245,8 +554,8 @@ def parse_command_line(argv):
     
 if __name__ == "__main__":
     flags = 0
-    nic_client = NICClient()
     (options, args) = parse_command_line(sys.argv)
+    nic_client = NICClient(port=options.port or 43)
     if (options.b_quicklookup is True):
         flags = flags|NICClient.WHOIS_QUICK
     print nic_client.whois_lookup(options.__dict__, args[1], flags)
@@ -16,6 +16,7 @@ setup(name='pywhois',
       license='MIT',
       packages=find_packages(exclude=['ez_setup', 'examples', 'tests']),
       include_package_data=True,
+      package_data={'pywhois': ['public_suffix_list.dat']},
       zip_safe=False,
       install_requires=[
           # -*- Extra requirements: -*-
@@ -0,0 +1,237 @@
+"""Benchmarks for parsing and lookups over the sample corpus.
+
+    python test/benchmark.py [-o results.json] [-b baseline.json] [-t 0.2]
+
+Run from the top of the source tree. Each benchmark reports the number
+of operations per second, the best of ``--repeat`` rounds:
+
+- ``parse/all``: records per second over every file in test/samples/whois,
+  loading each with ``WhoisEntry.load`` and reading every field
+- ``parse/tld/<tld>``: the same for the parser registered for each TLD
+- ``cast_date/<format>``: ``cast_date`` on a date in each of DATE_FORMATS,
+  the samples in ``DATES``
+- ``extract_domain/<kind>``: ``extract_domain`` on URLs of each shape
+- ``lookup/<kind>``: ``NICClient.whois_lookup`` against simulated
+  servers on localhost (see whoisserver.py), and ``AsyncNICClient`` with
+  ``CONCURRENT`` lookups in flight against a server taking 50ms to answer
+- ``whois/replay``: the whole ``pywhois.whois`` pipeline, from URL to
+  parsed entry, with the server exchanges replayed from a recording of
+  the ``lookup/referral`` one so no time goes to the network
+
+Results are written as JSON with ``--output``. Given a ``--baseline``
+from an earlier run, every benchmark slower than it by more than
+``--tolerance`` (a fraction) is listed and the exit status is 1.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import json
+import time
+import tempfile
+import platform
+import optparse
+from glob import glob
+
+import pywhois
+from pywhois import extract_domain
+from pywhois import parser
+from pywhois.parser import WhoisEntry, PywhoisError, cast_date
+from pywhois.whois import NICClient
+from pywhois.asyncwhois import AsyncNICClient
+from pywhois.transport import RecordingTransport, ReplayTransport
+from whoisserver import WhoisSimulator
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'samples', 'whois')
+
+URLS = {
+    'bare': 'google.com',
+    'url': 'http://www.google.com/search?q=whois',
+    'multilevel': 'https://news.bbc.co.uk/sport/football',
+    'port_user': 'ftp://anonymous@ftp.example.com.au:2121/pub/',
+    'address': '193.0.6.139',
+}
+
+# a date written in each of parser.DATE_FORMATS, as found in replies
+DATES = {
+    '%d-%b-%Y': '02-jan-2000',
+    '%Y-%m-%d': '2000-01-02',
+    '%Y.%m.%d %H:%M:%S': '2006.06.12 15:53:14',
+    '%Y.%m.%d': '2002.12.25',
+    '%Y-%b-%d': '2008-Feb-5',
+    '%d.%m.%Y %H:%M:%S': '18.05.2004 18:15:00',
+    '%d.%m.%Y': '21.5.1998',
+    '%d-%b-%Y %H:%M:%S %Z': '24-Jul-2009 13:20:03 UTC',
+    '%Y-%m-%d %H:%M': '2000-03-07 00:00',
+    '%a %b %d %H:%M:%S %Z %Y': 'Tue Jun 21 23:59:59 GMT 2011',
+    '%d %b %Y %H:%M %Z': '31 Dec 1999 05:00 GMT',
+    '%Y-%m-%dT%H:%M:%S': '2007-01-26T19:10:31',
+    '%Y%m%d%H%M%S': '20110209194637',
+    '%Y%m%d': '20020702',
+    '%m/%d/%Y': '05/14/2002',
+    '%d/%m/%Y': '13/09/2004',
+    '%Y/%m/%d': '2004/10/14',
+    '%Y. %m. %d.': '2007. 04. 23.',
+}
+
+# lookups in flight at once in the lookup/async benchmark
+CONCURRENT = 200
+
+
+def load_samples():
+    """Return ``(domain, text)`` for every sample, named after its domain."""
+    return [(os.path.basename(path), open(path).read())
+            for path in sorted(glob(os.path.join(SAMPLES, '*')))]
+
+
+def parse(cls, domain, text):
+    try:
+        entry = cls(domain, text)
+    except PywhoisError:
+        return
+    for attr in entry.attrs():
+        getattr(entry, attr)
+
+
+def measure(function, ops, repeat=3, min_time=0.2):
+    """Return the best ops per second of ``function``, which performs
+    ``ops`` operations a call, over ``repeat`` rounds of at least
+    ``min_time`` seconds.
+    """
+    best = 0.0
+    for i in range(repeat):
+        calls = 0
+        begin = time.time()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.time() - begin
+            if elapsed >= min_time:
+                break
+        best = max(best, calls * ops / elapsed)
+    return best
+
+
+def bench_parse(samples, repeat):
+    results = {}
+    def parse_all():
+        for domain, text in samples:
+            parse(WhoisEntry.load, domain, text)
+    results['parse/all'] = measure(parse_all, len(samples), repeat)
+    for tld, cls in sorted(parser.parsers.items()):
+        def parse_tld():
+            for domain, text in samples:
+                parse(cls, domain, text)
+        results['parse/tld/' + tld] = measure(parse_tld, len(samples), repeat)
+    return results
+
+
+def bench_cast_date(repeat):
+    results = {}
+    for format, date_str in sorted(DATES.items()):
+        assert cast_date(date_str) is not None, date_str
+        results['cast_date/' + format] = measure(lambda: cast_date(date_str), 1, repeat)
+    return results
+
+
+def bench_extract_domain(repeat):
+    results = {}
+    for kind, url in sorted(URLS.items()):
+        results['extract_domain/' + kind] = measure(lambda: extract_domain(url), 1, repeat)
+    return results
+
+
+def bench_lookup(repeat):
+    sim = WhoisSimulator()
+    sim.add_server('whois.verisign-grs.com', referral='whois.registrar.test')
+    sim.add_server('whois.registrar.test')
+    sim.add_server('whois.slow.test', latency=0.05)
+    sim.start()
+    results = {}
+    try:
+        client = NICClient(resolver=sim.resolver())
+        results['lookup/quick'] = measure(
+            lambda: client.whois_lookup(None, 'google.com', NICClient.WHOIS_QUICK), 1, repeat)
+        results['lookup/referral'] = measure(
+            lambda: client.whois_lookup(None, 'google.com', 0), 1, repeat)
+        def concurrent():
+            client = AsyncNICClient(concurrency=CONCURRENT, resolver=sim.resolver())
+            for i in range(CONCURRENT):
+                client.whois('google.com', 'whois.slow.test', 0, lambda text, error: None)
+            client.run()
+        results['lookup/async_50ms'] = measure(concurrent, CONCURRENT, repeat)
+        archive = tempfile.NamedTemporaryFile(suffix='.jsonl')
+        recorder = RecordingTransport(archive.name)
+        NICClient(resolver=sim.resolver(), transport=recorder).whois_lookup(None, 'google.com', 0)
+        recorder.close()
+    finally:
+        sim.stop()
+    replay = ReplayTransport(archive.name)
+    archive.close()
+    results['whois/replay'] = measure(
+        lambda: pywhois.whois('http://www.google.com/', transport=replay), 1, repeat)
+    return results
+
+
+def run(repeat=3):
+    samples = load_samples()
+    results = {}
+    results.update(bench_parse(samples, repeat))
+    results.update(bench_cast_date(repeat))
+    results.update(bench_extract_domain(repeat))
+    results.update(bench_lookup(repeat))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return ``(name, baseline, result)`` for each benchmark more than
+    ``tolerance`` slower than in ``baseline``.
+    """
+    regressions = []
+    for name, ops in sorted(baseline.items()):
+        if name in results and results[name] < ops * (1 - tolerance):
+            regressions.append((name, ops, results[name]))
+    return regressions
+
+
+def parse_command_line(argv):
+    usage = "usage: %prog [options]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option("-o", "--output", action="store", type="string",
+                      dest="output",
+                      help="Write the results to this JSON file")
+    parser.add_option("-b", "--baseline", action="store", type="string",
+                      dest="baseline",
+                      help="Compare with the results in this JSON file")
+    parser.add_option("-t", "--tolerance", action="store", type="float",
+                      dest="tolerance", default=0.2,
+                      help="Slowdown reported as a regression (default 0.2)")
+    parser.add_option("-n", "--repeat", action="store", type="int",
+                      dest="repeat", default=3,
+                      help="Rounds per benchmark, the best one counts (default 3)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    (options, args) = parse_command_line(argv)
+    results = run(options.repeat)
+    for name, ops in sorted(results.items()):
+        print '%-40s %12.1f ops/s' % (name, ops)
+    if options.output:
+        f = open(options.output, 'w')
+        json.dump({'python': platform.python_version(), 'time': time.time(),
+                   'results': results}, f, indent=2, sort_keys=True)
+        f.close()
+    if options.baseline:
+        baseline = json.load(open(options.baseline))['results']
+        regressions = compare(results, baseline, options.tolerance)
+        for name, before, after in regressions:
+            print 'REGRESSION %s: %.1f -> %.1f ops/s (%.0f%%)' % (
+                name, before, after, 100.0 * (after - before) / before)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
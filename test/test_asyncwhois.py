@@ -0,0 +1,131 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+import time
+import errno
+import socket
+
+from pywhois.whois import NICClient, ResponseTooLarge
+from pywhois.resolver import StaticResolver
+from pywhois.metrics import HopTrace
+from pywhois.parser import PywhoisError
+from pywhois.asyncwhois import AsyncNICClient, whois_many
+from whoisserver import WhoisSimulator, closed_port
+
+class FixedResolver(object):
+    def __init__(self, *addresses):
+        self.addresses = addresses
+
+    def resolve(self, hostname, port):
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, address)
+                for address in self.addresses]
+
+class TestAsyncWhois(unittest.TestCase):
+    def setUp(self):
+        self.sim = WhoisSimulator()
+
+    def tearDown(self):
+        self.sim.stop()
+
+    def lookup(self, client, hostname, flags=0):
+        results = []
+        client.whois('google.com', hostname, flags, lambda text, error: results.append((text, error)))
+        client.run()
+        return results
+
+    def test_address_fallback(self):
+        server = self.sim.add_server('whois.registrar.test')
+        self.sim.start()
+        client = AsyncNICClient(resolver=FixedResolver(closed_port(), server.address))
+        self.assertEquals(self.lookup(client, 'whois.registrar.test'),
+                          [(self.sim.samples['google.com'], None)])
+        self.assertEquals(server.connections, 1)
+
+    def test_referral(self):
+        self.sim.add_server('whois.registry.test', referral='whois.registrar.test')
+        self.sim.add_server('whois.registrar.test')
+        self.sim.start()
+        traces = []
+        client = AsyncNICClient(resolver=self.sim.resolver(), hooks=[traces.append])
+        [(response, error)] = self.lookup(client, 'whois.registry.test', NICClient.WHOIS_RECURSE)
+        self.assertEquals(error, None)
+        self.assertEquals([hop.hostname for hop in response.hops],
+                          ['whois.registry.test', 'whois.registrar.test'])
+        self.assertEquals(response.hops[1].text, self.sim.samples['google.com'])
+        self.assertEquals(traces, [hop.trace for hop in response.hops])
+        for i, hop in enumerate(response.hops):
+            self.assertEquals((hop.trace.hostname, hop.trace.hop), (hop.hostname, i))
+            self.assertEquals(hop.trace.bytes_received, len(hop.text))
+            self.assertEquals(hop.trace.bytes_sent, len('google.com\r\n'))
+            self.assertEquals(sorted(hop.trace.durations()), sorted(HopTrace.PHASES))
+
+    def test_concurrency_cap(self):
+        server = self.sim.add_server('whois.slow.test', latency=0.1)
+        self.sim.start()
+        client = AsyncNICClient(concurrency=3, resolver=self.sim.resolver())
+        results = []
+        for i in range(10):
+            client.whois('google.com', 'whois.slow.test', 0, lambda text, error: results.append(text))
+        peak = 0
+        while client.poll():
+            peak = max(peak, len(client.active))
+        self.assertEquals(peak, 3)
+        self.assertEquals(results, [self.sim.samples['google.com']] * 10)
+        self.assertEquals(server.connections, 10)
+
+    def test_timeout_and_refused(self):
+        self.sim.add_server('whois.hang.test', hang=True)
+        self.sim.start()
+        client = AsyncNICClient(first_byte_timeout=0.2, resolver=self.sim.resolver())
+        begin = time.time()
+        self.assertEquals(self.lookup(client, 'whois.hang.test'), [('', None)])
+        self.assertTrue(0.2 <= time.time() - begin < 1)
+        client = AsyncNICClient(resolver=FixedResolver(closed_port()))
+        [(text, error)] = self.lookup(client, 'whois.refused.test')
+        self.assertEquals(text, None)
+        self.assertEquals(error.args[0], errno.ECONNREFUSED)
+
+    def test_max_response_size(self):
+        self.sim.add_server('whois.large.test', drip=(1024, 0.001))
+        self.sim.start()
+        reply = self.sim.samples['google.com']
+        client = AsyncNICClient(max_response_size=2000, truncate_response=True,
+                                resolver=self.sim.resolver())
+        [(text, error)] = self.lookup(client, 'whois.large.test')
+        self.assertEquals(error, None)
+        self.assertEquals(len(text), 2000)
+        self.assertEquals(text, reply[:2000])
+        client = AsyncNICClient(max_response_size=2000, resolver=self.sim.resolver())
+        [(text, error)] = self.lookup(client, 'whois.large.test')
+        self.assertEquals(text, None)
+        self.assertTrue(isinstance(error, ResponseTooLarge))
+        self.assertEquals(error.limit, 2000)
+        self.assertEquals(error.partial, reply[:2000])
+
+    def test_whois_many_streams(self):
+        server = self.sim.add_server('whois.any.test', latency=0.05)
+        self.sim.start()
+        client = AsyncNICClient(concurrency=2, resolver=StaticResolver(default=server.address))
+        pulled = []
+        def urls():
+            for i in range(6):
+                pulled.append(i)
+                yield ['http://www.google.com/', 'imdb.com', 'nosuchdomain.com'][i % 3]
+        results = whois_many(urls(), client=client)
+        url, entry, error = results.next()
+        self.assertTrue(len(pulled) < 6)
+        results = [(url, entry, error)] + list(results)
+        self.assertEquals(len(results), 6)
+        for url, entry, error in results:
+            if url == 'nosuchdomain.com':
+                self.assertEquals(entry, None)
+                self.assertTrue(isinstance(error, PywhoisError))
+            else:
+                self.assertEquals(error, None)
+            if url == 'imdb.com':
+                self.assertTrue('IMDB.COM' in entry.domain_name)
+
+if __name__ == '__main__':
+    unittest.main()
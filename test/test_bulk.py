@@ -0,0 +1,93 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+import os
+import time
+import json
+import shutil
+import tempfile
+import threading
+from StringIO import StringIO
+
+from pywhois.bulk import lookup, run
+from pywhois.cache import SingleFlight
+from pywhois.store import ResponseStore
+from pywhois.resolver import StaticResolver
+from whoisserver import WhoisSimulator, load_samples, closed_port
+
+class SlowTransport(object):
+    """Answers every query from the samples after ``delay`` seconds."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.samples = load_samples()
+
+    def exchange(self, client, hostname, data, trace):
+        time.sleep(self.delay)
+        return self.samples.get(data.lstrip('=').strip(), '')
+
+class TestBulk(unittest.TestCase):
+    def test_run(self):
+        sim = WhoisSimulator()
+        server = sim.add_server('whois.any.test')
+        sim.start()
+        try:
+            resolver = StaticResolver({'whois.publicinterestregistry.org': closed_port()},
+                                      default=server.address)
+            queries = ['google.com\n', 'http://www.imdb.com/\n', '\n', 'nosuchdomain.com\n',
+                       'example.org\n']
+            out = StringIO()
+            run(queries, out, workers=3, resolver=resolver)
+        finally:
+            sim.stop()
+        lines = out.getvalue().splitlines()
+        self.assertEquals(len(lines), 4)
+        records = dict((record['query'], record) for record in map(json.loads, lines))
+        self.assertEquals(sorted(records), ['example.org', 'google.com',
+                                            'http://www.imdb.com/', 'nosuchdomain.com'])
+        for record in records.values():
+            self.assertEquals(sorted(record), ['domain', 'elapsed', 'error', 'fields', 'hops',
+                                               'message', 'query', 'servers', 'text'])
+            self.assertEquals(len(record['hops']), len(record['servers']))
+        record = records['http://www.imdb.com/']
+        self.assertEquals(record['domain'], 'imdb.com')
+        self.assertEquals(record['error'], None)
+        self.assertTrue('IMDB.COM' in record['fields']['domain_name'])
+        self.assertEquals(record['servers'], ['whois.verisign-grs.com', 'whois.tucows.com'])
+        self.assertTrue(record['text'].startswith(sim.samples['imdb.com']))
+        record = records['nosuchdomain.com']
+        self.assertEquals(record['error'], 'pywhois.parser.PywhoisError')
+        self.assertEquals(record['fields'], None)
+        record = records['example.org']
+        self.assertEquals(record['error'], 'socket.error')
+        self.assertEquals(record['servers'], ['whois.publicinterestregistry.org'])
+
+    def test_shared_lookup_reports_hops(self):
+        transport = SlowTransport(0.2)
+        single_flight = SingleFlight()
+        directory = tempfile.mkdtemp()
+        store = ResponseStore(os.path.join(directory, 'replies'))
+        records = []
+        def work():
+            records.append(lookup('google.com', single_flight=single_flight, transport=transport,
+                                  store=store))
+        try:
+            threads = [threading.Thread(target=work) for i in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # archived once, by the thread that fetched it
+            self.assertEquals(len(store), 1)
+            store.close()
+        finally:
+            shutil.rmtree(directory)
+        self.assertEquals(single_flight.stats()['shared'], 1)
+        for record in records:
+            self.assertEquals(record['servers'], ['whois.verisign-grs.com', 'whois.itsyourdomain.com'])
+            self.assertEquals(len(record['hops']), 2)
+
+if __name__ == '__main__':
+    unittest.main()
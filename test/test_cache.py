@@ -0,0 +1,135 @@
+import unittest
+
+import os
+import sys
+sys.path.append('../')
+
+import time
+import tempfile
+import threading
+
+from pywhois.whois import NICClient
+from pywhois.parser import WhoisEntry
+from pywhois.cache import MemoryCache, SqliteCache, ReferralCache, NetblockCache, SingleFlight, is_negative
+from whoisserver import WhoisSimulator
+
+class TestCache(unittest.TestCase):
+    def test_memory_lru(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set(('a.com', 'com.whois-servers.net', 1), 'A')
+        cache.set(('b.com', 'com.whois-servers.net', 1), 'B')
+        self.assertEquals(cache.get(('a.com', 'com.whois-servers.net', 1)), 'A')
+        cache.set(('c.com', 'com.whois-servers.net', 1), 'C')
+        self.assertEquals(cache.get(('b.com', 'com.whois-servers.net', 1)), None)
+        self.assertEquals(cache.get(('a.com', 'com.whois-servers.net', 1)), 'A')
+        self.assertEquals(cache.stats(), {'hits': 2, 'misses': 1, 'size': 2})
+
+    def test_negative_ttl(self):
+        cache = MemoryCache(ttl=60, negative_ttl=0)
+        text = open('test/samples/whois/google.com').read()
+        self.assertFalse(is_negative(text))
+        self.assertTrue(is_negative('No match for "NOSUCHDOMAIN.COM".\r\n'))
+        cache.set(('google.com', None, 1), text)
+        cache.set(('nosuchdomain.com', None, 1), 'No match for "NOSUCHDOMAIN.COM".\r\n')
+        self.assertEquals(cache.get(('google.com', None, 1)), text)
+        self.assertEquals(cache.get(('nosuchdomain.com', None, 1)), None)
+
+    def test_transient_replies(self):
+        cache = MemoryCache()
+        throttled = '%ERROR:201: access denied - query rate limit exceeded\r\n'
+        cache.set(('google.com', None, 1), '')
+        cache.set(('google.com', None, 0), throttled)
+        self.assertEquals(len(cache), 0)
+        cache = MemoryCache(error_ttl=60)
+        cache.set(('google.com', None, 0), throttled)
+        self.assertEquals(cache.get(('google.com', None, 0)), throttled)
+
+    def test_sqlite_persists(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            cache = SqliteCache(path)
+            cache.set(('google.com', 'com.whois-servers.net', 1), 'Domain Name: GOOGLE.COM\xff')
+            cache.close()
+            cache = SqliteCache(path)
+            self.assertEquals(cache.get(('google.com', 'com.whois-servers.net', 1)), 'Domain Name: GOOGLE.COM\xff')
+            self.assertEquals(len(cache), 1)
+            cache.close()
+        finally:
+            os.unlink(path)
+
+    def test_sqlite_keeps_hops(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        sim = WhoisSimulator()
+        sim.add_server('whois.registry.test', referral='whois.registrar.test')
+        sim.add_server('whois.registrar.test')
+        sim.start()
+        try:
+            client = NICClient(cache=SqliteCache(path), resolver=sim.resolver())
+            fetched = client.cached_whois('google.com', 'whois.registry.test', NICClient.WHOIS_RECURSE)
+            cached = client.cached_whois('google.com', 'whois.registry.test', NICClient.WHOIS_RECURSE)
+            self.assertEquals(client.cache.stats()['hits'], 1)
+            self.assertEquals(cached, fetched)
+            self.assertEquals([(hop.hostname, hop.text) for hop in cached.hops],
+                              [(hop.hostname, hop.text) for hop in fetched.hops])
+            fetched = WhoisEntry.load('google.com', fetched)
+            cached = WhoisEntry.load('google.com', cached)
+            for attr in fetched.attrs():
+                self.assertEquals(getattr(cached, attr), getattr(fetched, attr))
+            self.assertEquals(cached.registrar, fetched.registrar)
+            client.cache.close()
+        finally:
+            sim.stop()
+            os.unlink(path)
+
+    def test_referral_follows_registrar(self):
+        referrals = ReferralCache()
+        self.assertEquals(referrals.get('google.com'), None)
+        referrals.learn('google.com', 'whois.markmonitor.com', 'MARKMONITOR INC.')
+        referrals.learn('youtube.com', 'whois.markmonitor.net', 'MARKMONITOR INC.')
+        self.assertEquals(referrals.get('google.com'), 'whois.markmonitor.net')
+        referrals.forget('google.com')
+        self.assertEquals(referrals.get('google.com'), None)
+        self.assertEquals(referrals.server_for_registrar('MARKMONITOR INC.'), 'whois.markmonitor.net')
+
+    def test_netblock(self):
+        netblocks = NetblockCache(maxsize=2)
+        arin = 'NetRange:       8.0.0.0 - 8.255.255.255\nCIDR:           8.0.0.0/8\n' \
+               'NetRange:       8.8.8.0 - 8.8.8.255\nCIDR:           8.8.8.0/24\n'
+        self.assertEquals(netblocks.learn('8.8.8.8', arin), [(32, 0x08080800, 24)])
+        self.assertEquals(netblocks.get('8.8.8.200'), arin)
+        self.assertEquals(netblocks.get('8.8.9.1'), None)
+        ripe = 'inetnum:        193.0.0.0 - 193.0.7.255\n'
+        self.assertEquals(len(netblocks.learn('193.0.6.139', ripe)), 1)
+        self.assertEquals(netblocks.get('193.0.0.1'), ripe)
+        netblocks.learn('2001:67c:2e8::1', 'inet6num: 2001:67c:2e8::/48\n')
+        self.assertEquals(netblocks.get('8.8.8.8'), None)
+        self.assertEquals(netblocks.get('2001:67c:2e8:ffff::1'), 'inet6num: 2001:67c:2e8::/48\n')
+        self.assertEquals(netblocks.roots[32][0], None)
+
+    def test_single_flight(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+        def lookup(query):
+            calls.append(query)
+            release.wait()
+            return 'Domain Name: ' + query
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flights.do('google.com', lookup, 'google.com')))
+                   for i in range(5)]
+        for thread in threads:
+            thread.start()
+        while flights.stats()['calls'] < 5:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(results, ['Domain Name: google.com'] * 5)
+        self.assertEquals(calls, ['google.com'])
+        self.assertEquals(flights.stats(), {'calls': 5, 'shared': 4, 'in_flight': 0})
+        self.assertRaises(ValueError, flights.do, 'x', int, 'x')
+
+if __name__ == '__main__':
+    unittest.main()
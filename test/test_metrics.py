@@ -0,0 +1,63 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+from pywhois.whois import NICClient
+from pywhois.metrics import HopTrace, LatencyStats
+from whoisserver import WhoisSimulator
+
+class TestMetrics(unittest.TestCase):
+    def make_trace(self, hostname, start, error=None):
+        trace = HopTrace('google.com', hostname)
+        trace.start, trace.resolved, trace.connected = start, start + 0.01, start + 0.05
+        trace.first_byte, trace.last_byte, trace.closed = start + 0.15, start + 0.2, start + 2.2
+        trace.bytes_received = 100
+        trace.error = error
+        return trace
+
+    def test_durations(self):
+        trace = self.make_trace('com.whois-servers.net', 1000.0)
+        durations = trace.durations()
+        self.assertAlmostEquals(durations['connect'], 0.04)
+        self.assertAlmostEquals(durations['idle'], 2.0)
+        self.assertAlmostEquals(trace.total(), 2.2)
+
+    def test_stats(self):
+        stats = LatencyStats(buckets=(1, 5, float('inf')))
+        stats(self.make_trace('com.whois-servers.net', 1000.0))
+        stats(self.make_trace('com.whois-servers.net', 2000.0, error=IOError()))
+        stats(HopTrace('google.com', 'whois.markmonitor.com'))
+        snapshot = stats.snapshot()
+        com = snapshot['com.whois-servers.net']
+        self.assertEquals((com['count'], com['errors'], com['bytes_received']), (2, 1, 200))
+        self.assertEquals(com['histogram'], [(1, 0), (5, 2), (float('inf'), 0)])
+        self.assertEquals(snapshot['whois.markmonitor.com']['count'], 1)
+
+    def test_client_hooks(self):
+        sim = WhoisSimulator()
+        sim.add_server('whois.registry.test', referral='whois.registrar.test')
+        sim.add_server('whois.registrar.test')
+        sim.start()
+        try:
+            traces = []
+            stats = LatencyStats()
+            client = NICClient(resolver=sim.resolver(), hooks=[traces.append, stats])
+            response = client.whois('google.com', 'whois.registry.test', NICClient.WHOIS_RECURSE)
+        finally:
+            sim.stop()
+        self.assertEquals([(t.hostname, t.hop) for t in traces],
+                          [('whois.registry.test', 0), ('whois.registrar.test', 1)])
+        for trace, hop in zip(traces, response.hops):
+            self.assertEquals(trace.query, 'google.com')
+            self.assertEquals(trace.address, '127.0.0.1')
+            self.assertEquals(trace.bytes_sent, len('google.com\r\n'))
+            self.assertEquals(trace.bytes_received, len(hop.text))
+            self.assertEquals(trace.error, None)
+            self.assertEquals(sorted(trace.durations()), sorted(HopTrace.PHASES))
+        snapshot = stats.snapshot()
+        self.assertEquals(snapshot['whois.registrar.test']['bytes_received'],
+                          len(sim.samples['google.com']))
+
+if __name__ == '__main__':
+    unittest.main()
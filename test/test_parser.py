@@ -4,12 +4,19 @@ import os
 import sys
 sys.path.append('../')
 
+import re
+import copy
 import time
+import pickle
+import datetime
 
 import simplejson
 from glob import glob
 
-from pywhois.parser import WhoisEntry, cast_date
+from pywhois import parser
+from pywhois.parser import WhoisEntry, FieldExtractor, cast_date
+from pywhois.whois import WhoisResponse, Hop
+from pywhois.metrics import HopTrace
 
 class TestParser(unittest.TestCase):
     def test_com_expiration(self):
@@ -31,6 +38,74 @@ class TestParser(unittest.TestCase):
             r = time.strftime('%Y-%m-%d', cast_date(d))
             self.assertEquals(r, '2008-04-14')
 
+    def test_cast_date_hint(self):
+        self.assertEquals(cast_date('13/09/2004', 'fr')[:3], (2004, 9, 13))
+        self.assertEquals(cast_date('05/06/2002', 'fr')[:3], (2002, 6, 5))
+        self.assertEquals(cast_date('05/06/2002')[:3], (2002, 5, 6))
+        self.assertEquals(cast_date('2007-01-26T19:10:31'), time.strptime('2007-01-26T19:10:31', '%Y-%m-%dT%H:%M:%S'))
+        self.assertEquals(cast_date('2008-02-30'), None)
+
+    def test_date_hint_per_tld(self):
+        # neither parsed by a registered parser; one's dates must not
+        # change how the other's read
+        first = WhoisEntry('example.xx', 'Creation Date: 13/09/2004\n')
+        self.assertEquals(first.creation_datetime, datetime.datetime(2004, 9, 13))
+        other = WhoisEntry('example.yy', 'Creation Date: 05/06/2002\n')
+        self.assertEquals(other.creation_datetime, datetime.datetime(2002, 5, 6))
+
+    def test_typed_dates(self):
+        w = WhoisEntry.load('google.com', open('test/samples/whois/google.com').read())
+        self.assertEquals(w.expiration_datetime, datetime.datetime(2011, 9, 14))
+        self.assertEquals(WhoisEntry.load('google.de', 'Domain: google.de').creation_datetime, None)
+
+    def test_load_dispatch(self):
+        self.assertEquals(type(WhoisEntry.load('google.com', 'Domain Name: GOOGLE.COM')), parser.WhoisCom)
+        self.assertEquals(type(WhoisEntry.load('bbc.co.uk', 'Domain name:\n  bbc.co.uk')), parser.WhoisUk)
+        self.assertEquals(type(WhoisEntry.load('example.xyz', 'Domain Name: EXAMPLE.XYZ')), WhoisEntry)
+
+        class WhoisExampleTest(WhoisEntry):
+            tlds = ('example.test',)
+        self.assertEquals(type(WhoisEntry.load('www.example.test', '')), WhoisExampleTest)
+        self.assertEquals(type(WhoisEntry.load('other.test', '')), WhoisEntry)
+
+    def test_load_last_hop(self):
+        registry = 'Domain Name: GOOGLE.COM\nRegistrar: MARKMONITOR INC.\n' \
+                   'Whois Server: whois.markmonitor.com\nName Server: NS1.GOOGLE.COM\n' \
+                   'Expiration Date: 14-sep-2011\n'
+        registrar = 'Domain Name: google.com\nName Server: ns1.google.com\n'
+        text = WhoisResponse([Hop('whois.verisign-grs.com', registry, None),
+                              Hop('whois.markmonitor.com', registrar, None)])
+        self.assertEquals(text, registry + registrar)
+        w = WhoisEntry.load('google.com', text)
+        self.assertEquals(w.name_servers, ['ns1.google.com'])
+        self.assertEquals(w.expiration_date, ['14-sep-2011'])
+        self.assertEquals(w.whois_server, ['whois.markmonitor.com'])
+
+    def test_pickle_response(self):
+        trace = HopTrace('google.com', 'whois.verisign-grs.com')
+        text = WhoisResponse([Hop('whois.verisign-grs.com', 'registry\n', trace),
+                              Hop('whois.markmonitor.com', 'registrar\n', None)])
+        copies = [pickle.loads(pickle.dumps(text, protocol)) for protocol in range(3)]
+        for copied in copies + [copy.copy(text)]:
+            self.assertEquals(copied, text)
+            self.assertEquals([hop.hostname for hop in copied.hops],
+                              ['whois.verisign-grs.com', 'whois.markmonitor.com'])
+            self.assertEquals(copied.hops[0].trace.hostname, 'whois.verisign-grs.com')
+
+    def test_extractor_matches_findall(self):
+        """
+        Every parser's one-pass extraction must give what running re.findall
+        on each of its patterns gives, for every sample.
+        """
+        tables = [WhoisEntry._regex] + [cls.regex for cls in vars(parser).values()
+                                       if isinstance(cls, type) and 'regex' in vars(cls)]
+        for path in glob('test/samples/whois/*'):
+            data = open(path).read()
+            for regex in tables:
+                results = FieldExtractor(regex).extract(data)
+                for key, pattern in regex.items():
+                    self.assertEquals(results[key], re.findall(pattern, data))
+
     def test_com_allsamples(self):
         """
         Iterate over all of the sample/whois/*.com files, read the data,
@@ -73,4 +148,6 @@ class TestParser(unittest.TestCase):
                     fail += 1
             
         if fail:
-            self.fail("%d sample whois attributes were not parsed properly!" % fail)
\ No newline at end of file
+            self.fail("%d sample whois attributes were not parsed properly!" % fail)
+if __name__ == '__main__':
+    unittest.main()
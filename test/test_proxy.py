@@ -0,0 +1,137 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+import time
+import socket
+import threading
+
+from pywhois.whois import NICClient
+from pywhois.cache import MemoryCache, SingleFlight
+from pywhois.resolver import StaticResolver
+from pywhois.transport import SocketTransport
+from pywhois.proxy import WhoisProxy, parse_command_line
+from whoisserver import WhoisSimulator
+
+class Upstream(object):
+    """Whois server on localhost answering every query with ``reply``."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.queries = []
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(5)
+        self.address = self.listener.getsockname()
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        while True:
+            conn, address = self.listener.accept()
+            self.queries.append(conn.recv(1024))
+            conn.sendall(self.reply)
+            conn.close()
+
+class GatedTransport(SocketTransport):
+    """Holds every exchange until ``release`` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def exchange(self, client, hostname, data, trace):
+        self.release.wait()
+        return SocketTransport.exchange(self, client, hostname, data, trace)
+
+class TestProxy(unittest.TestCase):
+    def serve(self, backend, **kwargs):
+        proxy = WhoisProxy(('127.0.0.1', 0), backend, NICClient.WHOIS_QUICK, **kwargs)
+        thread = threading.Thread(target=proxy.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return proxy
+
+    def test_cached_lookups(self):
+        upstream = Upstream('Domain Name: GOOGLE.COM\r\n')
+        backend = NICClient(cache=MemoryCache(),
+                            resolver=StaticResolver(default=upstream.address))
+        proxy = self.serve(backend)
+        try:
+            client = NICClient(port=proxy.server_address[1])
+            for i in range(2):
+                text = client.whois_lookup({'whoishost': '127.0.0.1'}, 'google.com', 0)
+                self.assertEquals(text, 'Domain Name: GOOGLE.COM\r\n')
+            self.assertEquals(upstream.queries, ['=google.com\r\n'])
+            self.assertEquals(client.whois('', '127.0.0.1', 0), '')
+        finally:
+            proxy.shutdown()
+            proxy.server_close()
+
+    def test_concurrent_lookups(self):
+        sim = WhoisSimulator()
+        upstream = sim.add_server('whois.upstream.test')
+        sim.start()
+        transport = GatedTransport()
+        backend = NICClient(resolver=StaticResolver(default=upstream.address),
+                            single_flight=SingleFlight(), transport=transport)
+        proxy = self.serve(backend)
+        texts = []
+        def lookup():
+            client = NICClient(port=proxy.server_address[1])
+            texts.append(client.whois_lookup({'whoishost': '127.0.0.1'}, 'google.com', 0))
+        try:
+            threads = [threading.Thread(target=lookup) for i in range(10)]
+            for thread in threads:
+                thread.start()
+            # every query has reached the proxy before the upstream answers
+            while backend.single_flight.stats()['calls'] < 10:
+                time.sleep(0.01)
+            transport.release.set()
+            for thread in threads:
+                thread.join()
+            self.assertEquals(texts, [sim.samples['google.com']] * 10)
+            self.assertEquals(upstream.queries, ['=google.com'])
+        finally:
+            proxy.shutdown()
+            proxy.server_close()
+            sim.stop()
+
+    def test_max_connections(self):
+        sim = WhoisSimulator()
+        upstream = sim.add_server('whois.upstream.test', latency=0.2)
+        sim.start()
+        backend = NICClient(resolver=StaticResolver(default=upstream.address))
+        proxy = self.serve(backend, max_connections=1)
+        def lookup(domain):
+            client = NICClient(port=proxy.server_address[1])
+            client.whois_lookup({'whoishost': '127.0.0.1'}, domain, 0)
+        try:
+            begin = time.time()
+            threads = [threading.Thread(target=lookup, args=(domain,))
+                       for domain in ('google.com', 'imdb.com', 'urlowl.com')]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # answered one after the other
+            self.assertTrue(time.time() - begin >= 0.6)
+            self.assertEquals(len(upstream.queries), 3)
+        finally:
+            proxy.shutdown()
+            proxy.server_close()
+            sim.stop()
+
+    def test_rate_limit_options(self):
+        options, args = parse_command_line(['--rate', '5', '--burst', '10',
+                                            '--limit', 'whois.verisign-grs.com=20',
+                                            '--limit', 'Whois.Markmonitor.com=0.5/1'])
+        self.assertEquals((options.rate, options.burst), (5.0, 10))
+        self.assertEquals(options.limits, {'whois.verisign-grs.com': (20.0, 10),
+                                           'whois.markmonitor.com': (0.5, 1)})
+        options, args = parse_command_line([])
+        self.assertEquals((options.rate, options.burst, options.limits), (1.0, 5, {}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+from pywhois import extract_domain, extract_domains
+from pywhois.publicsuffix import PublicSuffixList
+
+class TestPublicSuffix(unittest.TestCase):
+    def test_rules(self):
+        psl = PublicSuffixList()
+        self.assertEquals(psl.registered_domain('www.bbc.co.uk'), 'bbc.co.uk')
+        self.assertEquals(psl.registered_domain('co.uk'), 'co.uk')
+        self.assertEquals(psl.registered_domain('a.b.kawasaki.jp'), 'a.b.kawasaki.jp')
+        self.assertEquals(psl.registered_domain('www.city.kawasaki.jp'), 'city.kawasaki.jp')
+        self.assertEquals(psl.registered_domain('www.example.unknowntld'), 'example.unknowntld')
+        self.assertEquals(psl.registered_domain('www.\xd0\xbf\xd1\x80\xd0\xb8\xd0\xbc\xd0\xb5\xd1\x80.\xd1\x80\xd1\x84'),
+                          '\xd0\xbf\xd1\x80\xd0\xb8\xd0\xbc\xd0\xb5\xd1\x80.\xd1\x80\xd1\x84')
+        self.assertEquals(psl.registered_domain('foo.blogspot.com'), 'blogspot.com')
+        # empty and odd labels, as found in crawl logs
+        self.assertEquals(psl.registered_domain('foo..com'), '.com')
+        self.assertEquals(psl.registered_domain('a..co.uk'), '.co.uk')
+        self.assertEquals(psl.registered_domain('a.!www.ck'), 'a.!www.ck')
+        self.assertEquals(PublicSuffixList(private=True).registered_domain('foo.blogspot.com'), 'foo.blogspot.com')
+
+    def test_extract_domain(self):
+        self.assertEquals(extract_domain('http://www.google.com.au/tos.html'), 'google.com.au')
+        self.assertEquals(extract_domain('https://user@Mail.Google.COM:443/?q=a.b'), 'google.com')
+        self.assertEquals(extract_domain('8.8.8.8'), '8.8.8.8')
+        self.assertEquals(extract_domain('http://a..co.uk/x'), '.co.uk')
+        self.assertEquals(list(extract_domains(['www.bbc.co.uk', 'news.bbc.co.uk', 'http://[2001:db8::1]/'])),
+                          ['bbc.co.uk', 'bbc.co.uk', '2001:db8::1'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+from pywhois.ratelimit import TokenBucket, ServerScheduler
+
+class TestRateLimit(unittest.TestCase):
+    def test_bucket_reservations_queue_up(self):
+        bucket = TokenBucket(2, 2)
+        now = bucket.last
+        delays = [bucket.reserve(now) for i in range(4)]
+        self.assertEquals(delays, [0, 0, 0.5, 1.0])
+
+    def test_throttle_backoff(self):
+        scheduler = ServerScheduler(default=(100, 100), backoff=10)
+        self.assertEquals(scheduler.reserve('whois.example'), 0)
+        self.assertFalse(scheduler.feedback('whois.example', 'Domain Name: EXAMPLE.COM'))
+        self.assertTrue(scheduler.feedback('whois.example', 'WHOIS LIMIT EXCEEDED - SEE WWW.PIR.ORG/WHOIS FOR DETAILS'))
+        self.assertTrue(scheduler.reserve('whois.example') > 9)
+        self.assertEquals(scheduler.reserve('whois.other'), 0)
+
+    def test_spacing_after_throttle(self):
+        scheduler = ServerScheduler(default=(1, 5), backoff=30)
+        scheduler.reserve('whois.example')
+        scheduler.feedback('whois.example', 'query rate limit exceeded')
+        delays = [scheduler.reserve('whois.example') for i in range(35)]
+        self.assertTrue(29 < delays[0] <= 31)
+        for before, after in zip(delays, delays[1:]):
+            self.assertAlmostEquals(after - before, 1.0, places=2)
+
+if __name__ == '__main__':
+    unittest.main()
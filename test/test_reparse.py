@@ -0,0 +1,52 @@
+import unittest
+
+import os
+import sys
+sys.path.append('../')
+
+from glob import glob
+
+from pywhois.reparse import parse_many, parse_record, WorkerDied
+
+class Unpicklable(str):
+    def __reduce__(self):
+        raise TypeError('not picklable')
+
+class Crash(str):
+    # parsing this ends the worker
+    def strip(self):
+        os._exit(1)
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'samples', 'whois')
+
+class TestReparse(unittest.TestCase):
+    def setUp(self):
+        self.records = [(os.path.basename(path), open(path).read())
+                        for path in sorted(glob(os.path.join(SAMPLES, '*')))]
+        self.expected = [parse_record(i, domain, text)
+                         for i, (domain, text) in enumerate(self.records)]
+
+    def test_ordered(self):
+        results = list(parse_many(iter(self.records), processes=2, chunksize=3, window=2))
+        self.assertEquals(results, self.expected)
+
+    def test_unordered(self):
+        results = list(parse_many(self.records, processes=2, chunksize=2, ordered=False,
+                                  maxtasksperchild=1))
+        results.sort(key=lambda result: result['index'])
+        self.assertEquals(results, self.expected)
+
+    def test_errors(self):
+        result = list(parse_many([('example.com', 'No whois server is known for this kind of object.')],
+                                 processes=1))[0]
+        self.assertEquals(result['error'], 'pywhois.parser.PywhoisError')
+        self.assertEquals(result['fields'], None)
+
+    def test_failed_chunks(self):
+        records = [('google.com', 'text'), ('x.com', Unpicklable('text'))]
+        self.assertRaises(TypeError, list, parse_many(records, processes=1, chunksize=1))
+        records = [('google.com', 'text'), ('x.com', Crash('text'))]
+        self.assertRaises(WorkerDied, list, parse_many(records, processes=1, chunksize=1))
+
+if __name__ == '__main__':
+    unittest.main()
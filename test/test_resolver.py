@@ -0,0 +1,95 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+import time
+import socket
+
+from pywhois.resolver import Resolver, StaticResolver, interleave, open_connection
+from whoisserver import closed_port
+
+class CountingResolver(Resolver):
+    calls = 0
+
+    def getaddrinfo(self, hostname, port):
+        self.calls += 1
+        if hostname == 'nowhere.invalid':
+            raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', port))]
+
+def blackhole():
+    """Return a listener whose accept queue is full, so connections to it
+    neither complete nor fail, and the sockets filling it.
+    """
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(0)
+    filling = []
+    for i in range(5):
+        s = socket.socket()
+        s.setblocking(0)
+        s.connect_ex(listener.getsockname())
+        filling.append(s)
+    return listener, filling
+
+def address(sockaddr):
+    return (socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, sockaddr)
+
+class TestResolver(unittest.TestCase):
+    def test_cache(self):
+        resolver = CountingResolver()
+        first = resolver.resolve('whois.verisign-grs.com', 43)
+        self.assertEquals(resolver.resolve('whois.verisign-grs.com', 43), first)
+        self.assertEquals(resolver.calls, 1)
+        for i in range(2):
+            self.assertRaises(socket.gaierror, resolver.resolve, 'nowhere.invalid', 43)
+        self.assertEquals(resolver.calls, 2)
+
+    def test_interleave(self):
+        v4 = [(socket.AF_INET, 1, 6, ('192.0.2.%d' % i, 43)) for i in range(2)]
+        v6 = [(socket.AF_INET6, 1, 6, ('2001:db8::%d' % i, 43, 0, 0)) for i in range(2)]
+        self.assertEquals(interleave(v6 + v4), [v6[0], v4[0], v6[1], v4[1]])
+
+    def test_open_connection(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        port = listener.getsockname()[1]
+        try:
+            resolver = StaticResolver({'whois.example': ('127.0.0.1', port)})
+            s, sockaddr = open_connection(resolver.resolve('whois.example', 43), 5)
+            s.close()
+            self.assertEquals(sockaddr, ('127.0.0.1', port))
+            self.assertRaises(socket.gaierror, resolver.resolve, 'other.example', 43)
+        finally:
+            listener.close()
+
+    def test_next_address(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(5)
+        hole, filling = blackhole()
+        try:
+            good = listener.getsockname()
+            # a refused address moves on to the next at once
+            begin = time.time()
+            s, sockaddr = open_connection([address(closed_port()), address(good)], 5)
+            s.close()
+            self.assertEquals(sockaddr, good)
+            self.assertTrue(time.time() - begin < 0.2)
+            # one that never answers is raced by the next after attempt_delay
+            begin = time.time()
+            s, sockaddr = open_connection([address(hole.getsockname()), address(good)], 5,
+                                          attempt_delay=0.25)
+            s.close()
+            self.assertEquals(sockaddr, good)
+            self.assertTrue(0.25 <= time.time() - begin < 0.5)
+        finally:
+            listener.close()
+            hole.close()
+            for s in filling:
+                s.close()
+
+if __name__ == '__main__':
+    unittest.main()
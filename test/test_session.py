@@ -0,0 +1,143 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+import os
+import time
+import socket
+import tempfile
+import threading
+
+from pywhois.whois import NICClient
+from pywhois.cache import MemoryCache
+from pywhois.resolver import StaticResolver
+from pywhois.transport import RecordingTransport
+from pywhois.session import WhoisSession, KeepAliveSession, BulkSession
+
+SERVED_BY = '% This query was served by the RIPE Database Query Service version 1.0 (TEST)\n\n\n'
+
+class FakeServer(object):
+    """Whois server on localhost answering RIPE -k sessions and Cymru
+    bulk queries; counts the connections it accepts. With ``linger``, bulk
+    connections stay open after the answer.
+    """
+
+    def __init__(self, linger=False):
+        self.linger = linger
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(5)
+        self.address = self.listener.getsockname()
+        self.connections = 0
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        while True:
+            conn, address = self.listener.accept()
+            self.connections += 1
+            f = conn.makefile()
+            keepalive = False
+            lines = []
+            for line in f:
+                line = line.strip()
+                if line.startswith('-k '):
+                    keepalive, line = True, line[3:]
+                if line == 'begin' or lines:
+                    lines.append(line)
+                    if line == 'end':
+                        conn.sendall('Bulk mode; whois.cymru.com\n')
+                        conn.sendall(''.join('15169 | %s | GOOGLE\n' % l for l in lines[1:-1]))
+                        if self.linger:
+                            lines = []
+                            continue
+                        break
+                    continue
+                conn.sendall('inetnum: %s\n\n' % line + SERVED_BY)
+                if not keepalive:
+                    break
+            f.close()
+            conn.close()
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeServer()
+        self.client = NICClient(resolver=StaticResolver(default=self.server.address))
+
+    def test_keepalive(self):
+        session = self.client.session(NICClient.RNICHOST)
+        self.assertTrue(isinstance(session, KeepAliveSession))
+        session.window = 2
+        replies = session.query_many(['193.0.6.%d' % i for i in range(5)])
+        session.close()
+        self.assertEquals(replies[3], 'inetnum: 193.0.6.3\n\n' + SERVED_BY[:-1])
+        self.assertEquals(len(replies), 5)
+        self.assertEquals(self.server.connections, 1)
+
+    def test_reply_split_across_reads(self):
+        session = KeepAliveSession(self.client, NICClient.RNICHOST)
+        first = 'inetnum: 193.0.6.1\n\n' + SERVED_BY[:-1]
+        second = 'inetnum: 193.0.6.2\n\n' + SERVED_BY[:-1]
+        data = 'x' * 10000 + '\n' + first + '\n' + second + '\n'
+        replies = []
+        # every split point of the end marker, one byte at a time
+        for c in data:
+            reply = session.feed(c)
+            if reply is not None:
+                replies.append(reply)
+        self.assertEquals(replies, ['x' * 10000 + '\n' + first, second])
+        self.assertEquals(session.chunks, [])
+        chunks = ['inetnum: 193.0.6.1\n\n% This query was ser', 'ved by RIPE\n', '\n' + second]
+        self.assertEquals(session.feed(chunks[0]), None)
+        self.assertEquals(session.feed(chunks[1]), None)
+        self.assertEquals(session.feed(chunks[2]),
+                          'inetnum: 193.0.6.1\n\n% This query was served by RIPE\n\n')
+        self.assertEquals(session.rest, second)
+
+    def test_bulk(self):
+        session = self.client.session('whois.cymru.com')
+        self.assertTrue(isinstance(session, BulkSession))
+        self.assertEquals(session.query_many(['8.8.8.8', '8.8.4.4']),
+                          ['15169 | 8.8.8.8 | GOOGLE\n', '15169 | 8.8.4.4 | GOOGLE\n'])
+
+    def test_bulk_stops_after_last_line(self):
+        server = FakeServer(linger=True)
+        client = NICClient(resolver=StaticResolver(default=server.address), idle_timeout=5)
+        begin = time.time()
+        self.assertEquals(client.session('whois.cymru.com').query_many(['8.8.8.8', '8.8.4.4']),
+                          ['15169 | 8.8.8.8 | GOOGLE\n', '15169 | 8.8.4.4 | GOOGLE\n'])
+        self.assertTrue(time.time() - begin < 1)
+
+    def test_cached(self):
+        self.client.cache = MemoryCache()
+        session = self.client.session(NICClient.RNICHOST)
+        first = session.query_many(['193.0.6.1', '193.0.6.2'])
+        replies = session.query_many(['193.0.6.2', '193.0.6.3', '193.0.6.1'])
+        session.close()
+        self.assertEquals(replies, [first[1], 'inetnum: 193.0.6.3\n\n' + SERVED_BY[:-1], first[0]])
+        self.assertEquals(self.client.cache.stats()['hits'], 2)
+        self.assertEquals(len(self.client.cache), 3)
+
+    def test_transport(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.client.transport = RecordingTransport(path)
+            session = self.client.session(NICClient.RNICHOST)
+            self.assertEquals(type(session), WhoisSession)
+            self.assertEquals(session.query('193.0.6.1'), 'inetnum: 193.0.6.1\n\n' + SERVED_BY)
+            self.assertEquals(len(open(path).readlines()), 1)
+            self.assertRaises(ValueError, KeepAliveSession, self.client, NICClient.RNICHOST)
+            self.client.transport.close()
+        finally:
+            os.unlink(path)
+
+    def test_fallback(self):
+        session = self.client.session('whois.arin.net')
+        self.assertEquals(session.query_many(['8.8.8.8', '8.8.4.4'])[1], 'inetnum: 8.8.4.4\n\n' + SERVED_BY)
+        self.assertEquals(self.server.connections, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+import os
+import shutil
+import tempfile
+
+from pywhois.store import ResponseStore
+from pywhois.whois import WhoisResponse, Hop
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'replies')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_history(self):
+        store = ResponseStore(self.path)
+        store.append('google.com', 'first', ['whois.verisign-grs.com'], fetched=100)
+        store.append('example.com', 'other', fetched=150)
+        store.flush()
+        store.append('Google.com', 'second', fetched=200)
+        response = WhoisResponse([Hop('whois.verisign-grs.com', 'thin\n', None),
+                                  Hop('whois.markmonitor.com', 'third', None)])
+        store.append('google.com', response, fetched=300)
+        self.assertEquals(len(store), 4)
+        self.assertEquals([r.text for r in store.history('google.com')],
+                          ['first', 'second', 'thin\nthird'])
+        self.assertEquals(store.at('google.com', 250).text, 'second')
+        self.assertEquals(store.at('google.com', 50), None)
+        latest = store.latest('google.com')
+        self.assertEquals(latest.servers, ('whois.verisign-grs.com', 'whois.markmonitor.com'))
+        self.assertEquals(latest.fetched, 300)
+        self.assertEquals(store.latest('google.co'), None)
+        store.close()
+
+        store = ResponseStore(self.path)
+        self.assertEquals((store.entries, len(store.pending)), (4, 0))
+        self.assertEquals([r.domain for r in store.scan()],
+                          ['google.com', 'example.com', 'google.com', 'google.com'])
+        self.assertEquals(store.latest('example.com').text, 'other')
+        store.close()
+
+    def test_long_domains(self):
+        store = ResponseStore(self.path)
+        prefix = 'a' * 70
+        store.append(prefix + '.com', 'com', fetched=100)
+        store.append(prefix + '.net', 'net', fetched=200)
+        store.flush()
+        self.assertEquals(store.latest(prefix + '.com').text, 'com')
+        self.assertEquals([r.text for r in store.history(prefix + '.net')], ['net'])
+        store.close()
+
+    def test_recover(self):
+        store = ResponseStore(self.path)
+        store.append('google.com', 'indexed', fetched=100)
+        store.flush()
+        store.append('google.com', 'unindexed', fetched=200)
+        size = os.path.getsize(self.path)
+        store.append('google.com', 'cut short', fetched=300)
+        store.writer.truncate(os.path.getsize(self.path) - 3)
+        # left as a crashed writer would
+        store.writer.close()
+
+        store = ResponseStore(self.path)
+        self.assertEquals(os.path.getsize(self.path), size)
+        self.assertEquals(store.latest('google.com').text, 'unindexed')
+        store.append('google.com', 'appended', fetched=400)
+        self.assertEquals([r.text for r in store.scan()], ['indexed', 'unindexed', 'appended'])
+        store.close()
+
+    def test_index_runs(self):
+        store = ResponseStore(self.path)
+        for i in range(64):
+            store.append('d%d.com' % (i % 5), 'reply %d' % i, fetched=i)
+            store.flush()
+        # runs of equal size merge like the digits of a binary counter
+        self.assertEquals([count for start, count in store.runs], [64])
+        store.append('d0.com', 'last', fetched=100)
+        store.flush()
+        self.assertEquals([count for start, count in store.runs], [64, 1])
+        store.close()
+
+        store = ResponseStore(self.path)
+        self.assertEquals((store.entries, len(store.pending)), (65, 0))
+        self.assertEquals([r.text for r in store.history('d3.com')],
+                          ['reply %d' % i for i in range(3, 64, 5)])
+        self.assertEquals(store.latest('d0.com').text, 'last')
+        store.append('d1.com', 'unflushed', fetched=200)
+        # left as a crashed flush would, with the last run cut short
+        index = open(store.index_path, 'r+b')
+        index.truncate(os.path.getsize(store.index_path) - 10)
+        index.close()
+        store.writer.close()
+
+        store = ResponseStore(self.path)
+        self.assertEquals([count for start, count in store.runs], [64])
+        self.assertEquals(len(store), 66)
+        self.assertEquals(store.latest('d0.com').text, 'last')
+        self.assertEquals(store.latest('d1.com').text, 'unflushed')
+        store.close()
+
+    def test_readonly(self):
+        store = ResponseStore(self.path)
+        store.append('google.com', 'indexed', fetched=100)
+        store.flush()
+        store.append('google.com', 'unindexed', fetched=200)
+        # a record the writer is still in the middle of
+        store.writer.write('\0\0\1\0partial')
+        store.writer.flush()
+        size = os.path.getsize(self.path)
+
+        reader = ResponseStore(self.path, readonly=True)
+        self.assertEquals(os.path.getsize(self.path), size)
+        # indexed on the first search, not on opening
+        self.assertEquals(reader.pending, [])
+        self.assertEquals(reader.latest('google.com').text, 'unindexed')
+        self.assertEquals([r.text for r in reader.scan()], ['indexed', 'unindexed'])
+        self.assertRaises(IOError, reader.append, 'google.com', 'text')
+        reader.close()
+        self.assertEquals(os.path.getsize(self.path), size)
+        store.writer.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+import os
+import shutil
+import tempfile
+
+from pywhois.tlds import parse_iana, server_for_tld, fetch_iana, read_dumps
+from pywhois.whois import NICClient
+from whoisserver import WhoisSimulator
+
+IANA_DUMP = """% IANA WHOIS server
+
+domain:       COM
+
+organisation: VeriSign Global Registry Services
+whois:        whois.verisign-grs.com
+
+status:       ACTIVE
+
+domain:       XN--P1AI
+
+whois:        whois.tcinet.ru
+
+domain:       MIL
+
+whois:
+status:       ACTIVE
+"""
+
+class TestTlds(unittest.TestCase):
+    def test_parse_iana(self):
+        self.assertEquals(dict(parse_iana(IANA_DUMP)),
+                          {'com': 'whois.verisign-grs.com', 'xn--p1ai': 'whois.tcinet.ru'})
+
+    def test_fetch_iana(self):
+        records = ['domain:' + record for record in IANA_DUMP.split('\n\ndomain:')[1:]]
+        sim = WhoisSimulator(dict(zip(['com', 'xn--p1ai', 'mil'], records)))
+        sim.add_server('whois.iana.org')
+        sim.start()
+        directory = tempfile.mkdtemp()
+        try:
+            client = NICClient(resolver=sim.resolver())
+            replies = list(fetch_iana(['com', 'xn--p1ai', 'mil'], client, directory))
+            self.assertEquals(sorted(os.listdir(directory)), ['com', 'mil', 'xn--p1ai'])
+            self.assertEquals(read_dumps([directory]),
+                              {'com': 'whois.verisign-grs.com', 'xn--p1ai': 'whois.tcinet.ru'})
+            self.assertEquals(dict(parse_iana('\n'.join(replies))), read_dumps([directory]))
+        finally:
+            sim.stop()
+            shutil.rmtree(directory)
+
+    def test_choose_server(self):
+        client = NICClient()
+        self.assertEquals(client.choose_server('google.com'), 'whois.verisign-grs.com')
+        self.assertEquals(client.choose_server('example.\xd1\x80\xd1\x84'), server_for_tld('xn--p1ai'))
+        self.assertEquals(client.choose_server('example.zz'), 'zz.whois-servers.net')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+import os
+import time
+import tempfile
+
+from pywhois.whois import NICClient
+from pywhois.transport import RecordingTransport, ReplayTransport, NotRecorded
+from whoisserver import WhoisSimulator
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def record(self):
+        sim = WhoisSimulator()
+        sim.add_server('whois.registry.test', referral='whois.registrar.test')
+        sim.add_server('whois.registrar.test', latency=0.1)
+        sim.start()
+        transport = RecordingTransport(self.path)
+        try:
+            client = NICClient(resolver=sim.resolver(), transport=transport)
+            return client.whois('google.com', 'whois.registry.test', NICClient.WHOIS_RECURSE)
+        finally:
+            transport.close()
+            sim.stop()
+
+    def test_replay(self):
+        recorded = self.record()
+        traces = []
+        client = NICClient(transport=ReplayTransport(self.path), hooks=[traces.append])
+        begin = time.time()
+        response = client.whois('google.com', 'whois.registry.test', NICClient.WHOIS_RECURSE)
+        self.assertTrue(time.time() - begin < 0.1)
+        self.assertEquals(response, recorded)
+        self.assertEquals([trace.hostname for trace in traces],
+                          ['whois.registry.test', 'whois.registrar.test'])
+        self.assertEquals(traces[1].bytes_received, len(recorded.hops[1].text))
+        self.assertRaises(NotRecorded, client.whois, 'example.com', 'whois.registry.test', 0)
+
+    def test_replay_timing(self):
+        self.record()
+        client = NICClient(transport=ReplayTransport(self.path, timing=True))
+        begin = time.time()
+        client.whois('google.com', 'whois.registrar.test', 0)
+        self.assertTrue(time.time() - begin >= 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+
+import sys
+sys.path.append('../')
+
+import time
+
+from pywhois.whois import NICClient, ResponseTooLarge
+from pywhois.ratelimit import ServerScheduler
+from pywhois.cache import MemoryCache, ReferralCache
+from whoisserver import WhoisSimulator, THROTTLED
+
+class TestWhois(unittest.TestCase):
+    def setUp(self):
+        self.sim = WhoisSimulator(seed=0)
+
+    def tearDown(self):
+        self.sim.stop()
+
+    def client(self, **kwargs):
+        self.sim.start()
+        return NICClient(resolver=self.sim.resolver(), **kwargs)
+
+    def test_referral(self):
+        self.sim.add_server('whois.registry.test', referral='whois.registrar.test')
+        registrar = self.sim.add_server('whois.registrar.test', drip=(1024, 0.001))
+        response = self.client().whois('google.com', 'whois.registry.test', NICClient.WHOIS_RECURSE)
+        self.assertEquals([hop.hostname for hop in response.hops],
+                          ['whois.registry.test', 'whois.registrar.test'])
+        self.assertEquals(response.hops[1].text, self.sim.samples['google.com'])
+        self.assertEquals(registrar.queries, ['google.com'])
+
+    def test_referral_cache(self):
+        registry = self.sim.add_server('whois.registry.test', referral='whois.registrar.test')
+        registrar = self.sim.add_server('whois.registrar.test')
+        self.sim.add_server('whois.gone.test', reset_rate=1.0)
+        client = self.client(referral_cache=ReferralCache())
+        for i in range(2):
+            response = client.whois('google.com', 'whois.registry.test', NICClient.WHOIS_RECURSE)
+            self.assertEquals(response.hops[-1].text, self.sim.samples['google.com'])
+        # the second lookup goes straight to the registrar
+        self.assertEquals([hop.hostname for hop in response.hops], ['whois.registrar.test'])
+        self.assertEquals((len(registry.queries), len(registrar.queries)), (1, 2))
+        # a cached referral that fails falls back on the full chain
+        client.referral_cache.learn('google.com', 'whois.gone.test')
+        response = client.whois('google.com', 'whois.registry.test', NICClient.WHOIS_RECURSE)
+        self.assertEquals([hop.hostname for hop in response.hops],
+                          ['whois.registry.test', 'whois.registrar.test'])
+        self.assertEquals(client.referral_cache.get('google.com'), 'whois.registrar.test')
+
+    def test_registrar_fallback(self):
+        self.sim.add_server('whois.registry.test', referral='whois.registrar.test')
+        self.sim.add_server('whois.registrar.test')
+        self.sim.add_server('whois.thick.test')
+        thick = 'Domain Name: %s\nRegistrar: SIMULATED REGISTRAR, INC.\n'
+        self.sim.samples['thick.org'] = thick % 'THICK.ORG' + 'Registrant Name: Thick Org\n'
+        self.sim.samples['thin.org'] = thick % 'THIN.ORG'
+        client = self.client(referral_cache=ReferralCache())
+        client.whois('google.com', 'whois.registry.test', NICClient.WHOIS_RECURSE)
+        # a thick reply naming a known registrar is complete as it is
+        response = client.whois('thick.org', 'whois.thick.test', NICClient.WHOIS_RECURSE)
+        self.assertEquals([hop.hostname for hop in response.hops], ['whois.thick.test'])
+        response = client.whois('thin.org', 'whois.thick.test', NICClient.WHOIS_RECURSE)
+        self.assertEquals([hop.hostname for hop in response.hops],
+                          ['whois.thick.test', 'whois.registrar.test'])
+
+    def test_completion_marker(self):
+        reply = self.sim.samples['google.com'].split('MarkMonitor.com - ')[0]
+        self.sim.samples['google.com'] = reply
+        self.sim.add_server('com.whois-servers.net', linger=True)
+        client = self.client(idle_timeout=5)
+        begin = time.time()
+        self.assertEquals(client.whois('google.com', 'com.whois-servers.net', 0), reply)
+        self.assertTrue(time.time() - begin < 1)
+
+    def test_marker_must_end_reply(self):
+        client = NICClient()
+        marker = client.completion_markers[NICClient.RNICHOST]
+        served = '% This query was served by the RIPE Database Query Service version 1.0\n\n'
+        self.assertTrue(client.is_complete(marker, 'inetnum: 193.0.0.0\n\n' + served + '\n'))
+        self.assertFalse(client.is_complete(marker, served + 'inetnum: 193.0.0.0\n'))
+        client = NICClient(completion_markers={NICClient.RNICHOST: None})
+        self.assertFalse(NICClient.RNICHOST in client.completion_markers)
+
+    def test_unanswered(self):
+        self.sim.add_server('whois.hang.test', hang=True)
+        self.sim.add_server('whois.reset.test', reset_rate=1.0)
+        client = self.client(first_byte_timeout=0.2)
+        begin = time.time()
+        self.assertEquals(client.whois('google.com', 'whois.hang.test', 0), '')
+        self.assertTrue(0.2 <= time.time() - begin < 1)
+        self.assertEquals(client.whois('google.com', 'whois.reset.test', 0), '')
+
+    def test_unanswered_not_cached(self):
+        self.sim.add_server('whois.reset.test', reset_rate=1.0)
+        self.sim.add_server('whois.throttle.test', throttle=(0.001, 0))
+        client = self.client(cache=MemoryCache())
+        self.assertEquals(client.cached_whois('google.com', 'whois.reset.test', 0), '')
+        self.assertEquals(client.cached_whois('google.com', 'whois.throttle.test', 0), THROTTLED)
+        self.assertEquals(len(client.cache), 0)
+
+    def test_max_response_size(self):
+        self.sim.add_server('whois.large.test', drip=(1024, 0.001))
+        reply = self.sim.samples['google.com']
+        client = self.client(max_response_size=2000, truncate_response=True)
+        response = client.whois('google.com', 'whois.large.test', 0)
+        self.assertEquals(len(response), 2000)
+        self.assertEquals(response, reply[:2000])
+        client.truncate_response = False
+        try:
+            client.whois('google.com', 'whois.large.test', 0)
+            self.fail('ResponseTooLarge not raised')
+        except ResponseTooLarge, e:
+            self.assertEquals(e.hostname, 'whois.large.test')
+            self.assertEquals(e.limit, 2000)
+            self.assertEquals(e.partial, reply[:2000])
+        client.max_response_size = len(reply)
+        self.assertEquals(client.whois('google.com', 'whois.large.test', 0), reply)
+
+    def test_truncated_not_cached(self):
+        self.sim.add_server('whois.large.test')
+        client = self.client(cache=MemoryCache(), max_response_size=2000, truncate_response=True)
+        response = client.cached_whois('google.com', 'whois.large.test', 0)
+        self.assertEquals(len(response), 2000)
+        self.assertTrue(response.hops[0].trace.truncated)
+        self.assertEquals(len(client.cache), 0)
+        client.max_response_size = None
+        response = client.cached_whois('google.com', 'whois.large.test', 0)
+        self.assertFalse(response.hops[0].trace.truncated)
+        self.assertEquals(len(client.cache), 1)
+
+    def test_throttled(self):
+        server = self.sim.add_server('whois.throttle.test', throttle=(0.001, 1))
+        scheduler = ServerScheduler(default=(1000, 10))
+        client = self.client(scheduler=scheduler)
+        self.assertEquals(client.whois('google.com', 'whois.throttle.test', 0), self.sim.samples['google.com'])
+        self.assertEquals(client.whois('google.com', 'whois.throttle.test', 0), THROTTLED)
+        self.assertEquals((server.throttled, scheduler.throttled), (1, 1))
+        self.assertTrue(scheduler.reserve('whois.throttle.test') > 0)
+
+if __name__ == '__main__':
+    unittest.main()
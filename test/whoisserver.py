@@ -0,0 +1,303 @@
+"""Simulated whois servers on localhost, for tests and load tests.
+
+    >>> sim = WhoisSimulator()
+    >>> sim.add_server('whois.registry.test', referral='whois.registrar.test')
+    >>> sim.add_server('whois.registrar.test', latency=0.05, drip=(512, 0.01))
+    >>> sim.start()
+    >>> client = NICClient(resolver=sim.resolver())
+    >>> client.whois('google.com', 'whois.registry.test', NICClient.WHOIS_RECURSE)
+    >>> sim.stop()
+
+Each server answers a query with the file of that name in
+test/samples/whois, or with a "No match" reply. A server given a
+``referral`` hostname answers with a thin registry record pointing there
+instead. Servers can also:
+
+- wait ``latency`` seconds before the first byte
+- send the reply ``drip=(bytes, seconds)`` at a time
+- keep the connection open after the reply (``linger``), or never
+  answer at all (``hang``)
+- answer with a rate limiting message past a ``throttle=(rate, burst)``
+  budget
+- reset a ``reset_rate`` fraction of connections instead of answering
+
+All servers run on one poll()-based asyncore loop in a background
+thread, so thousands of connections can be open at once (raise the
+process's open file limit to match). Run the file to serve from the
+command line:
+
+    python test/whoisserver.py [-p 4343] [--latency 0.1] ...
+
+which starts the registry on the given port and its registrar on the next.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import time
+import heapq
+import random
+import socket
+import struct
+import asyncore
+import optparse
+import threading
+from glob import glob
+
+from pywhois.ratelimit import TokenBucket
+from pywhois.resolver import StaticResolver
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'samples', 'whois')
+
+THIN_REPLY = """\
+Whois Server Version 2.0
+
+   Domain Name: %(domain)s
+   Registrar: SIMULATED REGISTRAR, INC.
+   Whois Server: %(server)s
+   Referral URL: http://%(server)s
+   Status: ok
+
+>>> Last update of whois database: Thu, 26 Jun 2008 21:39:39 EDT <<<
+"""
+
+NO_MATCH = 'No match for "%s".\r\n'
+
+THROTTLED = '%ERROR:201: access denied - query rate limit exceeded\r\n'
+
+
+def load_samples(path=SAMPLES):
+    """Return a dict of sample name to text."""
+    return dict((os.path.basename(name), open(name).read())
+                for name in glob(os.path.join(path, '*')))
+
+
+def closed_port():
+    """Return a localhost address nothing listens on."""
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    address = s.getsockname()
+    s.close()
+    return address
+
+
+class SimulatedConnection(asyncore.dispatcher):
+    """One client connection to a ``SimulatedServer``."""
+
+    def __init__(self, server, sock):
+        asyncore.dispatcher.__init__(self, sock, map=server.simulator.map)
+        self.server = server
+        self.query = ''
+        self.out = ''
+        self.ready_at = None
+        self.answered = False
+
+    def readable(self):
+        return not self.answered or self.server.linger
+
+    def handle_read(self):
+        data = self.recv(1024)
+        if self.answered or not data:
+            return
+        self.query += data
+        if '\n' in self.query:
+            self.answered = True
+            self.server.answer(self, self.query.split('\n')[0].strip())
+
+    def send_reply(self, text, delay=0):
+        self.out = text
+        self.ready_at = time.time() + delay
+
+    def writable(self):
+        return bool(self.out) and time.time() >= self.ready_at
+
+    def handle_write(self):
+        drip = self.server.drip
+        if drip is not None:
+            sent = self.send(self.out[:drip[0]])
+            self.ready_at = time.time() + drip[1]
+        else:
+            sent = self.send(self.out)
+        self.out = self.out[sent:]
+        if not self.out and not self.server.linger:
+            self.close()
+
+    def reset(self):
+        # closing with a zero linger time sends RST instead of FIN
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        self.close()
+
+    def handle_close(self):
+        self.close()
+
+    def close(self):
+        if self in self.server.open:
+            self.server.open.discard(self)
+        asyncore.dispatcher.close(self)
+
+
+class SimulatedServer(asyncore.dispatcher):
+    """Listening socket of one simulated whois server; see the module
+    documentation for the behaviour options.
+    """
+
+    def __init__(self, simulator, hostname, port=0, referral=None, latency=0,
+                 drip=None, linger=False, hang=False, throttle=None, reset_rate=0.0):
+        asyncore.dispatcher.__init__(self, map=simulator.map)
+        self.simulator = simulator
+        self.hostname = hostname
+        self.referral = referral
+        self.latency = latency
+        self.drip = drip
+        self.linger = linger
+        self.hang = hang
+        self.bucket = throttle and TokenBucket(*throttle)
+        self.reset_rate = reset_rate
+        self.open = set()
+        self.connections = 0
+        self.queries = []
+        self.throttled = 0
+        self.resets = 0
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind(('127.0.0.1', port))
+        self.listen(1024)
+        self.address = self.socket.getsockname()
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is None:
+            return
+        self.connections += 1
+        self.open.add(SimulatedConnection(self, pair[0]))
+
+    def answer(self, conn, query):
+        """Decide how to answer ``query`` on ``conn``."""
+        self.queries.append(query)
+        if self.hang:
+            return
+        if self.reset_rate and self.simulator.random.random() < self.reset_rate:
+            self.resets += 1
+            self.simulator.schedule(self.latency, conn.reset)
+            return
+        if self.bucket is not None and self.bucket.reserve(time.time()) > 0:
+            self.throttled += 1
+            return conn.send_reply(THROTTLED, self.latency)
+        conn.send_reply(self.reply(query), self.latency)
+
+    def reply(self, query):
+        words = query.lstrip('=').split()
+        domain = words and words[-1].lower() or ''
+        if domain not in self.simulator.samples:
+            return NO_MATCH % domain.upper()
+        if self.referral is not None:
+            return THIN_REPLY % {'domain': domain.upper(), 'server': self.referral}
+        return self.simulator.samples[domain]
+
+
+class WhoisSimulator(object):
+    """A set of simulated whois servers sharing one event loop, answering
+    from ``samples`` (a dict of name to text, test/samples/whois by
+    default). ``seed`` makes random resets repeatable.
+    """
+
+    def __init__(self, samples=None, seed=None):
+        self.samples = samples if samples is not None else load_samples()
+        self.random = random.Random(seed)
+        self.map = {}
+        self.servers = {}
+        self.timers = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    def add_server(self, hostname, port=0, **behaviour):
+        """Start listening as ``hostname`` and return the server. Servers
+        are added before ``start``.
+        """
+        server = self.servers[hostname] = SimulatedServer(self, hostname, port, **behaviour)
+        return server
+
+    def resolver(self):
+        """Return a resolver sending each server name to its local port."""
+        return StaticResolver(dict((name, server.address)
+                                   for name, server in self.servers.items()))
+
+    def schedule(self, delay, function):
+        with self.lock:
+            heapq.heappush(self.timers, (time.time() + delay, function))
+
+    def run_timers(self):
+        now = time.time()
+        while self.timers and self.timers[0][0] <= now:
+            with self.lock:
+                when, function = heapq.heappop(self.timers)
+            function()
+
+    def serve(self):
+        while self.running:
+            asyncore.loop(timeout=0.005, use_poll=True, map=self.map, count=1)
+            self.run_timers()
+
+    def start(self):
+        """Serve in a background thread."""
+        self.running = True
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        asyncore.close_all(self.map)
+
+
+def parse_command_line(argv):
+    usage = "usage: %prog [options]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option("-p", "--port", action="store", type="int",
+                      dest="port", default=4343,
+                      help="Registry port; the registrar listens on the next one")
+    parser.add_option("--latency", action="store", type="float",
+                      dest="latency", default=0,
+                      help="Seconds before the first byte of a reply")
+    parser.add_option("--drip", action="store", type="int", nargs=2,
+                      dest="drip", metavar="BYTES MILLISECONDS",
+                      help="Send replies BYTES at a time, MILLISECONDS apart")
+    parser.add_option("--linger", action="store_true", dest="linger",
+                      help="Keep connections open after the reply")
+    parser.add_option("--hang", action="store_true", dest="hang",
+                      help="Never answer")
+    parser.add_option("--throttle", action="store", type="float", nargs=2,
+                      dest="throttle", metavar="RATE BURST",
+                      help="Answer queries over this budget with a rate limit error")
+    parser.add_option("--reset-rate", action="store", type="float",
+                      dest="reset_rate", default=0.0,
+                      help="Fraction of connections reset instead of answered")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    (options, args) = parse_command_line(argv)
+    behaviour = {'latency': options.latency, 'linger': options.linger,
+                 'hang': options.hang, 'throttle': options.throttle,
+                 'reset_rate': options.reset_rate}
+    if options.drip:
+        behaviour['drip'] = (options.drip[0], options.drip[1] / 1000.0)
+    sim = WhoisSimulator()
+    sim.add_server('whois.registry.test', options.port,
+                   referral='whois.registrar.test', **behaviour)
+    sim.add_server('whois.registrar.test', options.port + 1, **behaviour)
+    for name, server in sorted(sim.servers.items()):
+        print '%s on %s:%d' % ((name,) + server.address)
+    sim.running = True
+    try:
+        sim.serve()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()